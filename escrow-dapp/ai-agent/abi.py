@@ -0,0 +1,129 @@
+"""
+Deal-Fi AI Agent - Codificação ABI mínima
+Keccak-256, seletores de função, tópicos de evento e (de)codificação dos tipos
+usados pelo contrato de escrow (address, uint256, bool e string nos eventos),
+sem depender de web3/eth-abi.
+"""
+
+_MASK = (1 << 64) - 1
+_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+_ROTATIONS = [
+    [0, 36, 3, 41, 18], [1, 44, 10, 45, 2], [62, 6, 43, 15, 61], [28, 55, 25, 21, 56], [27, 20, 39, 8, 14],
+]
+_RATE = 136  # bytes (1088 bits) para Keccak-256
+
+
+def _rotl(value, shift):
+    return ((value << shift) | (value >> (64 - shift))) & _MASK if shift else value
+
+
+def _keccak_f(state):
+    for constant in _ROUND_CONSTANTS:
+        c = [state[x][0] ^ state[x][1] ^ state[x][2] ^ state[x][3] ^ state[x][4] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotl(c[(x + 1) % 5], 1) for x in range(5)]
+        state = [[state[x][y] ^ d[x] for y in range(5)] for x in range(5)]
+        b = [[0] * 5 for _ in range(5)]
+        for x in range(5):
+            for y in range(5):
+                b[y][(2 * x + 3 * y) % 5] = _rotl(state[x][y], _ROTATIONS[x][y])
+        state = [[b[x][y] ^ (~b[(x + 1) % 5][y] & b[(x + 2) % 5][y]) for y in range(5)] for x in range(5)]
+        state[0][0] ^= constant
+    return state
+
+
+def keccak256(data):
+    """Keccak-256 do Ethereum (padding 0x01, diferente do SHA3-256 do hashlib)."""
+    if isinstance(data, str):
+        data = data.encode()
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\x00" * (-len(padded) % _RATE))
+    padded[-1] |= 0x80
+
+    state = [[0] * 5 for _ in range(5)]
+    for offset in range(0, len(padded), _RATE):
+        block = padded[offset:offset + _RATE]
+        for i in range(_RATE // 8):
+            state[i % 5][i // 5] ^= int.from_bytes(block[i * 8:i * 8 + 8], "little")
+        state = _keccak_f(state)
+    return b"".join(state[i % 5][i // 5].to_bytes(8, "little") for i in range(4))
+
+
+def function_selector(signature):
+    """Seletor de 4 bytes em hex ("transfer(address,uint256)" → "0xa9059cbb")."""
+    return "0x" + keccak256(signature).hex()[:8]
+
+
+def event_topic(signature):
+    """topic0 do evento ("Deposited(address,uint256)" → "0x...")."""
+    return "0x" + keccak256(signature).hex()
+
+# ============================================================================
+# CODIFICAÇÃO (palavras de 32 bytes)
+# ============================================================================
+
+def encode_word(value):
+    """Argumento estático (int, bool ou endereço 0x...) como palavra de 32 bytes em hex."""
+    if isinstance(value, str):
+        value = int(value, 16)
+    return f"{int(value):064x}"
+
+
+def encode_call(signature, *args):
+    """Calldata de uma chamada com argumentos estáticos."""
+    return function_selector(signature) + "".join(encode_word(arg) for arg in args)
+
+
+def decode_word(word, kind):
+    """Valor de uma palavra de 32 bytes (hex sem 0x) do tipo `address`, `bool` ou inteiro."""
+    if kind == "address":
+        return to_checksum_address("0x" + word[24:])
+    if kind == "bool":
+        return int(word, 16) != 0
+    if kind.startswith("int"):
+        value = int(word, 16)
+        return value - (1 << 256) if value >> 255 else value
+    return int(word, 16)
+
+
+def decode_words(data, types):
+    """
+    Decodifica um retorno/dado ABI em hex. Tipos estáticos (`address`, `uint256`,
+    `bool`) ocupam uma palavra; `string` e `bytes` são lidos pelo offset da palavra.
+    """
+    data = data[2:] if data.startswith("0x") else data
+    if len(data) < 64 * len(types):
+        raise ValueError(f"Retorno ABI curto: {len(data) // 2} bytes para {len(types)} valores")
+    values = []
+    for i, kind in enumerate(types):
+        word = data[i * 64:(i + 1) * 64]
+        if kind in ("string", "bytes"):
+            offset = int(word, 16) * 2
+            length = int(data[offset:offset + 64], 16) * 2
+            raw = bytes.fromhex(data[offset + 64:offset + 64 + length])
+            values.append(raw.decode("utf-8", "replace") if kind == "string" else "0x" + raw.hex())
+        else:
+            values.append(decode_word(word, kind))
+    return values
+
+
+def to_checksum_address(address):
+    """Endereço no formato EIP-55 (mesmo de ethers.utils.getAddress)."""
+    address = address.lower().replace("0x", "")
+    digest = keccak256(address).hex()
+    return "0x" + "".join(c.upper() if int(digest[i], 16) >= 8 else c for i, c in enumerate(address))
+
+
+def format_units(value, decimals=6):
+    """Mesmo texto de ethers.utils.formatUnits (1500000000 → "1500.0")."""
+    sign = "-" if value < 0 else ""
+    whole, fraction = divmod(abs(value), 10 ** decimals)
+    fraction = f"{fraction:0{decimals}d}".rstrip("0") or "0"
+    return f"{sign}{whole}.{fraction}"
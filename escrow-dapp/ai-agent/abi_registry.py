@@ -0,0 +1,550 @@
+"""
+Deal-Fi AI Agent - Registro de ABIs (endereçado por conteúdo)
+Serve as ABIs dos contratos de escrow a partir das cópias que já vêm no repositório,
+no lugar do getabi do PolygonScan que o frontend chamava a cada conexão (lento e
+com limite de requisições).
+
+Como o registro é montado (uma vez; refeito só se os arquivos mudarem):
+- ABIs: frontend/src/contracts/escrowABI.js (saída do compilador) e as funções,
+  eventos e getters públicos de cada contrato em backend/*.sol;
+- cada ABI é identificada pelo sha256 do seu JSON canônico (o `id`): ABIs iguais
+  viram uma só e o conteúdo de um `id` nunca muda, por isso pode ir para o cache
+  do navegador/CDN sem prazo (`immutable`);
+- bytecodes (frontend/src/contracts/bytecode.js e backend/bytecode_*): ligados à
+  ABI cujos seletores de função aparecem todos no código, pelo hash dos metadados
+  do compilador (o trecho CBOR no fim do bytecode, igual no código de deploy e no
+  código implantado).
+
+Endereço → ABI: o código do contrato (eth_getCode) é comparado pelo hash dos
+metadados e, se não houver, pelos seletores; só então vai ao PolygonScan (se
+ABI_EXTERNAL_LOOKUP). O código de um endereço não muda, então o resultado fica
+gravado no SQLite (ABI_REGISTRY_DB_PATH) e as ABIs externas também; endereços
+sem ABI são lembrados em memória por ABI_MISS_TTL segundos.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from abi import function_selector
+from chain_state import CHAIN_RPC_TIMEOUT, ChainStateError, ContractNotFound, normalize_address
+from coalescing import SingleFlight
+from metrics import Counter, register_metric
+
+ABI_REGISTRY_DB_PATH = os.getenv("ABI_REGISTRY_DB_PATH", "abi_registry.db")
+# Raiz com frontend/ e backend/ (o escrow-dapp)
+ABI_SOURCES_DIR = os.getenv("ABI_SOURCES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+ABI_EXTERNAL_LOOKUP = os.getenv("ABI_EXTERNAL_LOOKUP", "1") == "1"
+POLYGONSCAN_API_URL = os.getenv("POLYGONSCAN_API_URL", "https://api.polygonscan.com/api")
+POLYGONSCAN_API_KEY = os.getenv("POLYGONSCAN_API_KEY", "")
+ABI_MISS_TTL = float(os.getenv("ABI_MISS_TTL", 300))
+
+# Conteúdo de um id nunca muda; o índice e o mapeamento por endereço podem crescer
+ABI_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ABI_INDEX_CACHE_CONTROL = "public, max-age=300"
+ABI_ADDRESS_CACHE_CONTROL = "public, max-age=86400"
+
+ABI_SOURCES = [
+    "frontend/src/contracts/escrowABI.js",
+    "frontend/src/contracts/bytecode.js",
+    "backend/*.sol",
+    "backend/bytecode_*",
+]
+
+LOOKUPS = register_metric(Counter("dealfi_abi_lookups_total", "Buscas de ABI por endereço, por origem do resultado"))
+
+
+class AbiNotFound(ChainStateError):
+    status = 404
+
+
+def canonical_json(abi):
+    """JSON canônico da ABI (entradas e chaves ordenadas, sem espaços)."""
+    entries = sorted(abi, key=lambda entry: json.dumps(entry, sort_keys=True))
+    return json.dumps(entries, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def abi_id(abi):
+    return hashlib.sha256(canonical_json(abi).encode()).hexdigest()[:32]
+
+
+def _signature_type(param):
+    if param["type"].startswith("tuple"):
+        inner = ",".join(_signature_type(c) for c in param.get("components", []))
+        return f"({inner}){param['type'][5:]}"
+    return param["type"]
+
+
+def abi_selectors(abi):
+    """Seletores das funções da ABI ({"0xa9059cbb", ...})."""
+    return {
+        function_selector(f"{entry['name']}({','.join(_signature_type(p) for p in entry.get('inputs', []))})")
+        for entry in abi if entry.get("type") == "function"
+    }
+
+
+def _code_bytes(code):
+    code = code.strip()
+    return bytes.fromhex(code[2:] if code.startswith("0x") else code)
+
+
+def code_selectors(code):
+    """
+    Argumentos de PUSH4 no bytecode (onde o dispatcher do Solidity guarda os
+    seletores); PUSH3 também, para seletores que começam com 0x00.
+    """
+    data = _code_bytes(code) if isinstance(code, str) else code
+    selectors = set()
+    i = 0
+    while i < len(data):
+        opcode = data[i]
+        if 0x60 <= opcode <= 0x7f:  # PUSH1..PUSH32: pula os dados
+            size = opcode - 0x5f
+            if size in (3, 4):
+                selectors.add("0x" + data[i + 1:i + 1 + size].rjust(4, b"\0").hex())
+            i += size
+        i += 1
+    return selectors
+
+
+def metadata_hash(code):
+    """
+    sha256 do trecho CBOR de metadados no fim do bytecode (hash IPFS/Swarm dos
+    fontes + versão do solc); None se o código não terminar em metadados.
+    """
+    data = _code_bytes(code) if isinstance(code, str) else code
+    if len(data) < 2:
+        return None
+    size = int.from_bytes(data[-2:], "big")
+    cbor = data[-2 - size:-2]
+    if len(cbor) != size or not size or cbor[0] not in (0xa1, 0xa2, 0xa3, 0xa4):
+        return None
+    return hashlib.sha256(cbor).hexdigest()
+
+# ============================================================================
+# FONTES SOLIDITY
+# ============================================================================
+
+_COMMENTS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|//[^\n]*|/\*.*?\*/', re.S)
+_CONTRACT = re.compile(r"\b(abstract\s+contract|contract|interface|library)\s+(\w+)[^{;]*\{")
+_STRUCT = re.compile(r"\bstruct\s+(\w+)\s*\{([^}]*)\}")
+_ENUM = re.compile(r"\benum\s+(\w+)\s*\{")
+_ARRAY_SUFFIX = re.compile(r"^(.*?)((?:\[\d*\])*)$")
+_ELEMENTARY = re.compile(r"^(u?int\d*|bool|address|string|bytes\d*|byte)$")
+_LOCATIONS = {"memory", "calldata", "storage", "payable"}
+_VAR_KEYWORDS = {"public", "private", "internal", "immutable", "constant", "override", "transient"}
+
+
+def _block_end(text, start):
+    """Posição do `}` que fecha o `{` em `start`."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(text)
+
+
+def _top_level(body):
+    """Corpo do contrato com os blocos internos trocados por `{}`."""
+    parts = []
+    depth = 0
+    for char in body:
+        if char == "{":
+            if depth == 0:
+                parts.append("{}")
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0:
+            parts.append(char)
+    return "".join(parts)
+
+
+class _Types:
+    """Conversão de tipos Solidity para tipos da ABI (structs, enums e contratos)."""
+
+    def __init__(self, body):
+        self.enums = set(_ENUM.findall(body))
+        self.structs = {name: self._members(members) for name, members in _STRUCT.findall(body)}
+
+    def _members(self, members):
+        fields = []
+        for member in members.split(";"):
+            tokens = member.split()
+            if len(tokens) >= 2:
+                fields.append((" ".join(tokens[:-1]), tokens[-1]))
+        return fields
+
+    def param(self, solidity_type, name=""):
+        base, suffix = _ARRAY_SUFFIX.match(solidity_type.replace(" ", "")).groups()
+        if base in self.structs:
+            components = [self.param(kind, field) for kind, field in self.structs[base]]
+            return {"name": name, "type": "tuple" + suffix, "components": components}
+        if base in ("uint", "int"):
+            base += "256"
+        elif base == "byte":
+            base = "bytes1"
+        elif base in self.enums:
+            base = "uint8"
+        elif not _ELEMENTARY.match(base):
+            base = "address"  # contratos e interfaces (IERC20...)
+        return {"name": name, "type": base + suffix}
+
+    def params(self, text, event=False):
+        params = []
+        for param in text.split(","):
+            tokens = [token for token in param.split() if token not in _LOCATIONS]
+            if not tokens:
+                continue
+            indexed = "indexed" in tokens
+            tokens = [token for token in tokens if token != "indexed"]
+            entry = self.param(tokens[0], tokens[1] if len(tokens) > 1 else "")
+            if event:
+                entry["indexed"] = indexed
+            params.append(entry)
+        return params
+
+    def getter(self, declaration, name):
+        """Entrada da ABI do getter de uma variável pública (mapping, array ou struct)."""
+        inputs = []
+        kind = declaration
+        while kind.startswith("mapping"):
+            key, _, kind = kind[kind.index("(") + 1:kind.rindex(")")].partition("=>")
+            inputs.append(self.param(key.strip()))
+            kind = kind.strip()
+        base, suffix = _ARRAY_SUFFIX.match(kind.replace(" ", "")).groups()
+        inputs += [{"name": "", "type": "uint256"} for _ in re.findall(r"\[\d*\]", suffix)]
+        if base in self.structs:
+            # O getter de struct devolve os membros (exceto arrays e mappings) separados
+            outputs = [self.param(k, f) for k, f in self.structs[base]
+                       if not k.startswith("mapping") and not k.endswith("]")]
+        else:
+            outputs = [self.param(base)]
+        return {"type": "function", "name": name, "inputs": inputs, "outputs": outputs, "stateMutability": "view"}
+
+
+def _mutability(modifiers):
+    words = set(re.findall(r"\w+", modifiers))
+    for mutability in ("pure", "view", "payable"):
+        if mutability in words:
+            return mutability
+    return "nonpayable"
+
+
+def _statement_abi(statement, types):
+    """Entrada da ABI de uma declaração do contrato (None se não for pública)."""
+    keyword = re.match(r"\w*", statement).group()
+    if keyword in ("function", "constructor", "event", "error"):
+        match = re.match(r"(\w+)\s*(\w*)\s*\((.*?)\)(.*)", statement, re.S)
+        _, name, params, modifiers = match.groups()
+        if keyword == "event":
+            return {"type": "event", "name": name, "inputs": types.params(params, event=True),
+                    "anonymous": "anonymous" in modifiers.split()}
+        if keyword == "error":
+            return {"type": "error", "name": name, "inputs": types.params(params)}
+        if keyword == "constructor":
+            return {"type": "constructor", "inputs": types.params(params), "stateMutability": _mutability(modifiers)}
+        if not re.search(r"\b(public|external)\b", modifiers):
+            return None
+        returns = re.search(r"\breturns\s*\((.*?)\)\s*$", modifiers, re.S)
+        return {"type": "function", "name": name, "inputs": types.params(params),
+                "outputs": types.params(returns.group(1)) if returns else [],
+                "stateMutability": _mutability(modifiers)}
+    if keyword in ("receive", "fallback"):
+        return {"type": keyword, "stateMutability": _mutability(statement)}
+    if keyword in ("struct", "enum", "modifier", "using", "pragma", "import", "event", "") or "public" not in statement.split():
+        return None
+    declaration = re.split(r"=(?!>)", statement, 1)[0].split()
+    name = declaration[-1]
+    solidity_type = " ".join(word for word in declaration[:-1] if word not in _VAR_KEYWORDS)
+    return types.getter(solidity_type, name)
+
+
+def solidity_abis(source):
+    """[(nome do contrato, ABI)] dos `contract` de um arquivo .sol (sem interfaces e bibliotecas)."""
+    source = _COMMENTS.sub(lambda m: m.group(1) or "", source)
+    contracts = []
+    for match in _CONTRACT.finditer(source):
+        if match.group(1) != "contract":
+            continue
+        start = match.end() - 1
+        body = source[start + 1:_block_end(source, start)]
+        types = _Types(body)
+        statements = re.split(r"[;}]", _top_level(body))
+        abi = [entry for entry in (_statement_abi(s.replace("{", "").strip(), types) for s in statements) if entry]
+        contracts.append((match.group(2), abi))
+    return contracts
+
+
+def _js_abi(source):
+    """Array JSON atribuído em `const ... = [...]` num arquivo .js."""
+    start = source.index("[", source.index("="))
+    end = source.index("];", start) + 1
+    return json.loads(source[start:end])
+
+
+def _js_bytecode(source):
+    match = re.search(r"['\"](?:0x)?([0-9a-fA-F]{64,})['\"]", source)
+    return match.group(1) if match else None
+
+# ============================================================================
+# REGISTRO
+# ============================================================================
+
+class AbiRegistry:
+    """ABIs endereçadas por conteúdo + bytecodes e endereços conhecidos (SQLite, thread-safe)."""
+
+    def __init__(self, rpc, path=ABI_REGISTRY_DB_PATH, sources_dir=ABI_SOURCES_DIR):
+        self.rpc = rpc
+        self.sources_dir = sources_dir
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built = None
+        self._selectors = {}  # id -> seletores das funções (ABIs do repositório)
+        self._misses = {}  # endereço -> momento em que a busca falhou
+        self._inflight = SingleFlight()
+        self._http = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS abis ("
+            " id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " sources TEXT NOT NULL,"           # JSON: arquivos/contratos de onde a ABI veio
+            " origin TEXT NOT NULL,"            # repository | polygonscan
+            " selectors TEXT NOT NULL,"         # JSON: seletores das funções
+            " abi TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS bytecodes ("
+            " metadata TEXT PRIMARY KEY,"       # sha256 dos metadados CBOR do bytecode
+            " abi_id TEXT NOT NULL,"
+            " source TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS addresses ("
+            " address TEXT PRIMARY KEY,"
+            " abi_id TEXT NOT NULL,"
+            " match TEXT NOT NULL,"             # metadata | selectors | polygonscan
+            " updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS builds ("
+            " digest TEXT PRIMARY KEY,"         # sha256 dos arquivos-fonte
+            " abi_ids TEXT NOT NULL,"
+            " built_at REAL NOT NULL);"
+        )
+
+    # ------------------------------------------------------------------------
+    # Montagem a partir dos arquivos do repositório
+    # ------------------------------------------------------------------------
+
+    def _source_files(self):
+        files = []
+        for pattern in ABI_SOURCES:
+            for path in sorted(glob.glob(os.path.join(self.sources_dir, pattern))):
+                with open(path, "rb") as f:
+                    files.append((os.path.relpath(path, self.sources_dir).replace(os.sep, "/"), f.read()))
+        return files
+
+    def build(self):
+        """
+        Monta o registro a partir dos arquivos (uma vez por conteúdo dos arquivos;
+        depois só lê o SQLite). Retorna o digest dos fontes.
+        """
+        with self._build_lock:
+            if self._built is not None:
+                return self._built
+            files = self._source_files()
+            digest = hashlib.sha256(b"".join(
+                name.encode() + b"\0" + hashlib.sha256(data).digest() for name, data in files
+            )).hexdigest()[:32]
+            with self._lock:
+                row = self._conn.execute("SELECT abi_ids FROM builds WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                started = time.perf_counter()
+                abi_ids = self._ingest_sources(files, digest)
+                print(f"Registro de ABIs montado: {len(abi_ids)} ABIs de {len(files)} arquivos "
+                      f"em {(time.perf_counter() - started) * 1000:.0f} ms")
+            else:
+                abi_ids = json.loads(row[0])
+            rows = self._rows("SELECT id, selectors FROM abis WHERE id IN (%s)" % ",".join("?" * len(abi_ids)), abi_ids)
+            self._selectors = {id_: set(json.loads(selectors)) for id_, selectors in rows}
+            self._built = digest
+            return digest
+
+    def _ingest_sources(self, files, digest):
+        abis = {}  # id -> (nome, fontes, abi)
+
+        def add(name, source, abi):
+            entry = abis.setdefault(abi_id(abi), (name, [], abi))
+            entry[1].append(source)
+
+        bytecodes = []
+        for path, data in files:
+            text = data.decode("utf-8", "replace")
+            if path.endswith("escrowABI.js"):
+                add(os.path.basename(path), path, _js_abi(text))
+            elif path.endswith(".sol"):
+                for contract, abi in solidity_abis(text):
+                    add(contract, f"{path}:{contract}", abi)
+            else:
+                code = _js_bytecode(text) if path.endswith(".js") else text.strip()
+                if code:
+                    bytecodes.append((path, code))
+
+        # ABI do compilador e ABI lida do .sol com as mesmas funções: fica a do
+        # compilador (tem os erros herdados), com o nome do contrato
+        selectors = {id_: abi_selectors(abi) for id_, (_, _, abi) in abis.items()}
+        compiled = [id_ for id_, (_, sources, _) in abis.items() if any(s.endswith(".js") for s in sources)]
+        for id_ in compiled:
+            for other in [o for o in abis if o not in compiled and selectors[o] == selectors[id_]]:
+                name, sources, _ = abis.pop(other)
+                abis[id_] = (name, abis[id_][1] + sources, abis[id_][2])
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for id_, (name, sources, abi) in abis.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO abis (id, name, sources, origin, selectors, abi)"
+                        " VALUES (?, ?, ?, 'repository', ?, ?)",
+                        (id_, name, json.dumps(sources), json.dumps(sorted(selectors[id_])), canonical_json(abi))
+                    )
+                for path, code in bytecodes:
+                    id_ = self._match_selectors(code_selectors(code), selectors, abis)
+                    metadata = metadata_hash(code)
+                    if id_ is not None and metadata is not None:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO bytecodes (metadata, abi_id, source) VALUES (?, ?, ?)",
+                            (metadata, id_, path)
+                        )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO builds (digest, abi_ids, built_at) VALUES (?, ?, ?)",
+                    (digest, json.dumps(sorted(abis)), time.time())
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return sorted(abis)
+
+    @staticmethod
+    def _match_selectors(found, selectors, candidates):
+        """ABI com mais funções cujos seletores aparecem todos no bytecode (None se nenhuma)."""
+        matches = [id_ for id_ in candidates if selectors[id_] and selectors[id_] <= found]
+        return max(matches, key=lambda id_: len(selectors[id_]), default=None)
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------------
+
+    def get(self, id_):
+        """{"id", "name", "sources", "origin", "abi"}; AbiNotFound se o id não existir."""
+        self.build()
+        rows = self._rows("SELECT id, name, sources, origin, abi FROM abis WHERE id = ?", (id_,))
+        if not rows:
+            raise AbiNotFound(f"ABI não encontrada: {id_}")
+        return self._abi_body(rows[0])
+
+    def _abi_body(self, row):
+        id_, name, sources, origin, abi = row
+        return {"id": id_, "name": name, "sources": json.loads(sources), "origin": origin, "abi": json.loads(abi)}
+
+    def index(self):
+        """Resumo das ABIs e bytecodes conhecidos (sem o conteúdo das ABIs)."""
+        digest = self.build()
+        abis = []
+        for row in self._rows("SELECT id, name, sources, origin, abi FROM abis ORDER BY origin, name"):
+            body = self._abi_body(row)
+            abi = body.pop("abi")
+            body["functions"] = sum(1 for entry in abi if entry.get("type") == "function")
+            body["events"] = sum(1 for entry in abi if entry.get("type") == "event")
+            abis.append(body)
+        bytecodes = [{"metadata": metadata, "abi_id": id_, "source": source}
+                     for metadata, id_, source in self._rows("SELECT metadata, abi_id, source FROM bytecodes ORDER BY source")]
+        return {"build": digest, "abis": abis, "bytecodes": bytecodes}
+
+    def for_address(self, address):
+        """
+        ABI do contrato implantado em `address`, com `address` e `match` (como foi
+        identificada). InvalidAddress, ContractNotFound (sem código) ou AbiNotFound.
+        """
+        address = normalize_address(address)
+        self.build()
+        rows = self._rows(
+            "SELECT a.match, b.id, b.name, b.sources, b.origin, b.abi FROM addresses a"
+            " JOIN abis b ON b.id = a.abi_id WHERE a.address = ?", (address,)
+        )
+        if rows:
+            LOOKUPS.inc(source="cache")
+            return {"address": address, "match": rows[0][0], **self._abi_body(rows[0][1:])}
+        missed = self._misses.get(address)
+        if missed is not None and time.monotonic() - missed < ABI_MISS_TTL:
+            LOOKUPS.inc(source="miss")
+            raise AbiNotFound("Nenhuma ABI conhecida para este contrato.")
+        return self._inflight.do(f"abi:{address}", lambda: self._resolve(address))
+
+    def _resolve(self, address):
+        code = self.rpc.call("eth_getCode", [address, "latest"])
+        if not code or code == "0x":
+            raise ContractNotFound("Nenhum contrato neste endereço.")
+
+        match, id_ = "metadata", None
+        metadata = metadata_hash(code)
+        if metadata is not None:
+            rows = self._rows("SELECT abi_id FROM bytecodes WHERE metadata = ?", (metadata,))
+            id_ = rows[0][0] if rows else None
+        if id_ is None:
+            match, id_ = "selectors", self._match_selectors(code_selectors(code), self._selectors, self._selectors)
+        if id_ is None and ABI_EXTERNAL_LOOKUP:
+            match, id_ = "polygonscan", self._polygonscan(address)
+        if id_ is None:
+            self._misses[address] = time.monotonic()
+            LOOKUPS.inc(source="miss")
+            raise AbiNotFound("Nenhuma ABI conhecida para este contrato.")
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO addresses (address, abi_id, match, updated_at) VALUES (?, ?, ?, ?)",
+                (address, id_, match, time.time())
+            )
+        self._misses.pop(address, None)
+        LOOKUPS.inc(source=match)
+        return {"address": address, "match": match, **self.get(id_)}
+
+    def _polygonscan(self, address):
+        """ABI verificada no PolygonScan, gravada no registro (None se não houver)."""
+        if self._http is None:
+            self._http = httpx.Client(timeout=CHAIN_RPC_TIMEOUT)
+        params = {"module": "contract", "action": "getabi", "address": address}
+        if POLYGONSCAN_API_KEY:
+            params["apikey"] = POLYGONSCAN_API_KEY
+        try:
+            response = self._http.get(POLYGONSCAN_API_URL, params=params)
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") != "1":
+                return None
+            abi = json.loads(data["result"])
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            print(f"Erro ao buscar ABI no PolygonScan para {address}: {str(e)}")
+            return None
+        id_ = abi_id(abi)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO abis (id, name, sources, origin, selectors, abi)"
+                " VALUES (?, ?, ?, 'polygonscan', ?, ?)",
+                (id_, f"polygonscan:{address}", json.dumps([address]), json.dumps(sorted(abi_selectors(abi))),
+                 canonical_json(abi))
+            )
+        return id_
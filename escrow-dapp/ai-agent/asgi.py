@@ -0,0 +1,732 @@
+"""
+Deal-Fi AI Agent - Backend ASGI
+Servidor assíncrono (Starlette + AsyncOpenAI) com os mesmos endpoints do server.py.
+
+Cada /chat em andamento só ocupa uma corrotina enquanto espera a OpenAI,
+então um único processo atende centenas de conversas simultâneas.
+
+Produção:  uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+
+# Primeiro import: marca o início do startup (tempo de import no log e no /readyz)
+from startup import PREWARM_ENABLED, Lazy, aprewarm, health_body, mark_imported, readiness
+
+import asyncio
+import queue
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from abi_registry import (
+    ABI_ADDRESS_CACHE_CONTROL, ABI_CACHE_CONTROL, ABI_INDEX_CACHE_CONTROL, AbiRegistry
+)
+from chain_events import CHAIN_EVENTS_HEARTBEAT, CHAIN_EVENTS_QUEUE_SIZE, ChainEventHub, resume_block
+from chain_state import ChainStateError, ChainStateService, chain_error_body, not_modified
+from contract_index import INDEXER_ENABLED, ContractIndexer, contract_index, contracts_page, history_page
+from coalescing import AsyncSingleFlight, request_key
+from core import MODEL, SSE_HEADERS, error_body, index_body, prepare_messages, require_api_key
+from intent_router import route_intent
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    current_trace,
+    finish_request,
+    record_error,
+    record_upstream,
+    register_collector,
+    render as render_metrics,
+    start_request
+)
+from model_router import choose_model, escalate, malformed_tool_call, record_route
+from payloads import PayloadError, encode_json, payload_error_body, read_payload, wants_lean
+from prompt_cache import prompt_cache_stats, upstream_extra_body, variant_for
+from rate_limit import RateLimiter, bind_client, client_identity, current_client
+from resilience import (
+    AsyncUpstreamLimiter,
+    UpstreamUnavailable,
+    acall_with_retry,
+    breaker,
+    async_http_client,
+    client_options,
+    error_status
+)
+from response_cache import response_cache
+from server_tools import (
+    MAX_SERVER_TOOL_ROUNDS,
+    achat_with_server_tools,
+    completion_body,
+    resolve_server_round
+)
+from sessions import SessionNotFound, create_store, session_not_found_body, turn_messages
+from streaming import ChatStreamAccumulator, replay_events, sse_event
+from tool_validation import repair_tool_calls
+
+# Cliente único compartilhado por todas as requisições (pool de conexões reaproveitado)
+
+
+def _openai_client():
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=require_api_key(), http_client=async_http_client(), **client_options())
+
+
+# Criado no prewarm (fora do event loop) ou na primeira chamada; sem chave, só /chat falha
+client = Lazy(_openai_client)
+
+# Chamadas simultâneas à OpenAI (fila justa por cliente; excedentes recebem 429)
+limiter = AsyncUpstreamLimiter()
+register_collector(limiter.collect)
+
+# Limite de requisições e de tokens por cliente (checado antes de ler o corpo)
+rate_limiter = RateLimiter()
+register_collector(rate_limiter.collect)
+
+# Histórico das conversas mantido no servidor
+sessions = create_store()
+
+# Chamadas idênticas em andamento (single-flight)
+inflight = AsyncSingleFlight()
+register_collector(lambda: [(
+    "dealfi_coalesced_requests_total", "counter",
+    "Requisições atendidas por uma chamada idêntica em andamento", inflight.coalesced
+)])
+
+# Estado dos contratos de escrow (uma leitura JSON-RPC em lote por bloco)
+chain_state = ChainStateService()
+chain_events = ChainEventHub(chain_state)
+# Índice e indexador abertos no primeiro uso; a thread do indexador sobe no startup
+contract_indexer = Lazy(lambda: ContractIndexer(contract_index.get(), chain_state))
+# Registro de ABIs; o abi_registry.db é aberto na primeira consulta
+abi_registry = Lazy(lambda: AbiRegistry(chain_state.rpc))
+
+# ============================================================================
+# MÉTRICAS
+# ============================================================================
+
+# Sondas do Railway/Prometheus não geram trace nem linha de log
+UNTRACED_PATHS = {"/metrics", "/healthz", "/readyz"}
+
+
+class MetricsMiddleware:
+    """Abre um trace por requisição HTTP e o fecha depois do último byte da resposta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace = start_request(int(headers.get(b"content-length", 0) or 0))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Mesmo nome de rota do Flask: o nome da função do endpoint
+            endpoint = getattr(scope.get("endpoint"), "__name__", "not_found")
+            finish_request(trace, endpoint, status)
+
+
+async def metrics(request):
+    """Métricas no formato texto do Prometheus."""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+async def index(request):
+    """Health check"""
+    return JSONResponse(index_body())
+
+
+async def healthz(request):
+    """Liveness: o processo responde (sem checagens)."""
+    return JSONResponse(health_body())
+
+
+async def readyz(request):
+    """Readiness (mesmo contrato do server.py)."""
+    _start_prewarm()
+    ready, body = readiness.snapshot(breaker.state)
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+async def prompt_cache(request):
+    """Uso do cache de prompt da OpenAI (cached_tokens) e estabilidade do prefixo."""
+    return JSONResponse({**prompt_cache_stats.snapshot(), "response_cache": response_cache.stats()})
+
+
+async def _create_completion(messages, model=MODEL, **kwargs):
+    """
+    Chamada à OpenAI com as tools do Deal-Fi (com retries e circuit breaker).
+    Sem streaming, ocupa uma vaga do limitador; no streaming a vaga é do chamador.
+    """
+
+    def create():
+        return client.get().chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=variant_for(messages).tools,
+            tool_choice="auto",
+            extra_body=upstream_extra_body(messages),
+            **kwargs
+        )
+
+    if not client.created:
+        # Chat antes do fim do prewarm: o import do SDK não trava o event loop
+        await run_in_threadpool(client.get)
+    started = time.perf_counter()
+    if kwargs.get("stream"):
+        return await acall_with_retry(create)
+    requester = current_client()
+    async with limiter.slot(requester.flow, requester.weight):
+        completion = await acall_with_retry(create)
+    await run_in_threadpool(rate_limiter.charge, requester, completion.usage)
+    prompt_cache_stats.record(completion.usage)
+    record_upstream(started, completion.usage, completion.choices[0].message)
+    return completion
+
+
+async def _routed_completion(messages):
+    """
+    Completion sem streaming no tier escolhido pelo roteador de modelos;
+    tool_call malformada do modelo pequeno é refeita no modelo grande.
+    """
+    tier, model, reason = choose_model(messages)
+    while True:
+        started = time.perf_counter()
+        completion = await _create_completion(messages, model=model)
+        record_route(tier, reason, time.perf_counter() - started)
+        malformed = malformed_tool_call(completion.choices[0].message) if tier == "small" else None
+        if malformed is None:
+            return completion
+        tier, model, reason = escalate(malformed)
+
+
+async def _read_payload(request):
+    """Payload JSON da requisição (corpo gzip/br/deflate é descomprimido)."""
+    request.state.payload = read_payload(await request.body(), request.headers.get("content-encoding"))
+    return request.state.payload
+
+
+def _json_response(request, body, status_code=200, headers=None):
+    """
+    JSON serializado com orjson, comprimido conforme Accept-Encoding e no modo
+    enxuto se o cliente mandou `Prefer: return=minimal` ou `"lean": true` no payload.
+    """
+    data, base_headers = encode_json(
+        body, request.headers.get("accept-encoding"),
+        wants_lean(request.headers.get("prefer"), getattr(request.state, "payload", None))
+    )
+    return Response(data, status_code=status_code, headers={**base_headers, **(headers or {})})
+
+
+def _error_response(request, e):
+    """Resposta de erro do /chat com o status adequado (400/404/413/415/429/502/503/504/500)."""
+    if isinstance(e, SessionNotFound):
+        # A sessão foi apagada ou expirou durante o turno (o histórico não é recriado)
+        return _json_response(request, session_not_found_body(e.session_id), 404)
+    record_error(e)
+    if isinstance(e, PayloadError):
+        return _json_response(request, payload_error_body(e), e.status)
+    print(f"Erro na API OpenAI: {str(e)}")
+    status, headers = error_status(e)
+    return _json_response(request, error_body(e), status, headers)
+
+
+async def _rate_limit(request):
+    """429 antes de o corpo ser lido quando o cliente estourou o seu limite (None se pode seguir)."""
+    client = client_identity(
+        request.headers, request.client.host if request.client else None, request.path_params.get("session_id")
+    )
+    # O admit roda no threadpool (backend sqlite bloqueia), num contexto copiado:
+    # o cliente da requisição é ligado aqui, no contexto do event loop
+    bind_client(client)
+    try:
+        await run_in_threadpool(rate_limiter.admit, client)
+    except UpstreamUnavailable as e:
+        # Sem log por recusa (contada em dealfi_rate_limited_total): um cliente insistente não enche o log
+        status, headers = error_status(e)
+        return _json_response(request, error_body(e), status, headers)
+    return None
+
+
+async def chat(request):
+    """
+    Endpoint principal de chat (mesmo contrato do server.py).
+    Com "stream": true no payload, responde como SSE (igual a /chat/stream).
+    Se o payload trouxer "client_state", as tools de leitura são resolvidas aqui.
+    """
+    rejected = await _rate_limit(request)
+    if rejected is not None:
+        return rejected
+    try:
+        payload = await _read_payload(request)
+        messages, context = await run_in_threadpool(prepare_messages, payload)
+        client_state = payload.get("client_state")
+
+        routed = route_intent(messages, client_state)
+        if routed is not None:
+            return _routed_response(request, routed, payload.get("stream"))
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            return _cached_response(request, cached, payload.get("stream"))
+
+        if payload.get("stream"):
+            return await _stream_response(messages, context, client_state)
+
+        async def complete():
+            body = await achat_with_server_tools(_routed_completion, messages, client_state, context)
+            response_cache.put(messages, body)
+            return body
+
+        body = await inflight.do(request_key("chat", await request.body()), complete)
+
+        return _json_response(request, body)
+
+    except Exception as e:
+        return _error_response(request, e)
+
+
+async def chat_stream(request):
+    """Versão streaming do /chat (Server-Sent Events)."""
+    rejected = await _rate_limit(request)
+    if rejected is not None:
+        return rejected
+    try:
+        payload = await _read_payload(request)
+        messages, context = await run_in_threadpool(prepare_messages, payload)
+
+        routed = route_intent(messages, payload.get("client_state"))
+        if routed is not None:
+            return _routed_response(request, routed, stream=True)
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            return _cached_response(request, cached, stream=True)
+
+        return await _stream_response(messages, context, payload.get("client_state"))
+    except Exception as e:
+        return _error_response(request, e)
+
+
+async def _stream_response(messages, context, client_state=None, on_complete=None):
+    """
+    Abre o stream na OpenAI e repassa os chunks como SSE.
+    `on_complete(body)` é chamado com o corpo final (usado pelas sessões), no threadpool.
+    A vaga no limitador é ocupada antes da resposta (para poder responder 429)
+    e liberada quando o stream termina.
+    """
+
+    requester = current_client()
+    slot = await limiter.acquire(requester.flow, requester.weight)
+    trace = current_trace()
+
+    async def generate():
+        server_messages = []
+        try:
+            for round_index in range(MAX_SERVER_TOOL_ROUNDS + 1):
+                tier, model, reason = choose_model(messages)
+                while True:
+                    acc = ChatStreamAccumulator(model)
+                    started = time.perf_counter()
+                    stream = await _create_completion(
+                        messages,
+                        model=model,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    async for chunk in stream:
+                        delta = acc.add_chunk(chunk)
+                        if delta and tier == "small":
+                            # tool_calls do modelo pequeno só no evento `message` (podem ser refeitas)
+                            delta.pop("tool_calls", None)
+                        if delta:
+                            if trace is not None:
+                                trace.first_token()
+                            yield sse_event("delta", delta)
+
+                    await run_in_threadpool(rate_limiter.charge, requester, acc.usage)
+                    prompt_cache_stats.record(acc.usage)
+                    record_upstream(started, acc.usage, acc.message(), trace)
+                    record_route(tier, reason, time.perf_counter() - started, trace)
+
+                    malformed = malformed_tool_call(acc.message()) if tier == "small" else None
+                    if malformed is None:
+                        break
+                    # O cliente descarta os deltas desta rodada e recebe a resposta do modelo grande
+                    tier, model, reason = escalate(malformed)
+                    yield sse_event("escalated", {"model": model, "reason": malformed})
+
+                message = acc.message()
+                errors = repair_tool_calls(message, client_state)
+                if round_index == MAX_SERVER_TOOL_ROUNDS:
+                    break
+                # list_my_contracts consulta o índice SQLite: fora do event loop
+                new_messages = await run_in_threadpool(resolve_server_round, message, messages, client_state, errors)
+                if new_messages is None:
+                    break
+                server_messages.extend(new_messages)
+                yield sse_event("server_messages", {"messages": new_messages})
+
+            body = completion_body(acc.completion(), server_messages, context)
+            response_cache.put(messages, body)
+            if on_complete:
+                await run_in_threadpool(on_complete, body)
+            yield sse_event("message", body)
+        except SessionNotFound as e:
+            yield sse_event("error", session_not_found_body(e.session_id))
+        except Exception as e:
+            print(f"Erro na API OpenAI (stream): {str(e)}")
+            record_error(e, trace)
+            yield sse_event("error", error_body(e))
+        finally:
+            slot.release()
+
+        yield sse_event("done", {})
+
+    # Cliente que desconecta antes do primeiro byte: o gerador nem chega a rodar
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(slot.release)
+    )
+
+
+def _cached_response(request, body, stream=False):
+    """Resposta vinda do cache de respostas, em JSON ou como SSE."""
+    return _local_response(request, body, stream, {"X-Cache": "HIT"})
+
+
+def _routed_response(request, body, stream=False):
+    """Resposta montada pelo roteador local de intents, em JSON ou como SSE."""
+    return _local_response(request, body, stream, {"X-Intent-Router": body["router"]["intent"]})
+
+
+def _local_response(request, body, stream, headers):
+    """Resposta pronta (sem chamar a OpenAI), em JSON ou reproduzida como SSE."""
+    if stream:
+        return StreamingResponse(
+            replay_events(body), media_type="text/event-stream", headers={**SSE_HEADERS, **headers}
+        )
+    return _json_response(request, body, headers=headers)
+
+
+# ============================================================================
+# SESSÕES
+# ============================================================================
+
+async def create_session(request):
+    """Cria uma conversa no servidor e retorna seu id."""
+    rejected = await _rate_limit(request)
+    if rejected is not None:
+        return rejected
+    return JSONResponse({"session_id": await run_in_threadpool(sessions.create)}, status_code=201)
+
+
+async def delete_session(request):
+    """Encerra a conversa e descarta o histórico."""
+    session_id = request.path_params["session_id"]
+    if not await run_in_threadpool(sessions.delete, session_id):
+        return JSONResponse(session_not_found_body(session_id), status_code=404)
+    return Response(status_code=204)
+
+
+async def session_chat(request):
+    """Chat com histórico no servidor (mesmo contrato do server.py)."""
+    rejected = await _rate_limit(request)
+    if rejected is not None:
+        return rejected
+    session_id = request.path_params["session_id"]
+    # Backend sqlite bloqueia: as operações da sessão rodam fora do event loop
+    history = await run_in_threadpool(sessions.get, session_id)
+    if history is None:
+        return JSONResponse(session_not_found_body(session_id), status_code=404)
+
+    try:
+        payload = await _read_payload(request)
+        new_messages = payload.get("messages", [])
+        client_state = payload.get("client_state")
+        messages, context = await run_in_threadpool(
+            prepare_messages, {"messages": history + new_messages, "client_state": client_state}
+        )
+
+        def save(body):
+            sessions.append(session_id, turn_messages(new_messages, body))
+
+        routed = route_intent(messages, client_state)
+        if routed is not None:
+            await run_in_threadpool(save, routed)
+            routed["session_id"] = session_id
+            return _routed_response(request, routed, payload.get("stream"))
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            await run_in_threadpool(save, cached)
+            cached["session_id"] = session_id
+            return _cached_response(request, cached, payload.get("stream"))
+
+        if payload.get("stream"):
+            return await _stream_response(messages, context, client_state, on_complete=save)
+
+        async def complete():
+            body = await achat_with_server_tools(_routed_completion, messages, client_state, context)
+            response_cache.put(messages, body)
+            await run_in_threadpool(save, body)
+            return body
+
+        body = await inflight.do(request_key(f"session:{session_id}", await request.body()), complete)
+        body["session_id"] = session_id
+
+        return _json_response(request, body)
+
+    except Exception as e:
+        return _error_response(request, e)
+
+
+# ============================================================================
+# ESTADO DOS CONTRATOS
+# ============================================================================
+
+async def contract_state(request):
+    """Estado agregado do contrato de escrow (mesmo contrato do server.py)."""
+    address = request.path_params["address"]
+    try:
+        # Cliente JSON-RPC síncrono: roda no threadpool para não bloquear o loop
+        state = await run_in_threadpool(chain_state.get, address)
+    except ChainStateError as e:
+        return _chain_error_response(request, address, e)
+
+    headers = {"ETag": state.etag, "Cache-Control": "no-cache", "X-Block-Number": str(state.block)}
+    if not_modified(request.headers.get("if-none-match"), state.etag):
+        return Response(status_code=304, headers=headers)
+    return _json_response(request, state.response_body(), headers=headers)
+
+
+async def contract_events(request):
+    """Eventos do contrato via SSE (mesmo contrato do server.py)."""
+    address = request.path_params["address"]
+    loop = asyncio.get_running_loop()
+    # A thread do hub entrega numa fila thread-safe e acorda a corrotina pelo loop
+    items = queue.Queue(CHAIN_EVENTS_QUEUE_SIZE)
+    wake = asyncio.Event()
+
+    def deliver(item):
+        try:
+            items.put_nowait(item)
+        except queue.Full:
+            return False
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:  # loop já encerrado
+            pass
+        return True
+
+    try:
+        subscription = chain_events.subscribe(address, deliver)
+    except ChainStateError as e:
+        return _chain_error_response(request, address, e)
+    try:
+        initial, sent_block = await run_in_threadpool(
+            chain_events.initial_events,
+            subscription,
+            resume_block(request.headers.get("last-event-id"), request.query_params.get("from_block"))
+        )
+    except ChainStateError as e:
+        chain_events.unsubscribe(subscription)
+        return _chain_error_response(request, address, e)
+
+    async def generate():
+        block = sent_block
+        try:
+            for event in initial:
+                yield event
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), CHAIN_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                wake.clear()
+                if subscription.lagging:
+                    while not items.empty():
+                        items.get_nowait()
+                    event, block = await run_in_threadpool(chain_events.resync, subscription)
+                    yield event
+                    continue
+                while not items.empty():
+                    item = items.get_nowait()
+                    if item is not None and item[0] > block:
+                        block, event = item
+                        yield event
+        except ChainStateError as e:
+            # Fecha o stream; o EventSource reconecta com Last-Event-ID
+            print(f"Erro no stream de eventos de {address}: {str(e)}")
+        finally:
+            chain_events.unsubscribe(subscription)
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# ============================================================================
+# ÍNDICE DE CONTRATOS
+# ============================================================================
+
+async def list_contracts(request):
+    """Contratos do índice (mesmo contrato do server.py)."""
+    try:
+        return _json_response(request, await run_in_threadpool(contracts_page, request.query_params))
+    except ChainStateError as e:
+        return _chain_error_response(request, "(índice)", e)
+
+
+async def contract_history(request):
+    """Eventos do contrato gravados pelo indexador (mesmo contrato do server.py)."""
+    address = request.path_params["address"]
+    try:
+        return _json_response(request, await run_in_threadpool(history_page, address, request.query_params))
+    except ChainStateError as e:
+        return _chain_error_response(request, address, e)
+
+
+async def index_contract(request):
+    """Registra um contrato no índice (mesmo contrato do server.py)."""
+    try:
+        payload = await _read_payload(request)
+        body = await run_in_threadpool(lambda: contract_indexer.get().register_body(payload))
+        return _json_response(request, body, 202)
+    except PayloadError as e:
+        return _error_response(request, e)
+    except ChainStateError as e:
+        return _chain_error_response(request, payload.get("address"), e)
+
+
+# ============================================================================
+# REGISTRO DE ABIs
+# ============================================================================
+
+async def abi_index(request):
+    """ABIs e bytecodes conhecidos (mesmo contrato do server.py)."""
+    body = await run_in_threadpool(lambda: abi_registry.get().index())
+    return _json_response(request, body, headers={
+        "ETag": f'"{body["build"]}"', "Cache-Control": ABI_INDEX_CACHE_CONTROL
+    })
+
+
+async def abi_content(request):
+    """ABI pelo id (hash do conteúdo), com cache sem prazo (mesmo contrato do server.py)."""
+    abi_id = request.path_params["abi_id"]
+    headers = {"ETag": f'"{abi_id}"', "Cache-Control": ABI_CACHE_CONTROL}
+    if not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        body = await run_in_threadpool(lambda: abi_registry.get().get(abi_id))
+        return _json_response(request, body, headers=headers)
+    except ChainStateError as e:
+        return _chain_error_response(request, abi_id, e)
+
+
+async def contract_abi(request):
+    """ABI do contrato implantado no endereço (mesmo contrato do server.py)."""
+    address = request.path_params["address"]
+    try:
+        body = await run_in_threadpool(lambda: abi_registry.get().for_address(address))
+    except ChainStateError as e:
+        return _chain_error_response(request, address, e)
+    headers = {"ETag": f'"{body["id"]}"', "Cache-Control": ABI_ADDRESS_CACHE_CONTROL}
+    if not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return _json_response(request, body, headers=headers)
+
+
+def _chain_error_response(request, address, e):
+    print(f"Erro ao ler o contrato {address}: {str(e)}")
+    record_error(e)
+    return _json_response(request, chain_error_body(e), e.status)
+
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+# Referência da tarefa de aquecimento (o event loop só guarda referências fracas)
+_prewarm_task = None
+
+
+def _start_prewarm():
+    """Aquecimento em segundo plano (de novo pelo /readyz se a OpenAI estava inalcançável)."""
+    global _prewarm_task
+    if readiness.begin_attempt():
+        _prewarm_task = asyncio.get_running_loop().create_task(aprewarm(client))
+
+
+def _start_indexer():
+    """Thread do indexador de contratos (cria o contracts.db; start() é idempotente)."""
+    if INDEXER_ENABLED:
+        contract_indexer.get().start()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if PREWARM_ENABLED:
+        _start_prewarm()
+    await run_in_threadpool(_start_indexer)
+    yield
+
+
+# ============================================================================
+# APP
+# ============================================================================
+
+app = Starlette(
+    routes=[
+        Route("/", index, methods=["GET"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/readyz", readyz, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/prompt-cache", prompt_cache, methods=["GET"]),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+        Route("/sessions", create_session, methods=["POST"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+        Route("/sessions/{session_id}/chat", session_chat, methods=["POST"]),
+        Route("/contracts/{address}/state", contract_state, methods=["GET"]),
+        Route("/contracts", list_contracts, methods=["GET"]),
+        Route("/contracts/index", index_contract, methods=["POST"]),
+        Route("/contracts/{address}/events", contract_events, methods=["GET"]),
+        Route("/contracts/{address}/history", contract_history, methods=["GET"]),
+        Route("/contracts/{address}/abi", contract_abi, methods=["GET"]),
+        Route("/abi", abi_index, methods=["GET"]),
+        Route("/abi/{abi_id}", abi_content, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        # Permitir requisições do frontend (equivalente ao CORS(app) do Flask)
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    ],
+    lifespan=lifespan
+)
+
+mark_imported("asgi")
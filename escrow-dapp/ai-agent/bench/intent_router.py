@@ -0,0 +1,100 @@
+"""
+Deal-Fi AI Agent - Checagem do roteador local de intents
+Classifica frases conhecidas e confere o resultado com o esperado: comandos que
+devem ser roteados (intent, argumentos) e frases que precisam ir para o GPT
+(None) - em especial a ação oposta ("desconectar carteira" não pode virar
+connect_wallet) e pedidos de lista ("mostre meus contratos" é list_my_contracts,
+não a página de gerenciamento). Também mede a latência média do classify.
+
+Sai com código 1 se alguma frase divergir (para pegar regressões no CI).
+
+Uso (a partir de escrow-dapp/ai-agent):
+    python bench/intent_router.py
+    python bench/intent_router.py --verbose
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import INTENT_ROUTER_MIN_CONFIDENCE, classify  # noqa: E402
+
+CREATE = ("navigate_to_page", {"page": "create"})
+MANAGE = ("navigate_to_page", {"page": "manage"})
+HOME = ("go_home", {})
+CONNECT = ("connect_wallet", {})
+CURRENT = ("get_current_page", {})
+
+# (frase, (intent, argumentos) esperados ou None = vai para o GPT)
+CASES = [
+    ("voltar ao início", HOME),
+    ("go home", HOME),
+    ("ir para criar contrato", CREATE),
+    ("go to create contract", CREATE),
+    ("ir para gerenciar contratos", MANAGE),
+    ("abrir a página de meus contratos", MANAGE),
+    ("go to manage contracts", MANAGE),
+    ("open my contracts page", MANAGE),
+    ("conectar carteira", CONNECT),
+    ("Conectar carteira, por favor", CONNECT),
+    ("connect wallet", CONNECT),
+    ("link my wallet", CONNECT),
+    ("em qual página estou", CURRENT),
+    ("where am i", CURRENT),
+    # Ação oposta
+    ("disconnect wallet", None),
+    ("unlink wallet", None),
+    ("desconectar carteira", None),
+    ("desconecte a carteira", None),
+    ("desvincular carteira", None),
+    ("sair da carteira", None),
+    ("log out wallet", None),
+    # Pedidos de lista (tool list_my_contracts, no GPT)
+    ("show me my contracts", None),
+    ("mostre meus contratos", None),
+    ("ir para meus contratos", None),
+    ("my contracts", None),
+    # Perguntas, negações e dados
+    ("como conectar a carteira?", None),
+    ("não conectar carteira", None),
+    ("criar contrato para 0x71C7656EC7ab88b098defB751B7401B5f6d8976F", None),
+    ("homework", None),
+]
+
+
+def routed(text):
+    """(intent, argumentos) que o servidor roteia sem o GPT, ou None."""
+    match = classify(text)
+    if match is None or match[3] < INTENT_ROUTER_MIN_CONFIDENCE:
+        return None
+    return match[0], match[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checagem do roteador local de intents")
+    parser.add_argument("--verbose", action="store_true", help="mostra todas as frases, não só as divergentes")
+    parser.add_argument("--iterations", type=int, default=200, help="repetições para medir a latência")
+    args = parser.parse_args()
+
+    failures = 0
+    for text, expected in CASES:
+        got = routed(text)
+        ok = got == expected
+        failures += not ok
+        if args.verbose or not ok:
+            print(f"{'ok  ' if ok else 'FAIL'} {text!r}: esperado {expected}, obtido {got} ({classify(text)})")
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for text, _ in CASES:
+            classify(text)
+    per_call = (time.perf_counter() - started) / (args.iterations * len(CASES)) * 1e6
+    print(f"{len(CASES) - failures}/{len(CASES)} frases conferem; classify {per_call:.1f} µs por frase")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Deal-Fi AI Agent - Benchmark de concorrência
+Compara server.py (Flask) e asgi.py (Starlette + AsyncOpenAI) contra o stub local.
+
+Uso (a partir de escrow-dapp/ai-agent):
+    python bench/load_concurrency.py --concurrency 200 --requests 1000 --latency 1.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from openai_stub import add_stub_arguments, stub_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(BENCH_DIR)
+STUB_PORT = 8100
+
+TARGETS = {
+    "flask": [sys.executable, "server.py"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1",
+             "--port", "{port}", "--log-level", "warning", "--backlog", "2048"],
+}
+
+BODY = json.dumps({"messages": [{"role": "user", "content": "O que é escrow?"}]}).encode()
+
+
+def _wait_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {url}")
+
+
+def _proc_status(pid):
+    """Threads e RSS (MB) do processo, lidos de /proc (Linux)."""
+    threads, rss = 0, 0.0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+                elif line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return threads, rss
+
+
+def _one_request(url):
+    start = time.perf_counter()
+    req = urllib.request.Request(url, data=BODY, headers={"Content-Type": "application/json"})
+    try:
+        urllib.request.urlopen(req, timeout=120).read()
+        ok = True
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def run_target(name, stub_url, port, concurrency, total):
+    # Todas as requisições saem de 127.0.0.1: o limite por cliente mediria a si mesmo
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", OPENAI_BASE_URL=stub_url, PORT=str(port),
+               RATE_LIMIT_ENABLED="0")
+    cmd = [arg.format(port=port) for arg in TARGETS[name]]
+    proc = subprocess.Popen(cmd, cwd=AGENT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_ready(base + "/")
+
+        peak_threads, peak_rss = 0, 0.0
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(_one_request, base + "/chat") for _ in range(total)]
+            for future in futures:
+                while not future.done():
+                    threads, rss = _proc_status(proc.pid)
+                    peak_threads, peak_rss = max(peak_threads, threads), max(peak_rss, rss)
+                    time.sleep(0.05)
+                elapsed, ok = future.result()
+                latencies.append(elapsed)
+                errors += 0 if ok else 1
+        wall = time.perf_counter() - start
+
+        return {
+            "target": name,
+            "rps": total / wall,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "mean": statistics.mean(latencies),
+            "errors": errors,
+            "threads": peak_threads,
+            "rss": peak_rss,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência Flask vs ASGI")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--targets", default="flask,asgi")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    # Stub em processo separado para não disputar o GIL com o gerador de carga
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "openai_stub.py"), "--port", str(STUB_PORT)]
+        + stub_arguments(args),
+        stdout=subprocess.DEVNULL
+    )
+    stub_url = f"http://127.0.0.1:{STUB_PORT}/v1"
+
+    try:
+        print(f"concorrência={args.concurrency} requisições={args.requests} latência stub={args.latency}s")
+        print(f"{'alvo':<8}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>8}{'threads':>9}{'RSS MB':>9}")
+        for i, name in enumerate(args.targets.split(",")):
+            r = run_target(name, stub_url, 5600 + i, args.concurrency, args.requests)
+            print(f"{r['target']:<8}{r['rps']:>10.1f}{r['p50']:>9.3f}{r['p95']:>9.3f}"
+                  f"{r['p99']:>9.3f}{r['errors']:>8}{r['threads']:>9}{r['rss']:>9.1f}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
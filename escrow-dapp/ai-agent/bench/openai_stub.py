@@ -0,0 +1,345 @@
+"""
+Deal-Fi AI Agent - Stub da OpenAI
+Servidor local compatível com /v1/chat/completions para benchmarks offline.
+
+Comportamento configurável:
+- latência até o primeiro byte (--latency) e geração a --token-rate tokens/s;
+- respostas roteirizadas: a última mensagem do usuário vira as mesmas tool_calls
+  que o GPT pediria (navegar, preencher campos, marcos, carteira); resultados de
+  tools viram uma confirmação curta. --no-tools responde sempre com texto;
+- injeção de erros: --error-rate (fração das chamadas) com --error-status
+  (429 inclui retry-after-ms).
+
+GET /stats retorna os contadores de chamadas (usado pelo bench/replay.py para
+calcular chamadas ao upstream por turno do usuário).
+
+Uso:
+    python bench/openai_stub.py --port 8100 --latency 1.0 --token-rate 50
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python server.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Olá! Sou o assistente do Deal-Fi. Como posso ajudar?"
+EXPLANATION = (
+    "Escrow é um acordo em que o pagamento fica guardado num contrato inteligente até que as "
+    "condições combinadas sejam cumpridas. No Deal-Fi você define o recebedor, o valor em USDC, "
+    "o prazo e os marcos de liberação; cada marco libera uma parte do valor quando aprovado."
+)
+
+# ============================================================================
+# ROTEIRO (última mensagem do usuário -> tool_calls)
+# ============================================================================
+
+_NUMBERS = {"um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4, "cinco": 5,
+            "one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+_ADDRESS = re.compile(r"0x[a-fA-F0-9]{40}")
+_AMOUNT = re.compile(r"(\d[\d.,]*)\s*usdc")
+_DURATION = re.compile(r"(\d+)\s*(?:dias|days)")
+_ADD_MILESTONES = re.compile(r"(?:adicion\w*|add)\s+(?:mais\s+)?(\d+|um|uma|dois|duas|tres|quatro|cinco|"
+                             r"one|two|three|four|five|a|an)?\s*(?:novos?\s+)?(?:marcos?|milestones?)")
+_UPDATE_MILESTONE = re.compile(r"(?:marco|milestone)\s+(\d+)\s+(?:com|para|em|to|at|=)?\s*(\d+)\s*%")
+_REMOVE_MILESTONE = re.compile(r"(?:remov\w*|exclu\w*|delete|remove)\s+(?:o\s+|the\s+)?(?:marco|milestone)\s+(\d+)")
+_LIST_CONTRACTS = re.compile(r"(?:quais|list\w*|mostr\w*|show|what are) (?:sao |sao os |os |me )?(?:meus|my) contra(?:t|ct)")
+_RULES = [
+    (re.compile(r"criar contrato|novo contrato|create (?:a )?contract|new contract"),
+     "navigate_to_page", {"page": "create"}),
+    (re.compile(r"gerenciar|meus contratos|manage|my contracts"), "navigate_to_page", {"page": "manage"}),
+    (re.compile(r"pagina inicial|inicio|home"), "go_home", {}),
+    (re.compile(r"status da carteira|carteira (?:esta )?conectada|wallet status|is my wallet"),
+     "get_wallet_status", {}),
+    (re.compile(r"conect\w* (?:a |minha )?carteira|connect (?:my )?wallet"), "connect_wallet", {}),
+    (re.compile(r"formulario|campos|form fields|the form"), "get_form_fields", {}),
+    (re.compile(r"quais (?:sao )?os marcos|mostr\w* (?:os )?marcos|show (?:the )?milestones"), "get_milestones", {}),
+]
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _tool_call(name, args):
+    return {
+        "id": f"call_stub_{uuid.uuid4().hex[:16]}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(args)}
+    }
+
+
+def scripted_tool_calls(text):
+    """Tool_calls que o GPT pediria para a mensagem do usuário (lista vazia = resposta em texto)."""
+    normalized = _normalize(text)
+    if _LIST_CONTRACTS.search(normalized):
+        return [_tool_call("list_my_contracts", {})]
+    calls = [_tool_call(name, dict(args)) for pattern, name, args in _RULES if pattern.search(normalized)]
+
+    address = _ADDRESS.search(text)
+    if address:
+        calls.append(_tool_call("fill_form_field", {"field": "payeeAddress", "value": address.group(0)}))
+    amount = _AMOUNT.search(normalized)
+    if amount:
+        calls.append(_tool_call("fill_form_field", {"field": "amount", "value": amount.group(1)}))
+    duration = _DURATION.search(normalized)
+    if duration:
+        calls.append(_tool_call("fill_form_field", {"field": "duration", "value": duration.group(1)}))
+
+    added = _ADD_MILESTONES.search(normalized)
+    if added:
+        count = added.group(1) or "1"
+        count = int(count) if count.isdigit() else _NUMBERS.get(count, 1)
+        calls += [_tool_call("add_milestone", {}) for _ in range(count)]
+    for index, percentage in _UPDATE_MILESTONE.findall(normalized):
+        calls.append(_tool_call("update_milestone", {"index": int(index) - 1, "percentage": int(percentage)}))
+    for index in _REMOVE_MILESTONE.findall(normalized):
+        calls.append(_tool_call("remove_milestone", {"index": int(index) - 1}))
+    return calls
+
+
+def scripted_message(messages, tools_enabled=True):
+    """Mensagem do assistente para a conversa: (content, tool_calls)."""
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        results = []
+        for message in reversed(messages):
+            if message.get("role") != "tool":
+                break
+            results.append(str(message.get("content") or "").split("\n")[0])
+        return "Pronto! " + " ".join(reversed(results)), None
+
+    text = last.get("content") if isinstance(last.get("content"), str) else ""
+    calls = scripted_tool_calls(text) if tools_enabled else []
+    if calls:
+        return None, calls
+    if "?" in text and len(text) > 20:
+        return EXPLANATION, None
+    return REPLY, None
+
+
+def _tokens(text):
+    """Estimativa grosseira de tokens (~4 caracteres por token)."""
+    return max(1, len(text) // 4)
+
+
+def _usage(body, content, tool_calls):
+    prompt = _tokens(json.dumps(body.get("messages", [])) + json.dumps(body.get("tools") or []))
+    completion = _tokens((content or "") + json.dumps(tool_calls or []))
+    cached = prompt // 128 * 128 if prompt >= 1024 else 0
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": cached}
+    }
+
+
+def _completion(model, content=REPLY, tool_calls=None, usage=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "tool_calls": tool_calls},
+            "finish_reason": "tool_calls" if tool_calls else "stop"
+        }],
+        "usage": usage or {
+            "prompt_tokens": 2500,
+            "completion_tokens": 12,
+            "total_tokens": 2512,
+            "prompt_tokens_details": {"cached_tokens": 2304}
+        }
+    }
+
+
+def _chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responde /chat/completions conforme as opções do `StubServer`."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.stats())
+        elif self.path.rstrip("/").endswith("/models"):
+            # Usado pelo prewarm do servidor (startup.py) para abrir a conexão
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "gpt-4o", "object": "model", "created": 0, "owned_by": "stub"}
+            ]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        model = body.get("model", "gpt-4o")
+
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        status = self.server.record_call(model)
+        time.sleep(self.server.latency)
+        if status:
+            headers = {"retry-after-ms": "200"} if status == 429 else {}
+            error = {"message": f"Erro injetado pelo stub ({status})", "type": "stub_error", "code": None}
+            self._send_json(status, {"error": error}, headers)
+            return
+
+        content, tool_calls = scripted_message(body.get("messages", []), self.server.tools_enabled)
+        if tool_calls:
+            self.server.record_tool_calls(len(tool_calls))
+        usage = _usage(body, content, tool_calls)
+
+        if body.get("stream"):
+            self._send_stream(model, content, tool_calls, usage)
+            return
+
+        if self.server.token_rate:
+            time.sleep(usage["completion_tokens"] / self.server.token_rate)
+        self._send_json(200, _completion(model, content, tool_calls, usage))
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model, content, tool_calls, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        events = [_chunk(model, {"role": "assistant", "content": ""})]
+        if tool_calls:
+            for i, tc in enumerate(tool_calls):
+                events.append(_chunk(model, {"tool_calls": [dict(tc, index=i)]}))
+        else:
+            events += [_chunk(model, {"content": word + " "}) for word in content.split()]
+        events.append(_chunk(model, {}, "tool_calls" if tool_calls else "stop"))
+        events.append(dict(_chunk(model, {}), choices=[], usage=usage))
+
+        # Cada palavra ~ 1 token (ou uma tool_call inteira ~ seus tokens)
+        delay = 1 / self.server.token_rate if self.server.token_rate else 0
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency, token_rate=0.0, tools_enabled=True,
+                 error_rate=0.0, error_status=500, seed=None):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tools_enabled = tools_enabled
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._tool_calls = 0
+        self._by_model = {}
+
+    def record_call(self, model):
+        """Conta a chamada e retorna o status do erro a injetar (ou None)."""
+        with self._lock:
+            self._calls += 1
+            self._by_model[model] = self._by_model.get(model, 0) + 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self._errors += 1
+                return self.error_status
+        return None
+
+    def record_tool_calls(self, count):
+        with self._lock:
+            self._tool_calls += count
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "errors_injected": self._errors,
+                "tool_calls": self._tool_calls,
+                "by_model": dict(self._by_model)
+            }
+
+
+def start_stub(port=0, latency=1.0, **options):
+    """Sobe o stub numa thread e retorna o servidor (porta em server.server_port)."""
+    server = StubServer(("127.0.0.1", port), latency, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser):
+    """Opções do stub (compartilhadas com os drivers de benchmark)."""
+    parser.add_argument("--latency", type=float, default=1.0, help="segundos até o primeiro byte")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="tokens/s gerados (0 = instantâneo)")
+    parser.add_argument("--no-tools", action="store_true", help="responde sempre com texto, sem tool_calls")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração das chamadas com erro")
+    parser.add_argument("--error-status", type=int, default=500, help="status HTTP dos erros injetados")
+    parser.add_argument("--seed", type=int, default=None, help="semente da injeção de erros")
+
+
+def stub_arguments(args):
+    """Argumentos de linha de comando para subir o stub em outro processo."""
+    argv = ["--latency", str(args.latency), "--token-rate", str(args.token_rate),
+            "--error-rate", str(args.error_rate), "--error-status", str(args.error_status)]
+    if args.no_tools:
+        argv.append("--no-tools")
+    if args.seed is not None:
+        argv += ["--seed", str(args.seed)]
+    return argv
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local da API da OpenAI")
+    parser.add_argument("--port", type=int, default=8100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Stub OpenAI em http://127.0.0.1:{args.port}/v1 (latência {args.latency}s, "
+          f"{args.token_rate or '∞'} tokens/s, erros {args.error_rate:.0%} → {args.error_status})")
+    StubServer(
+        ("127.0.0.1", args.port), args.latency, token_rate=args.token_rate, tools_enabled=not args.no_tools,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed
+    ).serve_forever()
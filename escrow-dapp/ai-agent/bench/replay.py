@@ -0,0 +1,355 @@
+"""
+Deal-Fi AI Agent - Replay de conversas
+Reexecuta o corpus de conversas gravadas (bench/conversations.json) contra o
+/chat, simulando o navegador: as tool_calls devolvidas são executadas num estado
+local (página, formulário, marcos, carteira) com os mesmos textos do
+ai-chat-service.js e os resultados voltam ao agente, como no frontend.
+
+Métricas por alvo:
+- turnos do usuário/s e requisições HTTP/s;
+- p50/p95/p99 da latência por turno (todas as rodadas de tools) e por requisição;
+- bytes enviados e recebidos por turno;
+- chamadas ao upstream (stub) por turno do usuário.
+
+Uso (a partir de escrow-dapp/ai-agent):
+    python bench/replay.py --concurrency 20 --repeat 10 --latency 0.5 --token-rate 80
+    python bench/replay.py --targets asgi --mode session --error-rate 0.05 --error-status 429
+    python bench/replay.py --url http://127.0.0.1:5000 --stub-url http://127.0.0.1:8100/v1
+"""
+
+import argparse
+import gzip
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from load_concurrency import AGENT_DIR, BENCH_DIR, STUB_PORT, TARGETS, _percentile, _wait_ready
+from openai_stub import add_stub_arguments, stub_arguments
+
+CORPUS = os.path.join(BENCH_DIR, "conversations.json")
+MAX_TOOL_ROUNDS = 5  # mesmo limite do ai-chat-service.js
+WALLET_ADDRESS = "0x1234567890abcdef1234567890abcdef12345678"
+
+PAGE_NAMES = {"home": "página inicial", "create": "criação de contrato", "manage": "gerenciamento de contratos"}
+CREATE_ONLY = {
+    "get_form_fields": "ver os campos do formulário", "get_milestones": "ver os marcos",
+    "fill_form_field": "preencher campos", "add_milestone": "adicionar marcos",
+    "update_milestone": "atualizar marcos", "remove_milestone": "remover marcos"
+}
+FIELD_NAMES = {"payeeAddress": "Endereço do Recebedor", "amount": "Valor (USDC)", "duration": "Prazo (dias)"}
+
+# ============================================================================
+# NAVEGADOR SIMULADO
+# ============================================================================
+
+class Browser:
+    """Estado do frontend e execução das tools do navegador (ai-chat-service.js)."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.page = state.get("page", "home")
+        self.form = dict({"payeeAddress": "", "amount": "", "duration": ""}, **state.get("form", {}))
+        self.milestones = list(state.get("milestones", [100]))
+        self.wallet = state.get("wallet")
+
+    def client_state(self):
+        return {
+            "page": self.page,
+            "form": dict(self.form),
+            "milestones": [{"percentage": p} for p in self.milestones],
+            "wallet": {"connected": bool(self.wallet), "address": self.wallet}
+        }
+
+    def _milestones_message(self):
+        if not self.milestones:
+            return "Nenhum marco configurado."
+        try:
+            amount = float(self.form["amount"] or 0)
+        except ValueError:
+            amount = 0.0
+        total = sum(self.milestones)
+        listed = ", ".join(
+            f"Marco {i + 1}: {p}% ({amount * p / 100:.2f} USDC)" for i, p in enumerate(self.milestones)
+        )
+        return f"Marcos: {listed}. Total: {total}%{' (válido)' if total == 100 else ' (deve somar 100%)'}."
+
+    def _redistribute(self, count):
+        share = 100 // count
+        self.milestones = [share] * (count - 1) + [100 - share * (count - 1)]
+
+    def execute(self, name, args):
+        """Resultado da tool, com os mesmos textos do frontend."""
+        if name == "navigate_to_page":
+            page = args.get("page")
+            if page not in PAGE_NAMES:
+                return f"Página inválida: {page}. Páginas válidas: home, create, manage"
+            self.page = page
+            return f"Navegou para {PAGE_NAMES[page]}."
+        if name == "go_home":
+            self.page = "home"
+            return "Navegou para a página inicial."
+        if name == "connect_wallet":
+            if self.wallet:
+                return f"Carteira já está conectada: {self.wallet[:6]}...{self.wallet[38:]}"
+            self.wallet = WALLET_ADDRESS
+            return (f"✅ Carteira conectada com sucesso! Endereço: {self.wallet[:6]}...{self.wallet[38:]}\n\n"
+                    "O MetaMask pode ter aberto uma janela para aprovação. Se ainda não conectou, verifique a extensão.")
+        if name == "get_wallet_status":
+            if self.wallet:
+                return f"✅ Carteira conectada\nEndereço: {self.wallet[:6]}...{self.wallet[38:]}\nEndereço completo: {self.wallet}"
+            return '❌ Carteira não conectada. Use "conectar carteira" para conectar sua MetaMask.'
+        if name == "list_my_contracts":
+            if not self.wallet:
+                return '❌ Carteira não conectada. Use "conectar carteira" para ver seus contratos.'
+            return "Nenhum contrato encontrado para a sua carteira no Deal-Fi."
+        if name == "get_current_page":
+            return {"home": "Você está na página inicial.",
+                    "create": "Você está na página de criação de contratos.",
+                    "manage": "Você está na página de gerenciamento de contratos."}[self.page]
+
+        if name in CREATE_ONLY and self.page != "create":
+            return f"Você precisa estar na página de criação de contrato para {CREATE_ONLY[name]}."
+        if name == "get_form_fields":
+            return (f"📋 Estado do Formulário:\n• Endereço do Recebedor: {self.form['payeeAddress'] or '(vazio)'}\n"
+                    f"• Valor Total: {self.form['amount'] or '(vazio)'} USDC\n"
+                    f"• Prazo: {self.form['duration'] or '(vazio)'} dias\n\n{self._milestones_message()}")
+        if name == "get_milestones":
+            return self._milestones_message()
+        if name == "fill_form_field":
+            field = args.get("field")
+            if field not in FIELD_NAMES:
+                return f"Campo inválido: {field}. Campos disponíveis: payeeAddress, amount, duration"
+            self.form[field] = str(args.get("value"))
+            return f"{FIELD_NAMES[field]} preenchido com: {args.get('value')}"
+        if name == "add_milestone":
+            if len(self.milestones) >= 10:
+                return "Erro: Máximo de 10 marcos permitidos."
+            self._redistribute(len(self.milestones) + 1)
+            return f"Marco adicionado! {self._milestones_message()}"
+        if name in ("update_milestone", "remove_milestone"):
+            index = args.get("index", -1)
+            if not 0 <= index < len(self.milestones):
+                return f"Erro: Índice inválido. Marcos disponíveis: 0 a {len(self.milestones) - 1}."
+            if name == "remove_milestone":
+                if len(self.milestones) <= 1:
+                    return "Erro: Não é possível remover o último marco. Deve haver pelo menos um marco."
+                del self.milestones[index]
+                self._redistribute(len(self.milestones))
+                return f"Marco {index + 1} removido! {self._milestones_message()}"
+            percentage = args.get("percentage", 0)
+            if not 1 <= percentage <= 100:
+                return "Erro: Percentual deve estar entre 1 e 100."
+            self.milestones[index] = percentage
+            return f"Marco {index + 1} atualizado para {percentage}%! {self._milestones_message()}"
+        return f"Função {name} não implementada."
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def _post(url, payload, headers=None):
+    """(status, corpo decodificado, bytes enviados, bytes recebidos no fio, segundos)."""
+    data = json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json", **(headers or {})})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            raw, status, encoding = resp.read(), resp.status, resp.headers.get("Content-Encoding")
+    except urllib.error.HTTPError as e:
+        raw, status, encoding = e.read(), e.code, e.headers.get("Content-Encoding")
+    elapsed = time.perf_counter() - start
+    received = len(raw)
+    if encoding == "gzip":
+        raw = gzip.decompress(raw)
+    try:
+        body = json.loads(raw)
+    except ValueError:
+        body = None
+    return status, body, len(data), received, elapsed
+
+
+def replay_conversation(base, conversation, mode, headers=None):
+    """Reexecuta uma conversa; retorna a lista de turnos medidos."""
+    browser = Browser(conversation.get("state"))
+    history = []
+    url = base + "/chat"
+    if mode == "session":
+        status, body, _, _, _ = _post(base + "/sessions", {}, headers)
+        url = f"{base}/sessions/{body['session_id']}/chat"
+
+    turns = []
+    for text in conversation["turns"]:
+        turn = {"requests": [], "sent": 0, "received": 0, "ok": True}
+        new_messages = [{"role": "user", "content": text}]
+        started = time.perf_counter()
+        for _ in range(MAX_TOOL_ROUNDS + 1):
+            history += new_messages
+            payload = {"messages": new_messages if mode == "session" else history,
+                       "client_state": browser.client_state()}
+            status, body, sent, received, elapsed = _post(url, payload, headers)
+            turn["requests"].append(elapsed)
+            turn["sent"] += sent
+            turn["received"] += received
+            if status != 200 or not body or "choices" not in body:
+                turn["ok"] = False
+                break
+
+            history += body.get("server_messages") or []
+            message = body["choices"][0]["message"]
+            history.append(message)
+            tool_calls = message.get("tool_calls") or []
+            if not tool_calls:
+                break
+            new_messages = [{
+                "role": "tool",
+                "tool_call_id": tc["id"],
+                "content": browser.execute(tc["function"]["name"], json.loads(tc["function"]["arguments"] or "{}"))
+            } for tc in tool_calls]
+        turn["seconds"] = time.perf_counter() - started
+        turns.append(turn)
+        if not turn["ok"]:
+            break
+    return turns
+
+
+def _stub_calls(stub_url):
+    if not stub_url:
+        return None
+    with urllib.request.urlopen(stub_url.rstrip("/") + "/stats", timeout=5) as resp:
+        return json.loads(resp.read())["calls"]
+
+
+def run_replay(base, corpus, concurrency, repeat, mode, stub_url=None, headers=None):
+    jobs = [conversation for _ in range(repeat) for conversation in corpus]
+    calls_before = _stub_calls(stub_url)
+    lock = threading.Lock()
+    turns = []
+
+    def job(conversation):
+        measured = replay_conversation(base, conversation, mode, headers)
+        with lock:
+            turns.extend(measured)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(job, conversation) for conversation in jobs]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    calls = None if calls_before is None else _stub_calls(stub_url) - calls_before
+    turn_latencies = [t["seconds"] for t in turns if t["ok"]]
+    request_latencies = [r for t in turns for r in t["requests"]]
+    count = len(turns) or 1
+    return {
+        "conversations": len(jobs),
+        "turns": len(turns),
+        "requests": len(request_latencies),
+        "errors": sum(1 for t in turns if not t["ok"]),
+        "turns_per_s": len(turns) / wall,
+        "requests_per_s": len(request_latencies) / wall,
+        "turn_p50": _percentile(turn_latencies, 50),
+        "turn_p95": _percentile(turn_latencies, 95),
+        "turn_p99": _percentile(turn_latencies, 99),
+        "request_p50": _percentile(request_latencies, 50),
+        "request_p95": _percentile(request_latencies, 95),
+        "request_p99": _percentile(request_latencies, 99),
+        "sent_per_turn": sum(t["sent"] for t in turns) / count,
+        "received_per_turn": sum(t["received"] for t in turns) / count,
+        "requests_per_turn": len(request_latencies) / count,
+        "upstream_calls_per_turn": None if calls is None else calls / count,
+    }
+
+
+def run_target(name, stub_url, port, args, corpus):
+    # Todas as requisições saem de 127.0.0.1: o limite por cliente mediria a si mesmo
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", OPENAI_BASE_URL=stub_url, PORT=str(port),
+               RATE_LIMIT_ENABLED="0")
+    cmd = [arg.format(port=port) for arg in TARGETS[name]]
+    proc = subprocess.Popen(cmd, cwd=AGENT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_ready(base + "/")
+        return run_replay(base, corpus, args.concurrency, args.repeat, args.mode, stub_url, _headers(args))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _headers(args):
+    """Headers opcionais: resposta enxuta e compressão gzip."""
+    headers = {}
+    if args.lean:
+        headers["Prefer"] = "return=minimal"
+    if args.gzip:
+        headers["Accept-Encoding"] = "gzip"
+    return headers
+
+
+def _print_row(name, r):
+    upstream = "-" if r["upstream_calls_per_turn"] is None else f"{r['upstream_calls_per_turn']:.2f}"
+    print(f"{name:<8}{r['turns_per_s']:>9.1f}{r['requests_per_s']:>9.1f}{r['turn_p50']:>8.3f}"
+          f"{r['turn_p95']:>8.3f}{r['turn_p99']:>8.3f}{r['request_p50']:>8.3f}{r['request_p99']:>8.3f}"
+          f"{r['sent_per_turn']:>9.0f}{r['received_per_turn']:>9.0f}{r['requests_per_turn']:>7.2f}"
+          f"{upstream:>9}{r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay do corpus de conversas contra o /chat")
+    parser.add_argument("--concurrency", type=int, default=20, help="conversas simultâneas")
+    parser.add_argument("--repeat", type=int, default=5, help="repetições do corpus")
+    parser.add_argument("--mode", choices=["chat", "session"], default="chat",
+                        help="/chat com histórico completo ou /sessions/<id>/chat")
+    parser.add_argument("--lean", action="store_true", help="pede a resposta enxuta (Prefer: return=minimal)")
+    parser.add_argument("--gzip", action="store_true", help="aceita respostas gzip (bytes medidos no fio)")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--targets", default="flask,asgi")
+    parser.add_argument("--url", help="agente já em execução (ignora --targets e não sobe o stub)")
+    parser.add_argument("--stub-url", help="stub já em execução, para contar chamadas com --url")
+    parser.add_argument("--json", dest="json_path", help="grava os resultados neste arquivo")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+    print(f"{len(corpus)} conversas x {args.repeat}, concorrência={args.concurrency}, modo={args.mode}, "
+          f"latência stub={args.latency}s, {args.token_rate or '∞'} tokens/s, erros={args.error_rate:.0%}")
+    header = (f"{'alvo':<8}{'turno/s':>9}{'req/s':>9}{'t.p50':>8}{'t.p95':>8}{'t.p99':>8}{'r.p50':>8}"
+              f"{'r.p99':>8}{'env/t':>9}{'rec/t':>9}{'req/t':>7}{'upstr/t':>9}{'erros':>7}")
+
+    results = {}
+    if args.url:
+        print(header)
+        results["url"] = run_replay(args.url.rstrip("/"), corpus, args.concurrency, args.repeat,
+                                    args.mode, args.stub_url, _headers(args))
+        _print_row("url", results["url"])
+    else:
+        # Stub em processo separado para não disputar o GIL com o gerador de carga
+        stub = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "openai_stub.py"), "--port", str(STUB_PORT)]
+            + stub_arguments(args),
+            stdout=subprocess.DEVNULL
+        )
+        stub_url = f"http://127.0.0.1:{STUB_PORT}/v1"
+        try:
+            _wait_ready(stub_url + "/stats")
+            print(header)
+            for i, name in enumerate(args.targets.split(",")):
+                results[name] = run_target(name, stub_url, 5600 + i, args, corpus)
+                _print_row(name, results[name])
+        finally:
+            stub.terminate()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
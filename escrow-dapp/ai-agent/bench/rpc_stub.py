@@ -0,0 +1,350 @@
+"""
+Deal-Fi AI Agent - Stub JSON-RPC
+Nó local mínimo (eth_blockNumber, eth_chainId, eth_call, eth_getLogs,
+eth_getBlockByNumber, eth_getCode) com contratos de escrow simulados, para testar o
+/contracts/<endereço>/state, o /contracts/<endereço>/events e o indexador
+(contract_index.py) sem a Polygon.
+
+- aceita requisições em lote (array JSON-RPC);
+- um bloco novo a cada --block-time segundos;
+- eth_call responde às funções de leitura do escrowABI.js a partir do estado
+  simulado (StubContract); endereço sem contrato devolve "0x";
+- eth_getCode devolve o bytecode do frontend/src/contracts/bytecode.js (para o
+  registro de ABIs, abi_registry.py);
+- deposit/release (ou --activity) alteram o estado e emitem os logs
+  Deposited/MilestoneReleased no bloco atual, servidos pelo eth_getLogs;
+- --history N gera logs sintéticos nos N blocos anteriores (taxa, confirmações,
+  depósito e marcos de cada contrato);
+- reorg(profundidade) troca o hash dos últimos blocos e descarta os logs deles;
+- GET /stats retorna requisições HTTP e chamadas por método.
+
+Uso:
+    python bench/rpc_stub.py --port 8545 --contracts 3 --block-time 2
+    python bench/rpc_stub.py --activity 10   # um depósito/liberação a cada 10 s
+    python bench/rpc_stub.py --contracts 200 --history 20000   # histórico para o indexador
+    CHAIN_RPC_URL=http://127.0.0.1:8545 python server.py
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from abi import encode_word, event_topic, function_selector, keccak256  # noqa: E402
+
+CHAIN_ID = 137
+
+
+class StubContract:
+    """Estado de um contrato de escrow (Novo_Escrow.sol) em unidades do token."""
+
+    def __init__(self, payer, payee, total_amount=1_500_000_000, percentages=(30, 40, 30), deadline=None):
+        self.payer = payer
+        self.payee = payee
+        self.total_amount = total_amount
+        self.deadline = deadline or int(time.time()) + 30 * 86400
+        self.deposited = False
+        self.platform_fee_paid = False
+        self.confirmed_payer = False
+        self.confirmed_payee = False
+        self.balance = 0
+        self.milestones = [[p, total_amount * p // 100, False] for p in percentages]
+        self.settlement_amount = 0
+        self.settlement_approved = False
+        self.cancel_approved_payer = False
+        self.cancel_approved_payee = False
+
+    def deposit(self):
+        self.deposited = True
+        self.balance = self.total_amount
+        return "Deposited(address,uint256)", [self.payer], [self.total_amount]
+
+    def release(self, index):
+        self.milestones[index][2] = True
+        self.balance -= self.milestones[index][1]
+        return "MilestoneReleased(uint256,uint256)", [index], [self.milestones[index][1]]
+
+    def pay_fee(self):
+        self.platform_fee_paid = True
+        return "PlatformFeePaid(address,uint256)", [self.payer], [1_000_000]
+
+    def confirm(self, party):
+        if party == "payer":
+            self.confirmed_payer = True
+            return "ConfirmedPayer(address)", [self.payer], []
+        self.confirmed_payee = True
+        return "ConfirmedPayee(address)", [self.payee], []
+
+    def next_action(self):
+        """Próxima transação do fluxo (taxa, confirmações, depósito e marcos), ou None no fim."""
+        if not self.platform_fee_paid:
+            return self.pay_fee
+        if not self.confirmed_payer:
+            return lambda: self.confirm("payer")
+        if not self.confirmed_payee:
+            return lambda: self.confirm("payee")
+        if not self.deposited:
+            return self.deposit
+        for index, (_, _, released) in enumerate(self.milestones):
+            if not released:
+                return lambda: self.release(index)
+        return None
+
+    def call(self, data):
+        """Retorno ABI (hex) da função chamada em `data`."""
+        selector, args = data[:10], data[10:]
+        handler = _HANDLERS.get(selector)
+        if handler is None:
+            raise ValueError("execution reverted")
+        return "0x" + "".join(encode_word(v) for v in handler(self, args))
+
+
+def _milestone(contract, args):
+    index = int(args[:64], 16)
+    if index >= len(contract.milestones):
+        raise ValueError("execution reverted: Indice invalido")
+    return contract.milestones[index]
+
+
+_HANDLERS = {
+    function_selector("getContractInfo()"): lambda c, _: [
+        c.payer, c.payee, c.total_amount, c.deadline, c.deposited, c.platform_fee_paid,
+        c.confirmed_payer, c.confirmed_payee, c.balance
+    ],
+    function_selector("settlementAmount()"): lambda c, _: [c.settlement_amount],
+    function_selector("settlementApproved()"): lambda c, _: [c.settlement_approved],
+    function_selector("cancelApprovedPayer()"): lambda c, _: [c.cancel_approved_payer],
+    function_selector("cancelApprovedPayee()"): lambda c, _: [c.cancel_approved_payee],
+    function_selector("getTotalMilestones()"): lambda c, _: [len(c.milestones)],
+    function_selector("getMilestoneInfo(uint256)"): _milestone,
+    function_selector("getBalance()"): lambda c, _: [c.balance],
+}
+
+
+_CODE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "frontend", "src", "contracts", "bytecode.js"
+)
+_code = None
+
+
+def escrow_code():
+    """Bytecode do contrato de escrow do frontend (um dispatcher mínimo se o arquivo não existir)."""
+    global _code
+    if _code is None:
+        try:
+            with open(_CODE_PATH, encoding="utf-8") as f:
+                _code = "0x" + re.search(r"[\"']([0-9a-fA-F]{64,})[\"']", f.read()).group(1)
+        except (OSError, AttributeError):
+            _code = "0x" + "".join(f"63{selector[2:]}" for selector in _HANDLERS) + "00"
+    return _code
+
+
+class RpcHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(self.server.stats())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"null")
+        self.server.record_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if isinstance(request, list):
+            self._send_json([self.server.dispatch(item) for item in request])
+        else:
+            self._send_json(self.server.dispatch(request))
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class RpcStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, block_time=2.0, latency=0.0):
+        super().__init__(address, RpcHandler)
+        self.block_time = block_time
+        self.latency = latency
+        self.contracts = {}  # endereço (minúsculas) -> StubContract
+        self.started = time.monotonic()
+        self.base_block = 50_000_000
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._calls = {}
+        self.logs = []
+        self._forks = [(0, 0)]  # (a partir do bloco, id do fork): entra no hash dos blocos
+
+    def block_hash(self, number):
+        fork = max(fork_id for start, fork_id in self._forks if start <= number)
+        return "0x" + keccak256(f"{number}:{fork}").hex()
+
+    def transact(self, address, action, *args, block=None):
+        """Executa uma ação do contrato (ex.: "deposit") e registra o log no bloco atual (ou `block`)."""
+        contract = self.contracts[address.lower()]
+        signature, indexed, data = getattr(contract, action)(*args) if isinstance(action, str) else action()
+        number = self.block_number() if block is None else block
+        with self._lock:
+            self.logs.append({
+                "address": address.lower(),
+                "topics": [event_topic(signature)] + ["0x" + encode_word(v) for v in indexed],
+                "data": "0x" + "".join(encode_word(v) for v in data),
+                "blockNumber": hex(number),
+                "blockHash": self.block_hash(number),
+                "transactionHash": "0x" + encode_word(len(self.logs) + 1),
+                "logIndex": hex(len(self.logs)),
+                "removed": False
+            })
+
+    def seed_history(self, blocks):
+        """
+        Logs sintéticos nos `blocks` blocos anteriores ao atual: cada contrato avança
+        até uma etapa diferente do fluxo (taxa, confirmações, depósito e marcos).
+        """
+        head = self.block_number()
+        for i, address in enumerate(list(self.contracts)):
+            contract = self.contracts[address]
+            steps = i % (5 + len(contract.milestones))
+            rng = random.Random(i)
+            for block in sorted(rng.randrange(head - blocks, head) for _ in range(steps)):
+                self.transact(address, contract.next_action(), block=block)
+        self.logs.sort(key=lambda log: int(log["blockNumber"], 16))
+
+    def reorg(self, depth):
+        """Troca o hash dos últimos `depth` blocos e descarta os logs deles (como numa reorg)."""
+        start = self.block_number() - depth + 1
+        with self._lock:
+            self._forks.append((start, len(self._forks)))
+            self.logs = [log for log in self.logs if int(log["blockNumber"], 16) < start]
+
+    def get_logs(self, query):
+        addresses = query.get("address") or []
+        addresses = {a.lower() for a in ([addresses] if isinstance(addresses, str) else addresses)}
+        from_block = int(query.get("fromBlock", "0x0"), 16)
+        to_block = self.block_number() if query.get("toBlock") in (None, "latest") else int(query["toBlock"], 16)
+        with self._lock:
+            return [log for log in self.logs
+                    if (not addresses or log["address"] in addresses)
+                    and from_block <= int(log["blockNumber"], 16) <= to_block]
+
+    def add_contract(self, address, contract):
+        self.contracts[address.lower()] = contract
+        return contract
+
+    def block_number(self):
+        if not self.block_time:
+            return self.base_block
+        return self.base_block + int((time.monotonic() - self.started) / self.block_time)
+
+    def simulate(self, interval):
+        """A cada `interval` segundos executa a próxima transação de um dos contratos."""
+        for address in itertools.cycle(list(self.contracts)):
+            time.sleep(interval)
+            action = self.contracts[address].next_action()
+            if action is not None:
+                self.transact(address, action)
+
+    def mine(self, blocks=1):
+        """Avança `blocks` blocos (útil com --block-time 0)."""
+        self.base_block += blocks
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def dispatch(self, request):
+        method, params = request.get("method"), request.get("params") or []
+        with self._lock:
+            self._calls[method] = self._calls.get(method, 0) + 1
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            if method == "eth_blockNumber":
+                reply["result"] = hex(self.block_number())
+            elif method == "eth_chainId":
+                reply["result"] = hex(CHAIN_ID)
+            elif method == "eth_call":
+                contract = self.contracts.get(params[0]["to"].lower())
+                reply["result"] = contract.call(params[0]["data"]) if contract else "0x"
+            elif method == "eth_getCode":
+                reply["result"] = escrow_code() if params[0].lower() in self.contracts else "0x"
+            elif method == "eth_getLogs":
+                reply["result"] = self.get_logs(params[0])
+            elif method == "eth_getBlockByNumber":
+                number = self.block_number() if params[0] == "latest" else int(params[0], 16)
+                reply["result"] = None if number > self.block_number() else {
+                    "number": hex(number), "hash": self.block_hash(number), "transactions": []
+                }
+            else:
+                reply["error"] = {"code": -32601, "message": f"Método não suportado: {method}"}
+        except ValueError as e:
+            reply["error"] = {"code": 3, "message": str(e)}
+        return reply
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self._requests, "calls": dict(self._calls), "block": self.block_number()}
+
+
+DEMO_WALLETS = ["0x8ba1f109551bD432803012645Ac136ddd64DBA72", "0x71C7656EC7ab88b098defB751B7401B5f6d8976F"]
+
+
+def demo_address(i):
+    return f"0x{i + 1:040x}"
+
+
+def start_rpc_stub(port=0, contracts=1, **options):
+    """Sobe o stub numa thread com `contracts` contratos de exemplo (demo_address(i))."""
+    server = RpcStubServer(("127.0.0.1", port), **options)
+    for i in range(contracts):
+        # Carteiras alternando entre pagador e recebedor e prazos diferentes por contrato
+        payer, payee = DEMO_WALLETS[i % 2], DEMO_WALLETS[(i + 1) % 2]
+        deadline = int(time.time()) + (i % 60 + 1) * 86400
+        server.add_contract(demo_address(i), StubContract(payer, payee, deadline=deadline))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub JSON-RPC com contratos de escrow simulados")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--contracts", type=int, default=3)
+    parser.add_argument("--block-time", type=float, default=2.0, help="segundos por bloco (0 = bloco fixo)")
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por requisição HTTP")
+    parser.add_argument("--activity", type=float, default=0.0,
+                        help="segundos entre transações simuladas (depósito/liberação; 0 = nenhuma)")
+    parser.add_argument("--history", type=int, default=0, help="blocos de histórico sintético de logs")
+    args = parser.parse_args()
+
+    stub = start_rpc_stub(args.port, args.contracts, block_time=args.block_time, latency=args.latency)
+    if args.history:
+        stub.seed_history(args.history)
+        print(f"{len(stub.logs)} logs sintéticos nos últimos {args.history} blocos")
+    if args.activity:
+        threading.Thread(target=stub.simulate, args=(args.activity,), daemon=True).start()
+    print(f"Stub JSON-RPC em http://127.0.0.1:{args.port} (bloco a cada {args.block_time}s)")
+    for i in range(args.contracts):
+        print(f"  contrato: {demo_address(i)}")
+    threading.Event().wait()
@@ -0,0 +1,166 @@
+"""
+Deal-Fi AI Agent - Benchmark de startup
+Mede o cold start de server.py (Flask) e asgi.py (Starlette) contra o stub local:
+
+- import: tempo de import do servidor (campo `startup.import` do /readyz);
+- live:   do spawn do processo até o primeiro 200 do /healthz;
+- ready:  do spawn até o primeiro 200 do /readyz (prewarm concluído);
+- chat:   latência do primeiro /chat, enviado assim que o /healthz responde
+          (o caso do scale-to-zero: a requisição que acorda o serviço).
+
+Com --max-* o script sai com código 1 se a mediana passar do limite (para pegar
+regressões no CI). --importtime mostra os módulos mais lentos (python -X importtime).
+
+Uso (a partir de escrow-dapp/ai-agent):
+    python bench/startup.py --runs 5
+    python bench/startup.py --targets asgi --max-live-ms 1500 --max-ready-ms 3000
+    python bench/startup.py --importtime --targets flask
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from openai_stub import add_stub_arguments, stub_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(BENCH_DIR)
+STUB_PORT = 8101
+
+TARGETS = {
+    "flask": [sys.executable, "server.py"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1",
+             "--port", "{port}", "--log-level", "warning"],
+}
+MODULES = {"flask": "server", "asgi": "asgi"}
+
+BODY = json.dumps({"messages": [{"role": "user", "content": "O que é escrow?"}]}).encode()
+
+
+def _server_env(stub_url, port):
+    return dict(os.environ, OPENAI_API_KEY="sk-bench", OPENAI_BASE_URL=stub_url, PORT=str(port),
+                RATE_LIMIT_ENABLED="0", INDEXER_ENABLED="0")
+
+
+def _get(url):
+    """(status, corpo JSON) ou (None, None) se o servidor ainda não aceita conexões."""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+    except OSError:
+        return None, None
+
+
+def _wait_status(url, started, timeout=60):
+    """Segundos (desde `started`) até `url` responder 200, e o corpo."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        status, body = _get(url)
+        if status == 200:
+            return time.perf_counter() - started, body
+        time.sleep(0.01)
+    raise RuntimeError(f"Servidor não respondeu 200 em {url}")
+
+
+def _first_chat(url):
+    start = time.perf_counter()
+    req = urllib.request.Request(url, data=BODY, headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(req, timeout=60).read()
+    return time.perf_counter() - start
+
+
+def run_once(name, stub_url, port):
+    cmd = [arg.format(port=port) for arg in TARGETS[name]]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=AGENT_DIR, env=_server_env(stub_url, port),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        live, _ = _wait_status(base + "/healthz", started)
+        chat = _first_chat(base + "/chat")
+        ready, body = _wait_status(base + "/readyz", started)
+        return {
+            "import": body["startup"].get("import", 0) / 1000,
+            "live": live,
+            "ready": ready,
+            "chat": chat,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def import_profile(name, stub_url, top):
+    """Módulos com maior tempo cumulativo de import (até dois níveis abaixo do servidor)."""
+    env = _server_env(stub_url, 0)
+    env["PREWARM"] = "0"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULES[name]}"],
+                            cwd=AGENT_DIR, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, module = line[12:].split("|")
+        depth = (len(module) - len(module.lstrip())) // 2
+        if cumulative.strip().isdigit() and depth <= 2:
+            rows.append((int(cumulative) / 1000, depth, module.strip()))
+    rows.sort(reverse=True)
+    print(f"\n{name}: módulos mais lentos no import (ms cumulativos)")
+    for ms, depth, module in rows[:top]:
+        print(f"{ms:>10.1f}  {'  ' * depth}{module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de startup (cold start) Flask vs ASGI")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--targets", default="flask,asgi")
+    parser.add_argument("--importtime", action="store_true", help="mostra os imports mais lentos")
+    parser.add_argument("--top", type=int, default=15, help="módulos exibidos com --importtime")
+    parser.add_argument("--max-live-ms", type=float, default=None)
+    parser.add_argument("--max-ready-ms", type=float, default=None)
+    parser.add_argument("--max-chat-ms", type=float, default=None)
+    add_stub_arguments(parser)
+    parser.set_defaults(latency=0.05)
+    args = parser.parse_args()
+
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "openai_stub.py"), "--port", str(STUB_PORT)]
+        + stub_arguments(args),
+        stdout=subprocess.DEVNULL
+    )
+    stub_url = f"http://127.0.0.1:{STUB_PORT}/v1"
+    limits = {"live": args.max_live_ms, "ready": args.max_ready_ms, "chat": args.max_chat_ms}
+    failures = []
+
+    try:
+        print(f"execuções={args.runs} latência stub={args.latency}s (medianas em ms)")
+        print(f"{'alvo':<8}{'import':>9}{'live':>9}{'ready':>9}{'chat':>9}")
+        for i, name in enumerate(args.targets.split(",")):
+            runs = [run_once(name, stub_url, 5700 + i) for _ in range(args.runs)]
+            medians = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            print(f"{name:<8}{medians['import']:>9.0f}{medians['live']:>9.0f}"
+                  f"{medians['ready']:>9.0f}{medians['chat']:>9.0f}")
+            for key, limit in limits.items():
+                if limit is not None and medians[key] > limit:
+                    failures.append(f"{name}: {key} {medians[key]:.0f} ms > {limit:.0f} ms")
+        if args.importtime:
+            for name in args.targets.split(","):
+                import_profile(name, stub_url, args.top)
+    finally:
+        stub.terminate()
+
+    for failure in failures:
+        print(f"REGRESSÃO {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
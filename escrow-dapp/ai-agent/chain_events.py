@@ -0,0 +1,292 @@
+"""
+Deal-Fi AI Agent - Eventos dos contratos em tempo real (SSE)
+Empurra para o navegador as mudanças de estado dos contratos de escrow, no lugar
+do polling de 5 s da página de gerenciamento.
+
+Como:
+- uma única thread observa a rede para todos os clientes: a cada bloco novo faz
+  um eth_getLogs com todos os endereços inscritos (nenhuma chamada quando não há
+  inscritos);
+- os logs são decodificados pela ABI dos eventos (Deposited, MilestoneReleased,
+  Settled, Cancelled...) e, para cada contrato com logs, o estado é relido pelo
+  ChainStateService (uma leitura em lote por bloco, compartilhada com o /state);
+- o cliente recebe um `snapshot` ao conectar e depois só `update` com os eventos
+  do bloco e os campos do estado que mudaram (`changes`);
+- o `id` de cada evento SSE é o número do bloco: ao reconectar, o navegador manda
+  Last-Event-ID e os eventos perdidos são reenviados antes de um snapshot novo;
+- cada cliente tem uma fila limitada; se ela enche (cliente lento), os updates
+  acumulados são descartados e o cliente recebe um snapshot novo.
+
+Todos os clientes de um endereço compartilham a mesma base para `changes`: o
+último estado publicado pelo hub (um snapshot mais novo é publicado como update
+para os clientes já conectados antes de virar a base).
+"""
+
+import os
+import threading
+import time
+
+from abi import decode_word, decode_words, event_topic, to_checksum_address
+from chain_state import CHAIN_BLOCK_INTERVAL, ChainStateError, normalize_address
+from metrics import Counter, register_collector, register_metric
+from streaming import sse_event
+
+# Blocos por eth_getLogs (limite comum dos nós públicos) e janela de reenvio na reconexão
+CHAIN_LOG_RANGE = int(os.getenv("CHAIN_LOG_RANGE", 1000))
+# Comentário SSE enviado quando não há eventos (mantém proxies e load balancers abertos)
+CHAIN_EVENTS_HEARTBEAT = float(os.getenv("CHAIN_EVENTS_HEARTBEAT", 15))
+CHAIN_EVENTS_QUEUE_SIZE = int(os.getenv("CHAIN_EVENTS_QUEUE_SIZE", 64))
+
+EVENTS_PUBLISHED = register_metric(Counter("dealfi_chain_events_total", "Eventos de contrato publicados, por evento"))
+
+# Eventos do escrowABI.js/Novo_Escrow.sol e do Escrow_Production.sol
+EVENT_DECLARATIONS = [
+    "PlatformFeePaid(address indexed payer, uint256 amount)",
+    "ConfirmedPayer(address indexed payer)",
+    "ConfirmedPayee(address indexed payee)",
+    "Deposited(address indexed payer, uint256 amount)",
+    "MilestoneReleased(uint256 indexed index, uint256 amount)",
+    "CancelApprovedByPayer()",
+    "CancelApprovedByPayee()",
+    "Cancelled(uint256 amountReturned)",
+    "SettlementProposed(uint256 amount)",
+    "SettlementApproved()",
+    "Settled(uint256 amountToPayee, uint256 amountToPayer)",
+    "Refunded(uint256 amount)",
+    "ClaimedAfterDeadline(uint256 amount)",
+    # Escrow_Production.sol
+    "Deposited(address indexed from, uint256 amount, uint256 deadline)",
+    "ReleaseApproval(address indexed by, uint256 milestone)",
+    "MilestoneReleased(uint256 milestone, uint256 amount)",
+    "MilestoneFailed(uint256 milestone, string reason)",
+    "CancelApproved(address indexed by)",
+    "Refunded(address indexed to, uint256 amount)",
+    "RefundFailed(address indexed to, uint256 amount, string reason)",
+    "DustSwept(address indexed token, uint256 amount)",
+    "DeadlineClaimed(uint256 milestone, uint256 amount)",
+    "ContractPaused(address indexed by)",
+    "ContractUnpaused(address indexed by)",
+]
+
+
+def _parse_declaration(declaration):
+    """("Nome(tipo [indexed] nome, ...)") → (nome, [(campo, tipo, indexed)], topic0)."""
+    name, _, params = declaration.partition("(")
+    fields = []
+    for param in params.rstrip(")").split(","):
+        parts = param.split()
+        if parts:
+            fields.append((parts[-1], parts[0], "indexed" in parts[1:-1]))
+    signature = f"{name}({','.join(kind for _, kind, _ in fields)})"
+    return name, fields, event_topic(signature)
+
+
+# (topic0, nº de topics) -> (nome, campos): o mesmo evento pode ter campos
+# indexados diferentes nas duas versões do contrato (MilestoneReleased)
+_DECODERS = {}
+for _declaration in EVENT_DECLARATIONS:
+    _name, _fields, _topic = _parse_declaration(_declaration)
+    _DECODERS.setdefault((_topic, 1 + sum(1 for f in _fields if f[2])), (_name, _fields))
+
+
+def decode_log(log):
+    """Log do eth_getLogs como {event, args, address, block, transaction, logIndex} (None se desconhecido)."""
+    topics = [topic.lower() for topic in log.get("topics") or []]
+    decoder = _DECODERS.get((topics[0], len(topics))) if topics else None
+    if decoder is None:
+        return None
+    name, fields = decoder
+    try:
+        data_values = iter(decode_words(log.get("data") or "0x", [kind for _, kind, indexed in fields if not indexed]))
+        indexed_values = iter(topics[1:])
+        args = {
+            field: decode_word(next(indexed_values)[2:], kind) if indexed else next(data_values)
+            for field, kind, indexed in fields
+        }
+    except ValueError:
+        return None
+    return {
+        "event": name,
+        "args": args,
+        "address": to_checksum_address(log["address"]),
+        "block": int(log["blockNumber"], 16),
+        "transaction": log.get("transactionHash"),
+        "logIndex": int(log.get("logIndex") or "0x0", 16)
+    }
+
+
+def resume_block(last_event_id=None, from_block=None):
+    """Bloco a partir do qual reenviar eventos (Last-Event-ID ou ?from_block=); None se ausente/inválido."""
+    for value in (last_event_id, from_block):
+        if value not in (None, ""):
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _changes(previous, current):
+    """Campos do estado que mudaram (todos, se não havia estado anterior)."""
+    if previous is None:
+        return dict(current)
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+# ============================================================================
+# HUB
+# ============================================================================
+
+class Subscription:
+    """
+    Cliente inscrito nos eventos de um contrato.
+    `deliver(evento)` entrega um evento SSE pronto à fila do cliente e retorna
+    False se ela estiver cheia; nesse caso o cliente fica `lagging` e recebe um
+    snapshot novo no lugar dos updates perdidos.
+    """
+
+    def __init__(self, address, deliver):
+        self.address = address
+        self.deliver = deliver
+        self.lagging = False
+
+
+class ChainEventHub:
+    """Uma thread que observa os blocos e publica os eventos de todos os contratos inscritos."""
+
+    def __init__(self, state, block_interval=CHAIN_BLOCK_INTERVAL, log_range=CHAIN_LOG_RANGE):
+        self.state = state
+        self.block_interval = block_interval
+        self.log_range = log_range
+        self._subscriptions = {}  # endereço -> set(Subscription)
+        self._published = {}  # endereço -> último estado publicado (base de `changes`)
+        self._last_block = None
+        self._thread = None
+        self._lock = threading.Lock()
+        register_collector(self._collect)
+
+    def subscribe(self, address, deliver):
+        """Inscreve um cliente (InvalidAddress se o endereço for inválido) e liga a thread se preciso."""
+        subscription = Subscription(normalize_address(address), deliver)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.address, set()).add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chain-events", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.address)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.address]
+                    self._published.pop(subscription.address, None)
+
+    def initial_events(self, subscription, from_block=None):
+        """
+        Eventos SSE ao conectar: os logs perdidos desde `from_block` (se a lacuna
+        couber em CHAIN_LOG_RANGE) e um snapshot do estado atual.
+        Retorna (eventos, bloco do snapshot). Levanta ChainStateError.
+        """
+        address = subscription.address
+        state = self.state.get(address)
+        events = []
+        if from_block is not None and 0 <= state.block - from_block <= self.log_range:
+            missed = self._logs([address], from_block + 1, state.block) if from_block < state.block else []
+            if missed:
+                events.append(sse_event("events", {"address": address, "events": missed}, event_id=from_block))
+        events.append(self._snapshot(address, state))
+        return events, state.block
+
+    def resync(self, subscription):
+        """Snapshot novo para um cliente que perdeu updates (fila cheia). Retorna (evento, bloco)."""
+        subscription.lagging = False
+        state = self.state.get(subscription.address)
+        return self._snapshot(subscription.address, state), state.block
+
+    def _snapshot(self, address, state):
+        with self._lock:
+            previous = self._published.get(address)
+            if previous is not None and previous != state.body:
+                # Base nova: os clientes já conectados recebem a diferença antes
+                self._broadcast(address, state, [])
+            self._published[address] = state.body
+        return sse_event("snapshot", {
+            "address": address, "block": state.block, "etag": state.etag, "state": state.body
+        }, event_id=state.block)
+
+    def _broadcast(self, address, state, events):
+        """Publica um update (chamar com self._lock)."""
+        changes = _changes(self._published.get(address), state.body)
+        self._published[address] = state.body
+        if not events and not changes:
+            return
+        event = sse_event("update", {
+            "address": address, "block": state.block, "etag": state.etag, "events": events, "changes": changes
+        }, event_id=state.block)
+        for subscription in self._subscriptions.get(address, ()):
+            if not subscription.lagging and not subscription.deliver((state.block, event)):
+                subscription.lagging = True
+                subscription.deliver(None)  # acorda o consumidor para o resync
+
+    # ------------------------------------------------------------------------
+    # Thread de observação
+    # ------------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            time.sleep(self.block_interval)
+            with self._lock:
+                addresses = list(self._subscriptions)
+                if not addresses:
+                    # Sem inscritos a thread termina; o próximo subscribe cria outra
+                    self._thread = None
+                    self._last_block = None
+                    return
+            try:
+                self._poll(addresses)
+            except ChainStateError as e:
+                print(f"Erro ao buscar eventos dos contratos: {str(e)}")
+            except Exception as e:
+                print(f"Erro inesperado no observador de eventos: {str(e)}")
+
+    def _poll(self, addresses):
+        head = self.state.block_number()
+        if self._last_block is None or self._last_block > head:
+            self._last_block = head
+            return
+        if head == self._last_block:
+            return
+        to_block = min(head, self._last_block + self.log_range)
+        by_address = {}
+        for event in self._logs(addresses, self._last_block + 1, to_block):
+            by_address.setdefault(event["address"], []).append(event)
+
+        for address, events in by_address.items():
+            state = self.state.get(address)
+            for event in events:
+                EVENTS_PUBLISHED.inc(event=event["event"])
+            with self._lock:
+                if address in self._subscriptions:
+                    self._broadcast(address, state, events)
+        self._last_block = to_block
+
+    def _logs(self, addresses, from_block, to_block):
+        """Logs decodificados de `addresses` entre os blocos (inclusive), em ordem."""
+        logs = self.state.rpc.call("eth_getLogs", [{
+            "address": addresses if len(addresses) > 1 else addresses[0],
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block)
+        }])
+        events = [decode_log(log) for log in logs or [] if not log.get("removed")]
+        return [event for event in events if event is not None]
+
+    def _collect(self):
+        with self._lock:
+            contracts = len(self._subscriptions)
+            clients = sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+        return [
+            ("dealfi_chain_event_subscribers", "gauge", "Clientes conectados ao stream de eventos", clients),
+            ("dealfi_chain_event_contracts", "gauge", "Contratos com clientes no stream de eventos", contracts),
+        ]
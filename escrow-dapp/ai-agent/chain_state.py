@@ -0,0 +1,304 @@
+"""
+Deal-Fi AI Agent - Estado agregado dos contratos de escrow
+Lê o estado de um contrato (o mesmo objeto de RealContractService.getContractDetails)
+numa única requisição JSON-RPC em lote por bloco e serve a todas as abas abertas.
+
+Por que: cada aba na página de gerenciamento fazia ~10 eth_call separadas a cada 5 s
+(getContractInfo, settlementAmount, settlementApproved, cancelApprovedPayer,
+cancelApprovedPayee, getTotalMilestones e um getMilestoneInfo por marco).
+
+Como:
+- o número do bloco é consultado no máximo a cada CHAIN_BLOCK_INTERVAL segundos
+  (compartilhado entre todos os contratos);
+- o estado de cada endereço é lido uma vez por bloco, com todas as eth_call num só
+  lote fixado nesse bloco (leitura consistente); leituras simultâneas do mesmo
+  endereço/bloco compartilham a mesma chamada (single-flight);
+- a quantidade de marcos é fixa no constructor, então fica em cache por endereço
+  e o lote já inclui os getMilestoneInfo a partir da segunda leitura;
+- a resposta leva um ETag fraco calculado sobre o estado (sem o número do bloco):
+  enquanto nada muda no contrato o cliente recebe 304.
+
+ABI: a do frontend (src/contracts/escrowABI.js, backend/Novo_Escrow.sol).
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from abi import decode_words, encode_call, format_units, to_checksum_address
+from coalescing import SingleFlight
+from metrics import Counter, register_metric
+from payloads import dumps
+
+CHAIN_RPC_URL = os.getenv("CHAIN_RPC_URL", "https://polygon-rpc.com")
+CHAIN_RPC_TIMEOUT = float(os.getenv("CHAIN_RPC_TIMEOUT", 10))
+# Intervalo mínimo entre consultas de eth_blockNumber (Polygon: ~2 s por bloco)
+CHAIN_BLOCK_INTERVAL = float(os.getenv("CHAIN_BLOCK_INTERVAL", 2.0))
+CHAIN_STATE_CACHE_SIZE = int(os.getenv("CHAIN_STATE_CACHE_SIZE", 1024))
+
+USDC_ADDRESS = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"  # USDC na Polygon
+USDC_DECIMALS = 6
+
+READS = register_metric(Counter("dealfi_chain_state_reads_total", "Leituras de estado de contrato por resultado"))
+RPC_REQUESTS = register_metric(Counter("dealfi_chain_rpc_requests_total", "Requisições HTTP ao nó JSON-RPC"))
+RPC_CALLS = register_metric(Counter("dealfi_chain_rpc_calls_total", "Chamadas JSON-RPC por método"))
+
+_ADDRESS = re.compile(r"^0x[a-fA-F0-9]{40}$")
+
+# (campo, assinatura, tipos de retorno)
+_BASE_CALLS = [
+    ("info", "getContractInfo()",
+     ["address", "address", "uint256", "uint256", "bool", "bool", "bool", "bool", "uint256"]),
+    ("settlementAmount", "settlementAmount()", ["uint256"]),
+    ("settlementApproved", "settlementApproved()", ["bool"]),
+    ("cancelApprovedPayer", "cancelApprovedPayer()", ["bool"]),
+    ("cancelApprovedPayee", "cancelApprovedPayee()", ["bool"]),
+    ("totalMilestones", "getTotalMilestones()", ["uint256"]),
+]
+_MILESTONE_SIGNATURE = "getMilestoneInfo(uint256)"
+# O contrato aceita no máximo 10 marcos (EscrowUSDC_Dynamic_Production.sol)
+MAX_MILESTONES = 10
+_MILESTONE_TYPES = ["uint256", "uint256", "bool"]
+# Campos opcionais: o frontend usa o padrão quando a leitura falha
+_DEFAULTS = {"settlementAmount": [0], "settlementApproved": [False],
+             "cancelApprovedPayer": [False], "cancelApprovedPayee": [False], "totalMilestones": [0]}
+
+
+class ChainStateError(Exception):
+    """Falha ao ler o estado na blockchain (nó indisponível ou resposta inválida)."""
+
+    status = 502
+
+
+class InvalidAddress(ChainStateError):
+    status = 400
+
+
+class ContractNotFound(ChainStateError):
+    status = 404
+
+
+def normalize_address(address):
+    """Endereço no formato checksum; InvalidAddress se não for 0x + 40 hexadecimais."""
+    if not isinstance(address, str) or not _ADDRESS.match(address):
+        raise InvalidAddress(f"Endereço inválido: {address}")
+    return to_checksum_address(address)
+
+
+def _eth_call(address, data, block):
+    return "eth_call", [{"to": address, "data": data}, hex(block)]
+
+
+def chain_error_body(e):
+    """Corpo de erro do endpoint de estado (mesmo formato de core.error_body)."""
+    return {"error": {"message": str(e), "type": "chain_error"}}
+
+# ============================================================================
+# JSON-RPC
+# ============================================================================
+
+class JsonRpcClient:
+    """Cliente JSON-RPC com requisições em lote (um POST para várias chamadas)."""
+
+    def __init__(self, url=CHAIN_RPC_URL, timeout=CHAIN_RPC_TIMEOUT):
+        self.url = url
+        self._http = httpx.Client(timeout=timeout)
+
+    def batch(self, calls):
+        """
+        Executa [(método, params), ...] num único POST.
+        Retorna, na mesma ordem, o `result` de cada chamada ou um ChainStateError.
+        """
+        payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                   for i, (method, params) in enumerate(calls)]
+        RPC_REQUESTS.inc()
+        for method, _ in calls:
+            RPC_CALLS.inc(method=method)
+        try:
+            response = self._http.post(self.url, json=payload)
+            response.raise_for_status()
+            replies = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise ChainStateError(f"Nó JSON-RPC indisponível: {e}")
+        if isinstance(replies, dict):  # erro do lote inteiro
+            message = (replies.get("error") or {}).get("message", "resposta inválida")
+            raise ChainStateError(f"Erro do nó JSON-RPC: {message}")
+
+        by_id = {reply.get("id"): reply for reply in replies}
+        results = []
+        for i in range(len(calls)):
+            reply = by_id.get(i)
+            if reply is None:
+                results.append(ChainStateError("Resposta ausente no lote JSON-RPC"))
+            elif "error" in reply:
+                results.append(ChainStateError(reply["error"].get("message", "erro JSON-RPC")))
+            else:
+                results.append(reply.get("result"))
+        return results
+
+    def call(self, method, params):
+        result = self.batch([(method, params)])[0]
+        if isinstance(result, ChainStateError):
+            raise result
+        return result
+
+# ============================================================================
+# ESTADO DOS CONTRATOS
+# ============================================================================
+
+class ChainState:
+    """Estado lido num bloco: corpo JSON, ETag e número do bloco."""
+
+    def __init__(self, body, block):
+        self.body = body
+        self.block = block
+        digest = hashlib.sha256(dumps(body)).hexdigest()[:20]
+        self.etag = f'W/"{digest}"'
+
+    def response_body(self):
+        return {**self.body, "block": self.block}
+
+
+def not_modified(if_none_match, etag):
+    """Se o header If-None-Match do cliente já cobre o ETag atual."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+class ChainStateService:
+    """Cache por endereço do estado dos contratos, renovado uma vez por bloco (thread-safe)."""
+
+    def __init__(self, rpc=None, block_interval=CHAIN_BLOCK_INTERVAL, max_size=CHAIN_STATE_CACHE_SIZE):
+        self.rpc = rpc or JsonRpcClient()
+        self.block_interval = block_interval
+        self.max_size = max_size
+        self._block = None
+        self._block_checked = 0.0
+        self._block_lock = threading.Lock()
+        self._entries = OrderedDict()  # endereço -> ChainState
+        self._milestone_counts = {}
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+
+    def block_number(self):
+        """Último bloco, consultado no máximo a cada `block_interval` segundos."""
+        with self._block_lock:
+            if self._block is None or time.monotonic() - self._block_checked >= self.block_interval:
+                self._block = int(self.rpc.call("eth_blockNumber", []), 16)
+                self._block_checked = time.monotonic()
+            return self._block
+
+    def get(self, address):
+        """Estado do contrato no último bloco (do cache se já foi lido nesse bloco)."""
+        address = normalize_address(address)
+        block = self.block_number()
+
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is not None and entry.block >= block:
+                self._entries.move_to_end(address)
+                READS.inc(result="hit")
+                return entry
+
+        state = self._inflight.do(f"chain:{address}:{block}", lambda: self._refresh(address, block))
+        READS.inc(result="refresh")
+        return state
+
+    def _refresh(self, address, block):
+        state = ChainState(self._read(address, block), block)
+        with self._lock:
+            current = self._entries.get(address)
+            if current is None or current.block <= block:
+                self._entries[address] = state
+                self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return state
+
+    def _read(self, address, block):
+        """Todas as leituras do contrato fixadas em `block`, em um lote (dois na primeira vez)."""
+        count = self._milestone_counts.get(address)
+        calls = [_eth_call(address, encode_call(sig), block) for _, sig, _ in _BASE_CALLS]
+        if count:
+            calls += [_eth_call(address, encode_call(_MILESTONE_SIGNATURE, i), block) for i in range(count)]
+        results = self.rpc.batch(calls)
+
+        values = {}
+        for (field, _, types), result in zip(_BASE_CALLS, results):
+            values[field] = self._decode(field, result, types)
+
+        total = values["totalMilestones"][0]
+        if not 0 <= total <= MAX_MILESTONES:
+            # Outro contrato no endereço: não monta um lote de getMilestoneInfo sem limite
+            raise ChainStateError(f"Retorno inválido de totalMilestones: {total}")
+        milestone_results = results[len(_BASE_CALLS):]
+        if total and len(milestone_results) != total:
+            milestone_results = self.rpc.batch([
+                _eth_call(address, encode_call(_MILESTONE_SIGNATURE, i), block) for i in range(total)
+            ])
+        self._milestone_counts[address] = total
+
+        milestones = []
+        for result in milestone_results:
+            try:
+                milestones.append(decode_words(self._result(result), _MILESTONE_TYPES))
+            except (ChainStateError, ValueError):
+                milestones = []  # mesmo fallback do frontend: sem informações de marcos
+                break
+        return _details(values, milestones)
+
+    def _result(self, result):
+        if isinstance(result, ChainStateError):
+            raise result
+        if not isinstance(result, str):
+            raise ChainStateError("Resultado inválido do nó JSON-RPC")
+        return result
+
+    def _decode(self, field, result, types):
+        try:
+            return decode_words(self._result(result), types)
+        except (ChainStateError, ValueError) as e:
+            if field in _DEFAULTS:
+                return _DEFAULTS[field]
+            if result == "0x":
+                raise ContractNotFound("Nenhum contrato de escrow neste endereço.")
+            if isinstance(e, ChainStateError):
+                raise
+            raise ChainStateError(f"Retorno inválido de {field}: {e}")
+
+
+def _details(values, milestones):
+    """Mesmo formato de RealContractService.getContractDetails (deadline em segundos)."""
+    payer, payee, total_amount, deadline, deposited, fee_paid, confirmed_payer, confirmed_payee, balance = values["info"]
+    milestone_info = [
+        {"percentage": str(percentage), "amount": format_units(amount, USDC_DECIMALS), "released": released}
+        for percentage, amount, released in milestones
+    ]
+    return {
+        "payer": payer,
+        "payee": payee,
+        "amount": format_units(total_amount, USDC_DECIMALS),
+        "deposited": deposited,
+        "deadline": deadline,
+        "totalMilestones": str(len(milestone_info)),
+        "milestoneInfo": milestone_info,
+        "milestoneAmounts": [m["amount"] for m in milestone_info],
+        "milestonePercentages": [m["percentage"] for m in milestone_info],
+        "remainingAmount": format_units(balance, USDC_DECIMALS),
+        "balance": format_units(balance, USDC_DECIMALS),
+        "platformFeePaid": fee_paid,
+        "confirmedPayer": confirmed_payer,
+        "confirmedPayee": confirmed_payee,
+        "settlementAmount": float(format_units(values["settlementAmount"][0], USDC_DECIMALS)),
+        "settlementApproved": values["settlementApproved"][0],
+        "cancelApprovedPayer": values["cancelApprovedPayer"][0],
+        "cancelApprovedPayee": values["cancelApprovedPayee"][0],
+        "token": USDC_ADDRESS
+    }
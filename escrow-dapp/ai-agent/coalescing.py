@@ -0,0 +1,114 @@
+"""
+Deal-Fi AI Agent - Coalescência de requisições (single-flight)
+Requisições idênticas que chegam ao mesmo tempo (retries do frontend, cliques
+duplicados) compartilham uma única chamada à OpenAI e recebem o mesmo resultado.
+
+A chave é o hash do corpo bruto da requisição (mais a rota/sessão). Só o
+líder executa a função; os demais esperam e recebem uma cópia do resultado
+(ou a mesma exceção).
+"""
+
+import asyncio
+import copy
+import hashlib
+import os
+import threading
+
+COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "1") == "1"
+
+
+def request_key(scope, raw_body):
+    """Chave de coalescência: rota/sessão + hash do corpo bruto."""
+    return f"{scope}:{hashlib.sha256(raw_body).hexdigest()}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Single-flight para o servidor Flask (threads)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        if not COALESCING_ENABLED:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+        except Exception as e:
+            call.error = e
+            self._finish(key, call)
+            raise
+
+        call.result = result
+        waiters = self._finish(key, call)
+        # Com seguidores, o líder devolve uma cópia: o original é lido por eles
+        return copy.deepcopy(result) if waiters else result
+
+    def _finish(self, key, call):
+        """Remove a chamada (ninguém mais entra nela) e libera os seguidores."""
+        with self._lock:
+            self._calls.pop(key, None)
+            waiters = call.waiters
+        call.done.set()
+        return waiters
+
+
+class AsyncSingleFlight:
+    """Single-flight para o servidor ASGI (asyncio, um único event loop)."""
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        if not COALESCING_ENABLED:
+            return await fn()
+
+        entry = self._calls.get(key)
+        if entry is not None:
+            entry[1] += 1
+            self.coalesced += 1
+            return copy.deepcopy(await asyncio.shield(entry[0]))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = self._calls[key] = [future, 0]
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita o aviso "exception was never retrieved" quando ninguém esperava
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return copy.deepcopy(result) if entry[1] else result
+        finally:
+            self._calls.pop(key, None)
@@ -0,0 +1,155 @@
+"""
+Deal-Fi AI Agent - Janela de contexto
+Contagem de tokens e compactação do histórico para respeitar um orçamento por requisição.
+
+A contagem usa tiktoken quando disponível; sem ele (ou sem acesso ao arquivo do
+encoding) cai para uma estimativa de ~4 caracteres por token. O encoding só é
+carregado na primeira contagem (no prewarm do startup.py, fora do import).
+"""
+
+import json
+import os
+
+from prompt_cache import variant_for
+
+# Orçamento de tokens do prompt (system + tools + histórico) por requisição
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 12000))
+
+# Inserir um resumo curto das mensagens removidas (1) ou apenas descartá-las (0)
+CONTEXT_SUMMARY = os.getenv("CONTEXT_SUMMARY", "1") == "1"
+
+# Tokens fixos por mensagem no formato de chat da OpenAI
+TOKENS_PER_MESSAGE = 4
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Carrega o encoding do tiktoken uma única vez (None se indisponível)."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = None
+    return _encoder
+
+
+def count_text_tokens(text):
+    """Tokens de um texto."""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(message):
+    """Tokens de uma mensagem (conteúdo + tool_calls + overhead fixo)."""
+    tokens = TOKENS_PER_MESSAGE
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += count_text_tokens(content)
+    elif content:
+        tokens += count_text_tokens(json.dumps(content, ensure_ascii=False))
+    if message.get("tool_calls"):
+        tokens += count_text_tokens(json.dumps(message["tool_calls"], ensure_ascii=False))
+    return tokens
+
+
+# Tokens do prefixo (system + tools) de cada variante de prompt, fixos desde o startup
+_prefix_tokens = {}
+
+
+def prefix_tokens(variant):
+    """Tokens da mensagem de sistema + tools de uma variante (calculado uma vez por variante)."""
+    tokens = _prefix_tokens.get(variant.name)
+    if tokens is None:
+        tokens = _prefix_tokens[variant.name] = (
+            count_text_tokens(json.dumps(variant.tools, ensure_ascii=False))
+            + count_message_tokens(variant.system_message)
+        )
+    return tokens
+
+
+def _group_units(messages):
+    """
+    Agrupa o histórico em unidades que não podem ser separadas:
+    uma mensagem do assistente com tool_calls fica junto dos resultados (role "tool").
+    """
+    units = []
+    for message in messages:
+        if message.get("role") == "tool" and units:
+            units[-1].append(message)
+        else:
+            units.append([message])
+    return units
+
+
+def _summary_message(dropped):
+    """Resumo curto (sem chamada ao LLM) dos pedidos do usuário que foram removidos."""
+    requests = [
+        m["content"].strip().replace("\n", " ")[:80]
+        for m in dropped
+        if m.get("role") == "user" and isinstance(m.get("content"), str)
+    ]
+    if not requests:
+        return None
+    listed = "; ".join(requests[-10:])
+    return {
+        "role": "system",
+        "content": f"Resumo da conversa anterior (mensagens antigas omitidas): o usuário pediu: {listed}"
+    }
+
+
+def fit_messages(messages, budget=None):
+    """
+    Remove as unidades mais antigas do histórico até o prompt caber no orçamento.
+    O system prompt e o turno atual (da última mensagem do usuário em diante)
+    nunca são removidos. Retorna (mensagens, estatísticas).
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+
+    system = messages[:1] if messages and messages[0].get("role") == "system" else []
+    units = _group_units(messages[len(system):])
+    unit_tokens = [sum(count_message_tokens(m) for m in unit) for unit in units]
+    variant = variant_for(messages)
+    if system and system[0] is variant.system_message:
+        prefix = prefix_tokens(variant)
+    else:
+        prefix = count_text_tokens(json.dumps(variant.tools, ensure_ascii=False)) + sum(
+            count_message_tokens(m) for m in system
+        )
+    total = prefix + sum(unit_tokens)
+
+    # Índice da unidade que inicia o turno atual (protegida)
+    protected = len(units) - 1
+    while protected > 0 and units[protected][0].get("role") != "user":
+        protected -= 1
+
+    dropped = []
+    summary, summary_tokens = None, 0
+    start = 0
+    while total + summary_tokens > budget and start < protected:
+        dropped.extend(units[start])
+        total -= unit_tokens[start]
+        start += 1
+        if CONTEXT_SUMMARY:
+            summary = _summary_message(dropped)
+            summary_tokens = count_message_tokens(summary) if summary else 0
+
+    kept = [m for unit in units[start:] for m in unit]
+    if summary:
+        kept.insert(0, summary)
+        total += summary_tokens
+
+    stats = {
+        "prompt_tokens": total,
+        "budget": budget,
+        "dropped_messages": len(dropped)
+    }
+    return system + kept, stats
@@ -0,0 +1,560 @@
+"""
+Deal-Fi AI Agent - Índice de contratos (SQLite)
+Índice local dos contratos de escrow do Deal-Fi, alimentado pelos logs da rede,
+para listar os contratos de uma carteira sem varrer a blockchain.
+
+Os contratos são implantados um a um (sem factory), então o índice só conhece os
+endereços registrados: pelo frontend (POST /contracts/index após o deploy ou ao
+abrir um contrato) ou por INDEXER_CONTRACTS.
+
+Como o indexador trabalha:
+- cada contrato tem o seu checkpoint (`indexed_block`); os contratos no mesmo
+  checkpoint são lidos juntos, um eth_getLogs por lote de INDEXER_BATCH_BLOCKS
+  blocos (um contrato novo alcança os demais e passa a ir no mesmo lote);
+- os logs vão para a tabela `events` (histórico) e o estado dos contratos com
+  logs é relido pelo ChainStateService (payer, payee, prazo, marcos...);
+- cada lote grava o hash do último bloco (`blocks`); o hash do checkpoint mais
+  recente é conferido no mesmo lote JSON-RPC do eth_getLogs. Se mudou (reorg),
+  o índice volta ao último bloco cujo hash ainda confere: eventos posteriores são
+  apagados e os contratos afetados são relidos.
+
+Consultas (paginadas por cursor, ordenadas por prazo):
+- contratos por participante (payer/payee), status e intervalo de prazo;
+- histórico de eventos de um contrato.
+
+Status: awaiting_fee, awaiting_confirmation, awaiting_deposit, active, completed,
+cancelled, settled, refunded, claimed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from chain_events import CHAIN_LOG_RANGE, decode_log
+from chain_state import ChainStateError, ContractNotFound, normalize_address
+from metrics import Counter, register_collector, register_metric
+from startup import Lazy
+
+CONTRACT_INDEX_DB_PATH = os.getenv("CONTRACT_INDEX_DB_PATH", "contracts.db")
+INDEXER_ENABLED = os.getenv("INDEXER_ENABLED", "1") == "1"
+# Segundos entre passadas do indexador
+INDEXER_INTERVAL = float(os.getenv("INDEXER_INTERVAL", 5))
+INDEXER_BATCH_BLOCKS = int(os.getenv("INDEXER_BATCH_BLOCKS", CHAIN_LOG_RANGE))
+# Blocos anteriores ao registro que são varridos quando o bloco de deploy não é informado
+# (e o máximo aceito: um from_block mais antigo é trazido para esse limite)
+INDEXER_BACKFILL_BLOCKS = int(os.getenv("INDEXER_BACKFILL_BLOCKS", 50000))
+# Lotes por grupo de checkpoint numa passada: um backfill longo não atrasa os demais grupos
+INDEXER_MAX_BATCHES = int(os.getenv("INDEXER_MAX_BATCHES", 20))
+# Hashes de blocos guardados para detectar reorgs
+INDEXER_REORG_DEPTH = int(os.getenv("INDEXER_REORG_DEPTH", 128))
+# Endereços indexados desde o início (separados por vírgula)
+INDEXER_CONTRACTS = [a.strip() for a in os.getenv("INDEXER_CONTRACTS", "").split(",") if a.strip()]
+
+INDEX_PAGE_SIZE = 20
+INDEX_MAX_PAGE_SIZE = 100
+
+INDEXED_EVENTS = register_metric(Counter("dealfi_indexer_events_total", "Logs gravados no índice, por evento"))
+REORGS = register_metric(Counter("dealfi_indexer_reorgs_total", "Reorgs detectadas pelo indexador"))
+
+STATUS_LABELS = {
+    "awaiting_fee": "aguardando taxa",
+    "awaiting_confirmation": "aguardando confirmações",
+    "awaiting_deposit": "aguardando depósito",
+    "active": "ativo",
+    "completed": "concluído",
+    "cancelled": "cancelado",
+    "settled": "acordo executado",
+    "refunded": "reembolsado",
+    "claimed": "sacado após o prazo",
+}
+STATUSES = list(STATUS_LABELS)
+# Eventos que encerram o contrato (as duas versões do contrato)
+_CLOSING_EVENTS = {
+    "Cancelled": "cancelled",
+    "Settled": "settled",
+    "Refunded": "refunded",
+    "ClaimedAfterDeadline": "claimed",
+    "DeadlineClaimed": "claimed",
+}
+
+
+class InvalidQuery(ChainStateError):
+    status = 400
+
+
+def contract_status(state, closed_by=None):
+    """Status do contrato a partir do estado e do evento de encerramento (se houver)."""
+    if closed_by in _CLOSING_EVENTS:
+        return _CLOSING_EVENTS[closed_by]
+    milestones = state.get("milestoneInfo") or []
+    if state.get("deposited") and milestones and all(m["released"] for m in milestones):
+        return "completed"
+    if not state.get("platformFeePaid"):
+        return "awaiting_fee"
+    if not (state.get("confirmedPayer") and state.get("confirmedPayee")):
+        return "awaiting_confirmation"
+    if not state.get("deposited"):
+        return "awaiting_deposit"
+    return "active"
+
+
+def _int_param(value, name, default=None, minimum=0, maximum=None):
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise InvalidQuery(f"Parâmetro {name} inválido: {value}")
+    if number < minimum or (maximum is not None and number > maximum):
+        raise InvalidQuery(f"Parâmetro {name} fora do intervalo: {value}")
+    return number
+
+
+def _cursor(value, name="cursor"):
+    """Cursor "<inteiro>:<texto>" devolvido como next_cursor numa página anterior."""
+    number, sep, rest = (value or "").partition(":")
+    if not sep or not number.lstrip("-").isdigit():
+        raise InvalidQuery(f"Parâmetro {name} inválido: {value}")
+    return int(number), rest
+
+# ============================================================================
+# ARMAZENAMENTO
+# ============================================================================
+
+class ContractIndex:
+    """Tabelas do índice em SQLite (thread-safe, mesmo padrão do SQLiteSessionStore)."""
+
+    def __init__(self, path=CONTRACT_INDEX_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS contracts ("
+            " address TEXT PRIMARY KEY,"
+            " payer TEXT NOT NULL,"
+            " payee TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " deadline INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"              # JSON no formato de getContractDetails
+            " closed_by TEXT,"                   # evento de encerramento, se houver
+            " from_block INTEGER NOT NULL,"
+            " indexed_block INTEGER NOT NULL,"   # checkpoint: logs ingeridos até este bloco
+            " state_block INTEGER NOT NULL,"
+            " stale INTEGER NOT NULL DEFAULT 0," # estado precisa ser relido
+            " updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_contracts_payer ON contracts(payer, deadline, address);"
+            "CREATE INDEX IF NOT EXISTS idx_contracts_payee ON contracts(payee, deadline, address);"
+            "CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts(status, deadline, address);"
+            "CREATE INDEX IF NOT EXISTS idx_contracts_deadline ON contracts(deadline, address);"
+            "CREATE INDEX IF NOT EXISTS idx_contracts_checkpoint ON contracts(indexed_block);"
+            "CREATE TABLE IF NOT EXISTS events ("
+            " address TEXT NOT NULL,"
+            " block INTEGER NOT NULL,"
+            " log_index INTEGER NOT NULL,"
+            " block_hash TEXT,"
+            " tx TEXT,"
+            " event TEXT NOT NULL,"
+            " args TEXT NOT NULL,"
+            " PRIMARY KEY (address, block, log_index));"
+            "CREATE INDEX IF NOT EXISTS idx_events_block ON events(block);"
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            " number INTEGER PRIMARY KEY,"
+            " hash TEXT NOT NULL);"
+        )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------------
+    # Escrita (indexador)
+    # ------------------------------------------------------------------------
+
+    def add(self, address, state, from_block):
+        """Registra um contrato (sem efeito se já estiver no índice). Retorna True se é novo."""
+        def insert(conn):
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO contracts (address, payer, payee, status, deadline, state, from_block,"
+                " indexed_block, state_block, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (address, state.body["payer"], state.body["payee"], contract_status(state.body),
+                 int(state.body["deadline"]), json.dumps(state.body), from_block, from_block - 1,
+                 state.block, time.time())
+            )
+            return cursor.rowcount > 0
+        return self._transaction(insert)
+
+    def update_state(self, address, state):
+        def update(conn):
+            row = conn.execute("SELECT closed_by, state_block FROM contracts WHERE address = ?", (address,)).fetchone()
+            if row is None or row[1] > state.block:
+                return
+            conn.execute(
+                "UPDATE contracts SET payer = ?, payee = ?, status = ?, deadline = ?, state = ?, state_block = ?,"
+                " stale = 0, updated_at = ? WHERE address = ?",
+                (state.body["payer"], state.body["payee"], contract_status(state.body, row[0]),
+                 int(state.body["deadline"]), json.dumps(state.body), state.block, time.time(), address)
+            )
+        self._transaction(update)
+
+    def checkpoints(self):
+        """{indexed_block: [endereços]}: contratos agrupados pelo checkpoint."""
+        groups = {}
+        for address, block in self._query("SELECT address, indexed_block FROM contracts ORDER BY indexed_block"):
+            groups.setdefault(block, []).append(address)
+        return groups
+
+    def stale(self):
+        return [row[0] for row in self._query("SELECT address FROM contracts WHERE stale = 1")]
+
+    def latest_block(self):
+        """(número, hash) do checkpoint de bloco mais recente, ou None."""
+        rows = self._query("SELECT number, hash FROM blocks ORDER BY number DESC LIMIT 1")
+        return rows[0] if rows else None
+
+    def block_hashes(self):
+        return self._query("SELECT number, hash FROM blocks ORDER BY number DESC")
+
+    def ingest(self, addresses, to_block, block_hash, events):
+        """
+        Grava os eventos decodificados de um lote e avança o checkpoint de
+        `addresses` até `to_block`. Retorna os endereços que tiveram eventos.
+        """
+        def write(conn):
+            touched = set()
+            for event in events:
+                conn.execute(
+                    "INSERT OR REPLACE INTO events (address, block, log_index, block_hash, tx, event, args)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (event["address"], event["block"], event["logIndex"], event.get("blockHash"),
+                     event["transaction"], event["event"], json.dumps(event["args"]))
+                )
+                touched.add(event["address"])
+                if event["event"] in _CLOSING_EVENTS:
+                    conn.execute("UPDATE contracts SET closed_by = ? WHERE address = ?", (event["event"], event["address"]))
+            conn.executemany(
+                "UPDATE contracts SET indexed_block = ?, stale = stale OR ? WHERE address = ? AND indexed_block < ?",
+                [(to_block, address in touched, address, to_block) for address in addresses]
+            )
+            if block_hash:
+                conn.execute("INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)", (to_block, block_hash))
+                conn.execute(
+                    "DELETE FROM blocks WHERE number IN ("
+                    " SELECT number FROM blocks ORDER BY number DESC LIMIT -1 OFFSET ?)",
+                    (INDEXER_REORG_DEPTH,)
+                )
+            return touched
+        touched = self._transaction(write)
+        for event in events:
+            INDEXED_EVENTS.inc(event=event["event"])
+        return touched
+
+    def rollback(self, fork_block):
+        """Desfaz tudo depois de `fork_block` (reorg): eventos, hashes e checkpoints."""
+        def undo(conn):
+            affected = [row[0] for row in conn.execute(
+                "SELECT address FROM contracts WHERE indexed_block > ?", (fork_block,)
+            )]
+            conn.execute("DELETE FROM events WHERE block > ?", (fork_block,))
+            conn.execute("DELETE FROM blocks WHERE number > ?", (fork_block,))
+            for address in affected:
+                closing = conn.execute(
+                    "SELECT event FROM events WHERE address = ? AND event IN ({}) ORDER BY block DESC, log_index DESC"
+                    " LIMIT 1".format(",".join("?" * len(_CLOSING_EVENTS))),
+                    (address, *_CLOSING_EVENTS)
+                ).fetchone()
+                conn.execute(
+                    "UPDATE contracts SET indexed_block = MAX(from_block - 1, ?), closed_by = ?, stale = 1"
+                    " WHERE address = ?",
+                    (fork_block, closing[0] if closing else None, address)
+                )
+            return affected
+        return self._transaction(undo)
+
+    # ------------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------------
+
+    def contracts(self, participant=None, role=None, status=None, deadline_after=None, deadline_before=None,
+                  limit=INDEX_PAGE_SIZE, cursor=None):
+        """
+        Contratos ordenados por prazo. Retorna (itens, next_cursor); next_cursor é
+        None na última página.
+        """
+        where, params = [], []
+        if participant is not None:
+            if role == "payer":
+                where.append("payer = ?")
+                params.append(participant)
+            elif role == "payee":
+                where.append("payee = ?")
+                params.append(participant)
+            else:
+                where.append("(payer = ? OR payee = ?)")
+                params += [participant, participant]
+        if status:
+            where.append(f"status IN ({','.join('?' * len(status))})")
+            params += status
+        if deadline_after is not None:
+            where.append("deadline >= ?")
+            params.append(deadline_after)
+        if deadline_before is not None:
+            where.append("deadline < ?")
+            params.append(deadline_before)
+        if cursor is not None:
+            where.append("(deadline > ? OR (deadline = ? AND address > ?))")
+            params += [cursor[0], cursor[0], cursor[1]]
+
+        sql = "SELECT address, status, state, closed_by, indexed_block, state_block FROM contracts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY deadline, address LIMIT ?"
+        rows = self._query(sql, (*params, limit + 1))
+
+        items = [{
+            **json.loads(state), "address": address, "status": status_value,
+            "statusLabel": STATUS_LABELS[status_value], "closedBy": closed_by,
+            "indexedBlock": indexed_block, "stateBlock": state_block
+        } for address, status_value, state, closed_by, indexed_block, state_block in rows[:limit]]
+        next_cursor = f"{items[-1]['deadline']}:{items[-1]['address']}" if len(rows) > limit else None
+        return items, next_cursor
+
+    def history(self, address, limit=INDEX_PAGE_SIZE, cursor=None):
+        """Eventos do contrato em ordem (bloco, logIndex). Retorna (itens, next_cursor)."""
+        sql = "SELECT block, log_index, tx, event, args FROM events WHERE address = ?"
+        params = [address]
+        if cursor is not None:
+            sql += " AND (block > ? OR (block = ? AND log_index > ?))"
+            params += [cursor[0], cursor[0], int(cursor[1])]
+        rows = self._query(sql + " ORDER BY block, log_index LIMIT ?", (*params, limit + 1))
+        items = [{"block": block, "logIndex": log_index, "transaction": tx, "event": event, "args": json.loads(args)}
+                 for block, log_index, tx, event, args in rows[:limit]]
+        next_cursor = f"{items[-1]['block']}:{items[-1]['logIndex']}" if len(rows) > limit else None
+        return items, next_cursor
+
+    def indexed_block(self, address):
+        """Checkpoint do contrato, ou None se ele não está no índice."""
+        rows = self._query("SELECT indexed_block FROM contracts WHERE address = ?", (address,))
+        return rows[0][0] if rows else None
+
+    def stats(self):
+        rows = self._query("SELECT COUNT(*), MIN(indexed_block) FROM contracts")
+        events = self._query("SELECT COUNT(*) FROM events")[0][0]
+        return {"contracts": rows[0][0], "events": events, "min_indexed_block": rows[0][1]}
+
+
+# Aberto no primeiro uso (o import não cria o contracts.db)
+contract_index = Lazy(ContractIndex)
+
+# ============================================================================
+# PARÂMETROS DAS CONSULTAS (query string)
+# ============================================================================
+
+def contracts_query(args):
+    """kwargs de ContractIndex.contracts a partir da query string do GET /contracts."""
+    participant = args.get("participant")
+    role = args.get("role") or None
+    if role not in (None, "payer", "payee", "any"):
+        raise InvalidQuery(f"Parâmetro role inválido: {role} (use payer, payee ou any)")
+    status = [s for s in (args.get("status") or "").split(",") if s]
+    unknown = [s for s in status if s not in STATUSES]
+    if unknown:
+        raise InvalidQuery(f"Status inválido: {', '.join(unknown)} (use {', '.join(STATUSES)})")
+    cursor = args.get("cursor")
+    return {
+        "participant": normalize_address(participant) if participant else None,
+        "role": role,
+        "status": status,
+        "deadline_after": _int_param(args.get("deadline_after"), "deadline_after"),
+        "deadline_before": _int_param(args.get("deadline_before"), "deadline_before"),
+        "limit": _int_param(args.get("limit"), "limit", INDEX_PAGE_SIZE, 1, INDEX_MAX_PAGE_SIZE),
+        "cursor": _cursor(cursor) if cursor else None
+    }
+
+
+def history_query(args):
+    cursor = args.get("cursor")
+    if cursor:
+        block, log_index = _cursor(cursor)
+        if not log_index.isdigit():
+            raise InvalidQuery(f"Parâmetro cursor inválido: {cursor}")
+        cursor = (block, log_index)
+    return {
+        "limit": _int_param(args.get("limit"), "limit", INDEX_PAGE_SIZE, 1, INDEX_MAX_PAGE_SIZE),
+        "cursor": cursor or None
+    }
+
+
+def contracts_page(args):
+    """Corpo do GET /contracts (args: query string)."""
+    items, next_cursor = contract_index.get().contracts(**contracts_query(args))
+    return {"contracts": items, "next_cursor": next_cursor}
+
+
+def history_page(address, args):
+    """Corpo do GET /contracts/<endereço>/history."""
+    address = normalize_address(address)
+    indexed_block = contract_index.get().indexed_block(address)
+    if indexed_block is None:
+        raise ContractNotFound("Contrato não está no índice (registre em POST /contracts/index).")
+    items, next_cursor = contract_index.get().history(address, **history_query(args))
+    return {"address": address, "indexedBlock": indexed_block, "events": items, "next_cursor": next_cursor}
+
+# ============================================================================
+# INDEXADOR
+# ============================================================================
+
+class ContractIndexer:
+    """Thread que ingere os logs dos contratos registrados em lotes de blocos."""
+
+    def __init__(self, index, state, interval=INDEXER_INTERVAL, batch_blocks=INDEXER_BATCH_BLOCKS,
+                 max_batches=INDEXER_MAX_BATCHES):
+        self.index = index
+        self.state = state
+        self.interval = interval
+        self.batch_blocks = batch_blocks
+        self.max_batches = max_batches
+        self.head = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        register_collector(self._collect)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="contract-indexer", daemon=True)
+                self._thread.start()
+
+    def register(self, address, from_block=None):
+        """
+        Adiciona um contrato ao índice (lendo o estado atual) e retorna o estado.
+        Sem `from_block` (bloco do deploy), os últimos INDEXER_BACKFILL_BLOCKS são varridos;
+        o POST /contracts/index é público, então um from_block anterior a isso é limitado.
+        """
+        address = normalize_address(address)
+        from_block = _int_param(from_block, "from_block")
+        state = self.state.get(address)
+        oldest = max(0, state.block - INDEXER_BACKFILL_BLOCKS)
+        from_block = oldest if from_block is None else min(max(from_block, oldest), state.block)
+        if self.index.add(address, state, from_block):
+            print(f"📇 Contrato {address} registrado no índice (a partir do bloco {from_block})")
+        self.start()
+        return state
+
+    def register_body(self, payload):
+        """Corpo do POST /contracts/index ({"address": "0x...", "from_block": 123})."""
+        state = self.register(payload.get("address"), payload.get("from_block"))
+        address = normalize_address(payload.get("address"))
+        return {"address": address, "block": state.block, "indexedBlock": self.index.indexed_block(address)}
+
+    def _run(self):
+        for address in INDEXER_CONTRACTS:
+            try:
+                self.register(address)
+            except ChainStateError as e:
+                print(f"Erro ao registrar {address} no índice: {str(e)}")
+        while True:
+            behind = False
+            try:
+                behind = self.run_once()
+            except ChainStateError as e:
+                print(f"Erro no indexador de contratos: {str(e)}")
+            except Exception as e:
+                print(f"Erro inesperado no indexador de contratos: {str(e)}")
+            if not behind:
+                time.sleep(self.interval)
+
+    def run_once(self):
+        """
+        Uma passada: até `max_batches` lotes por grupo de checkpoint e releitura dos
+        contratos alterados. Retorna True se algum grupo ainda não alcançou a rede.
+        """
+        groups = self.index.checkpoints()
+        if not groups:
+            return False
+        self.head = head = self.state.block_number()
+        check = self.index.latest_block()
+        behind = False
+        for start, addresses in sorted(groups.items()):
+            # Lotes seguidos até o grupo alcançar a rede (backfill de contrato novo), com limite
+            for _ in range(self.max_batches):
+                if start >= head:
+                    break
+                to_block = self._ingest_batch(addresses, start, head, check)
+                if to_block is None:
+                    return True  # reorg: a próxima passada recomeça do ponto de fork
+                start, check = to_block, None
+            behind = behind or start < head
+        for address in self.index.stale():
+            try:
+                self.index.update_state(address, self.state.get(address))
+            except ContractNotFound:
+                pass
+        return behind
+
+    def _ingest_batch(self, addresses, start, head, check):
+        to_block = min(head, start + self.batch_blocks)
+        calls = [
+            ("eth_getLogs", [{
+                "address": addresses if len(addresses) > 1 else addresses[0],
+                "fromBlock": hex(start + 1),
+                "toBlock": hex(to_block)
+            }]),
+            ("eth_getBlockByNumber", [hex(to_block), False])
+        ]
+        if check is not None:
+            calls.append(("eth_getBlockByNumber", [hex(check[0]), False]))
+        results = self.state.rpc.batch(calls)
+        for result in results:
+            if isinstance(result, ChainStateError):
+                raise result
+
+        if check is not None and (results[2] or {}).get("hash") != check[1]:
+            self._handle_reorg()
+            return None
+
+        events = []
+        for log in results[0] or []:
+            if log.get("removed"):
+                continue
+            event = decode_log(log)
+            if event is not None:
+                event["blockHash"] = log.get("blockHash")
+                events.append(event)
+        self.index.ingest(addresses, to_block, (results[1] or {}).get("hash"), events)
+        return to_block
+
+    def _handle_reorg(self):
+        """Volta ao checkpoint de bloco mais recente cujo hash ainda é o da rede."""
+        stored = self.index.block_hashes()
+        results = self.state.rpc.batch([("eth_getBlockByNumber", [hex(number), False]) for number, _ in stored])
+        fork_block = None
+        for (number, block_hash), result in zip(stored, results):
+            if not isinstance(result, ChainStateError) and (result or {}).get("hash") == block_hash:
+                fork_block = number
+                break
+        if fork_block is None:
+            fork_block = (stored[-1][0] if stored else 0) - INDEXER_REORG_DEPTH
+        affected = self.index.rollback(max(fork_block, 0))
+        REORGS.inc()
+        print(f"⚠️ Reorg detectada: índice voltou ao bloco {fork_block} ({len(affected)} contrato(s) afetado(s))")
+
+    def _collect(self):
+        stats = self.index.stats()
+        lag = self.head - stats["min_indexed_block"] if self.head is not None and stats["contracts"] else 0
+        return [
+            ("dealfi_indexer_contracts", "gauge", "Contratos no índice", stats["contracts"]),
+            ("dealfi_indexer_lag_blocks", "gauge", "Blocos entre a rede e o checkpoint mais atrasado", max(lag, 0)),
+        ]
@@ -0,0 +1,71 @@
+"""
+Deal-Fi AI Agent - Core
+Configuração e lógica compartilhada entre o servidor Flask e o servidor ASGI
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente (antes dos módulos que leem configuração no import)
+load_dotenv()
+
+from context import fit_messages  # noqa: E402
+from prompt_cache import is_server_system_prompt, select_variant  # noqa: E402
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+
+
+def require_api_key():
+    """Retorna a OPENAI_API_KEY ou falha com uma mensagem clara."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "OPENAI_API_KEY não encontrada. "
+            "Crie um arquivo .env com OPENAI_API_KEY=sua_chave_aqui"
+        )
+    return api_key
+
+
+def prepare_messages(payload):
+    """
+    Extrai as mensagens do payload, garante o system prompt no início e
+    aplica o orçamento de tokens. Retorna (mensagens, estatísticas de contexto).
+    O system prompt (e as tools) é o da página/carteira do "client_state".
+    """
+    messages = payload.get("messages", [])
+    variant = select_variant(payload.get("client_state"))
+
+    # O system prompt do servidor é sempre o primeiro item (prefixo estável para o
+    # cache de prompt). Um system prompt diferente enviado pelo cliente vem logo depois.
+    if messages and messages[0].get("role") == "system" and is_server_system_prompt(messages[0].get("content")):
+        messages = messages[1:]
+    messages = [variant.system_message] + messages
+
+    return fit_messages(messages)
+
+
+def error_body(e):
+    """Corpo de erro padrão retornado ao frontend."""
+    return {
+        "error": {
+            "message": f"Erro na API: {str(e)}",
+            "type": "api_error",
+            "model_used": MODEL
+        }
+    }
+
+
+def index_body():
+    """Resposta do health check."""
+    return {
+        "status": "ok",
+        "service": "Deal-Fi AI Agent",
+        "model": MODEL
+    }
+
+
+# Cabeçalhos das respostas SSE (sem cache e sem buffer em proxies)
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
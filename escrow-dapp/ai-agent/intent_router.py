@@ -0,0 +1,274 @@
+"""
+Deal-Fi AI Agent - Roteador local de intents
+Responde comandos simples ("voltar ao início", "ir para criar contrato",
+"conectar carteira", "qual página estou", e os equivalentes em inglês) sem
+chamar o GPT, no mesmo formato de `choices[0].message.tool_calls`.
+
+Só comandos curtos e inequívocos são roteados:
+- o padrão precisa cobrir quase todo o texto (INTENT_ROUTER_MIN_CONFIDENCE);
+- mensagens com números ou endereços 0x vão para o GPT (trazem dados);
+- perguntas e negações no restante do texto ("como conectar a carteira?",
+  "não conectar") vão para o GPT;
+- os padrões só casam palavras inteiras ("desconectar carteira" não é
+  "conectar carteira") e a ação oposta no texto ("disconnect", "sair") bloqueia;
+- "meus contratos" só navega com verbo de navegação explícito ("ir para a página
+  de meus contratos"); "mostre meus contratos" fica com o GPT (list_my_contracts).
+
+Checagem das frases esperadas: python bench/intent_router.py
+
+Quando o frontend devolve o resultado de uma tool_call gerada aqui (id
+`call_local_*`), a resposta final também é montada localmente, desde que o
+resultado seja um dos textos conhecidos do ai-chat-service.js.
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+
+from core import MODEL
+from metrics import Counter, register_metric
+from response_cache import normalize
+from server_tools import SERVER_TOOLS, completion_body, resolve_server_round
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1") == "1"
+# Fração mínima do texto coberta pelo padrão para responder sem o GPT
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", 0.8))
+
+ROUTED = register_metric(Counter("dealfi_intent_router_total", "Turnos respondidos sem o GPT, por intent"))
+
+# ============================================================================
+# PADRÕES (texto normalizado: minúsculas, sem acentos e sem pontuação)
+# ============================================================================
+
+_FILLERS = re.compile(
+    r"\b(?:por favor|pfv|pf|please|pls|agora|now|ok|okay|oi|ola|hey|hi|entao|so|ja|rapidinho)\b"
+)
+_DATA = re.compile(r"\d|0x")
+_BLOCKERS = re.compile(
+    r"\b(?:como|por que|porque|pq|o que|explique|explica|ajuda|nao|nunca|depois|tambem|"
+    r"how|why|what is|explain|help|dont|do not|not|never|then|also|"
+    # Ação oposta (desconectar, sair) nunca vira o comando roteado
+    r"desconect\w*|desvincul\w*|deslog\w*|sair|saia|remover|remova|disconnect\w*|unlink\w*|log ?out|logoff|sign out|remove|exit|leave)\b"
+)
+
+_NAV_PT = (
+    r"(?:(?:quero|vamos|pode|poderia) )?"
+    r"(?:ir|va|vai|voltar|volta|volte|abrir|abra|abre|navegar|navegue|acessar|acesse|"
+    r"mostrar|mostre|me leve|leve me|me levar|levar me)"
+    r"(?: de volta)?(?: (?:para|pra|pro|ao|a|na|no|ate))?(?: (?:a|o))?"
+)
+_PAGE_PT = r"(?: (?:pagina|tela|aba|area|secao)(?: (?:de|do|da))?)?"
+# Só verbos de ir/abrir (sem "mostrar"): "mostre meus contratos" pede a lista, não a página
+_GO_PT = (
+    r"(?:(?:quero|vamos|pode|poderia) )?"
+    r"(?:ir|va|vai|voltar|volta|volte|abrir|abra|abre|navegar|navegue|acessar|acesse|"
+    r"me leve|leve me|me levar|levar me)"
+    r"(?: de volta)?(?: (?:para|pra|pro|ao|a|na|no|ate))?(?: (?:a|o))?"
+)
+_NAV_EN = (
+    r"(?:(?:i want to|lets|let s|can you) )?"
+    r"(?:go|go back|head|take me|take me back|bring me|navigate|open|show me|show|switch)"
+    r"(?: (?:to|into))?(?: (?:the|my))?"
+)
+_PAGE_EN = r"(?: (?:page|screen|tab|section))?"
+_GO_EN = (
+    r"(?:(?:i want to|lets|let s|can you) )?"
+    r"(?:go|go back|head|take me|take me back|bring me|navigate|open|switch)"
+    r"(?: (?:to|into))?(?: the)?"
+)
+
+# (intent, argumentos, idioma, padrão)
+_RULES = [
+    ("go_home", {}, "pt",
+     _NAV_PT + r" (?:(?:pagina|tela) (?:inicial|principal)|inicio|home|comeco)|pagina inicial|inicio"),
+    ("navigate_to_page", {"page": "create"}, "pt",
+     _NAV_PT + _PAGE_PT + r" (?:(?:criar|criacao)(?: (?:de|um|uma|o|os))?(?: contratos?)?|novo contrato)"),
+    ("navigate_to_page", {"page": "manage"}, "pt",
+     _GO_PT + _PAGE_PT + r" (?:gerenciar|gerenciamento|gestao)(?: (?:de|os|dos|meus))?(?: contratos)?"
+     + r"|" + _GO_PT + r" (?:pagina|tela|aba|area|secao)(?: (?:de|do|da))? meus contratos"),
+    ("connect_wallet", {}, "pt",
+     r"(?:(?:quero|pode|poderia|vamos) )?(?:conectar|conecte|conecta|vincular|vincule)"
+     r"(?: (?:a|minha|meu|o|sua))? (?:carteira|metamask|wallet)(?: metamask)?"),
+    ("get_current_page", {}, "pt",
+     r"(?:em )?(?:qual|que) (?:e )?(?:a )?pagina (?:(?:que )?(?:eu )?(?:estou|to)|e essa|e esta|atual)"
+     r"|(?:qual (?:e )?a )?pagina atual|onde (?:eu )?(?:estou|to)"),
+    ("go_home", {}, "en",
+     _NAV_EN + r" (?:home(?: page)?|homepage|start(?: page)?|main page|beginning)|home(?: page)?|homepage"),
+    ("navigate_to_page", {"page": "create"}, "en",
+     _NAV_EN + r" (?:create(?: a)?(?: new)? contracts?|contract creation|new contract|create)" + _PAGE_EN),
+    ("navigate_to_page", {"page": "manage"}, "en",
+     _GO_EN + r" (?:manage(?: my)? contracts?|contract management|manage)" + _PAGE_EN
+     + r"|" + _GO_EN + r" (?:my )?contracts (?:page|screen|tab|section)"),
+    ("connect_wallet", {}, "en",
+     r"(?:(?:i want to|lets|let s|can you) )?(?:connect|link)(?: (?:my|the|a))? (?:wallet|metamask)(?: wallet)?"),
+    ("get_current_page", {}, "en",
+     r"(?:what|which) page (?:am i(?: on| in)?|is this|is open)|where am i|current page"),
+]
+# Palavras inteiras: "conectar" não casa dentro de "desconectar", nem "link" em "unlink"
+_COMPILED = [(intent, args, lang, re.compile(rf"(?<!\w)(?:{pattern})(?!\w)"))
+             for intent, args, lang, pattern in _RULES]
+
+# Resultados conhecidos das tools (ai-chat-service.js) -> resposta final (pt, en)
+_PAGE_NAMES_EN = {"home": "home page", "create": "create contract page", "manage": "manage contracts page"}
+_FOLLOW_UPS = {
+    "Navegou para a página inicial.": ("Pronto! Você está na página inicial.", "Done! You're on the home page."),
+    "Navegou para página inicial.": ("Pronto! Você está na página inicial.", "Done! You're on the home page."),
+    "Navegou para criação de contrato.": (
+        "Pronto! Você está na página de criação de contrato.", "Done! You're on the create contract page."),
+    "Navegou para gerenciamento de contratos.": (
+        "Pronto! Você está na página de gerenciamento de contratos.", "Done! You're on the manage contracts page."),
+}
+_FOLLOW_UPS.update({
+    text: (text, f"You're on the {_PAGE_NAMES_EN[page]}.")
+    for page, text in {
+        "home": "Você está na página inicial.",
+        "create": "Você está na página de criação de contratos.",
+        "manage": "Você está na página de gerenciamento de contratos."
+    }.items()
+})
+_WALLET_CONNECTED = re.compile(r"^✅ Carteira conectada com sucesso! Endereço: (\S+)")
+_WALLET_ALREADY = re.compile(r"^Carteira já está conectada: (\S+)")
+
+
+def classify(text):
+    """
+    Intent de um comando curto: (intent, argumentos, idioma, confiança) ou None.
+    A confiança é a fração do texto (sem palavras de cortesia) coberta pelo padrão.
+    """
+    if _DATA.search(text):
+        return None
+    text = " ".join(_FILLERS.sub(" ", normalize(text)).split())
+    if not text:
+        return None
+
+    best = None
+    for intent, args, lang, pattern in _COMPILED:
+        match = pattern.search(text)
+        if match is None:
+            continue
+        rest = text[:match.start()] + " " + text[match.end():]
+        if _BLOCKERS.search(rest):
+            continue
+        confidence = len(match.group(0)) / len(text)
+        if best is None or confidence > best[3]:
+            best = (intent, args, lang, confidence)
+    return best
+
+# ============================================================================
+# RESPOSTAS SINTETIZADAS
+# ============================================================================
+
+def _completion(content=None, tool_calls=None):
+    """Completion no formato de `ChatCompletion.model_dump()`, sem uso de tokens."""
+    return {
+        "id": f"chatcmpl-local-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": MODEL,
+        "choices": [{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": content,
+                "tool_calls": tool_calls,
+                "function_call": None,
+                "refusal": None,
+                "audio": None
+            },
+            "finish_reason": "tool_calls" if tool_calls else "stop",
+            "logprobs": None
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        "system_fingerprint": None,
+        "service_tier": None
+    }
+
+
+def _follow_up_text(result, lang):
+    """Resposta final para o resultado de uma tool roteada, ou None (resultado desconhecido/erro)."""
+    if result in _FOLLOW_UPS:
+        return _FOLLOW_UPS[result][lang == "en"]
+    connected = _WALLET_CONNECTED.match(result)
+    if connected:
+        address = connected.group(1)
+        return f"✅ Carteira conectada! Endereço: {address}" if lang == "pt" else f"✅ Wallet connected! Address: {address}"
+    already = _WALLET_ALREADY.match(result)
+    if already:
+        return result if lang == "pt" else f"Your wallet is already connected: {already.group(1)}"
+    return None
+
+
+def _follow_up(messages):
+    """Resposta local quando as últimas mensagens são resultados de tool_calls `call_local_*`."""
+    results = []
+    for message in reversed(messages):
+        if message.get("role") != "tool":
+            break
+        results.append(message)
+    if not results or len(messages) == len(results):
+        return None
+
+    assistant = messages[-len(results) - 1]
+    tool_calls = assistant.get("tool_calls") or []
+    if assistant.get("role") != "assistant" or len(tool_calls) != len(results):
+        return None
+    if not all(tc.get("id", "").startswith("call_local_") for tc in tool_calls):
+        return None
+
+    lang = tool_calls[0]["id"].split("_")[2]
+    texts = [_follow_up_text(str(r.get("content") or ""), lang) for r in reversed(results)]
+    if None in texts:
+        return None
+    return tool_calls[0]["function"]["name"], lang, "\n".join(texts)
+
+
+def route_intent(messages, client_state=None):
+    """
+    Corpo de resposta do /chat montado sem o GPT, ou None para seguir ao GPT.
+    `get_current_page` com `client_state` é resolvido aqui mesmo (resposta em texto).
+    """
+    if not INTENT_ROUTER_ENABLED or not messages:
+        return None
+    started = time.perf_counter()
+
+    follow_up = _follow_up(messages)
+    if follow_up is not None:
+        intent, lang, text = follow_up
+        body = _completion(content=text)
+        confidence = 1.0
+    else:
+        last = messages[-1]
+        if last.get("role") != "user" or not isinstance(last.get("content"), str):
+            return None
+        match = classify(last["content"])
+        if match is None or match[3] < INTENT_ROUTER_MIN_CONFIDENCE:
+            return None
+
+        intent, args, lang, confidence = match
+        tool_call = {
+            "id": f"call_local_{lang}_{uuid.uuid4().hex[:16]}",
+            "type": "function",
+            "function": {"name": intent, "arguments": json.dumps(args)}
+        }
+        body = _completion(tool_calls=[tool_call])
+
+        # Tool de leitura com snapshot do frontend: resolve e já responde em texto
+        if intent in SERVER_TOOLS and client_state:
+            message = body["choices"][0]["message"]
+            server_messages = resolve_server_round(message, list(messages), client_state)
+            if server_messages is None:
+                return None  # client_state em formato inesperado: segue pelo fluxo normal
+            text = _follow_up_text(server_messages[-1]["content"], lang)
+            if text is None:
+                return None
+            body = completion_body(_completion(content=text), server_messages)
+
+    ROUTED.inc(intent=intent)
+    body["router"] = {
+        "intent": intent,
+        "confidence": round(confidence, 2),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+    return body
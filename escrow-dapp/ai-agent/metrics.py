@@ -0,0 +1,258 @@
+"""
+Deal-Fi AI Agent - Métricas e tracing
+Exposição em formato texto do Prometheus (/metrics) e log estruturado por requisição.
+
+Cada requisição ganha um RequestTrace (guardado num ContextVar) que acumula o tempo
+gasto esperando a OpenAI. Assim a latência total é separada em tempo upstream e
+overhead do servidor (parse, serialização, caches, tools resolvidas localmente).
+"""
+
+import json
+import threading
+import time
+from contextvars import ContextVar
+
+# Buckets de latência (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Buckets de tamanho do corpo da requisição (bytes)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current_trace = ContextVar("dealfi_request_trace", default=None)
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(dict(key))} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket_counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = dict(key)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_label_str({**labels, 'le': bound})} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_label_str({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_label_str(labels)} {total}")
+                lines.append(f"{self.name}_count{_label_str(labels)} {count}")
+        return lines
+
+
+# ============================================================================
+# MÉTRICAS
+# ============================================================================
+
+REQUESTS = Counter("dealfi_requests_total", "Requisições por rota e status HTTP")
+IN_FLIGHT = Gauge("dealfi_requests_in_flight", "Requisições em andamento")
+REQUEST_DURATION = Histogram("dealfi_request_duration_seconds", "Latência total por rota")
+UPSTREAM_DURATION = Histogram("dealfi_upstream_duration_seconds", "Tempo esperando a OpenAI por chamada")
+SERVER_OVERHEAD = Histogram("dealfi_server_overhead_seconds", "Latência total menos o tempo upstream, por rota")
+TTFT = Histogram("dealfi_time_to_first_token_seconds", "Tempo até o primeiro delta no streaming")
+REQUEST_BYTES = Histogram("dealfi_request_bytes", "Tamanho do corpo da requisição", SIZE_BUCKETS)
+UPSTREAM_CALLS = Counter("dealfi_upstream_calls_total", "Chamadas à OpenAI")
+PROMPT_TOKENS = Counter("dealfi_prompt_tokens_total", "Tokens de prompt reportados pela OpenAI")
+COMPLETION_TOKENS = Counter("dealfi_completion_tokens_total", "Tokens de completion reportados pela OpenAI")
+TOOL_CALLS = Counter("dealfi_tool_calls_total", "Tool calls retornadas pelo modelo, por função")
+ERRORS = Counter("dealfi_errors_total", "Erros por tipo de exceção")
+
+_ALL = [REQUESTS, IN_FLIGHT, REQUEST_DURATION, UPSTREAM_DURATION, SERVER_OVERHEAD, TTFT,
+        REQUEST_BYTES, UPSTREAM_CALLS, PROMPT_TOKENS, COMPLETION_TOKENS, TOOL_CALLS, ERRORS]
+
+
+def register_metric(metric):
+    """Inclui uma métrica criada em outro módulo na saída de /metrics."""
+    _ALL.append(metric)
+    return metric
+
+
+# Funções que retornam [(nome, tipo, ajuda, valor)] de outros módulos (caches etc.)
+_collectors = []
+
+
+def register_collector(fn):
+    _collectors.append(fn)
+
+
+def render():
+    """Todas as métricas no formato texto do Prometheus."""
+    lines = []
+    for metric in _ALL:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, kind, help_text, value in collector():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================================================
+# TRACE POR REQUISIÇÃO
+# ============================================================================
+
+class RequestTrace:
+    """Tempos e contadores de uma requisição."""
+
+    def __init__(self, request_bytes=0):
+        self.route = None
+        self.request_bytes = request_bytes
+        self.start = time.perf_counter()
+        self.upstream_seconds = 0.0
+        self.upstream_calls = 0
+        self.ttft = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = []
+        self.model_routes = []
+        self.error = None
+        self.finished = False
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+            TTFT.observe(self.ttft)
+
+    def upstream_call(self, seconds, prompt_tokens, completion_tokens, tool_calls):
+        self.upstream_seconds += seconds
+        self.upstream_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.tool_calls.extend(tool_calls)
+
+
+def record_upstream(started, usage=None, message=None, trace=None):
+    """
+    Registra uma chamada à OpenAI iniciada em `started` (perf_counter).
+    `usage` e `message` podem ser objetos pydantic ou dicts. Sem `trace`,
+    usa o trace da requisição atual (se houver).
+    """
+    seconds = time.perf_counter() - started
+    UPSTREAM_DURATION.observe(seconds)
+    UPSTREAM_CALLS.inc()
+
+    prompt_tokens = completion_tokens = 0
+    if usage is not None:
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        PROMPT_TOKENS.inc(prompt_tokens)
+        COMPLETION_TOKENS.inc(completion_tokens)
+
+    tool_calls = []
+    if message is not None:
+        if not isinstance(message, dict):
+            message = message.model_dump()
+        for tc in message.get("tool_calls") or []:
+            tool_calls.append(tc["function"]["name"])
+            TOOL_CALLS.inc(function=tc["function"]["name"])
+
+    trace = trace or current_trace()
+    if trace is not None:
+        trace.upstream_call(seconds, prompt_tokens, completion_tokens, tool_calls)
+
+
+def start_request(request_bytes=0):
+    """Abre o trace da requisição atual."""
+    trace = RequestTrace(request_bytes)
+    _current_trace.set(trace)
+    IN_FLIGHT.inc()
+    return trace
+
+
+def current_trace():
+    """Trace da requisição atual (None fora de uma requisição instrumentada)."""
+    return _current_trace.get()
+
+
+def record_error(e, trace=None):
+    """Conta um erro e o associa ao trace (por padrão, o da requisição atual)."""
+    ERRORS.inc(type=type(e).__name__)
+    trace = trace or current_trace()
+    if trace is not None:
+        trace.error = type(e).__name__
+
+
+def finish_request(trace, route, status):
+    """
+    Fecha o trace: histogramas, contadores e uma linha de log JSON.
+    `route` é o nome do endpoint (igual nos servidores Flask e ASGI).
+    """
+    if trace is None or trace.finished:
+        return
+    trace.finished = True
+    trace.route = route
+    total = time.perf_counter() - trace.start
+    overhead = max(total - trace.upstream_seconds, 0.0)
+
+    IN_FLIGHT.dec()
+    REQUESTS.inc(route=trace.route, status=status)
+    REQUEST_DURATION.observe(total, route=trace.route)
+    SERVER_OVERHEAD.observe(overhead, route=trace.route)
+    REQUEST_BYTES.observe(trace.request_bytes, route=trace.route)
+
+    print(json.dumps({
+        "event": "request",
+        "route": trace.route,
+        "status": status,
+        "total_ms": round(total * 1000, 1),
+        "upstream_ms": round(trace.upstream_seconds * 1000, 1),
+        "overhead_ms": round(overhead * 1000, 1),
+        "ttft_ms": round(trace.ttft * 1000, 1) if trace.ttft is not None else None,
+        "upstream_calls": trace.upstream_calls,
+        "request_bytes": trace.request_bytes,
+        "prompt_tokens": trace.prompt_tokens,
+        "completion_tokens": trace.completion_tokens,
+        "tool_calls": trace.tool_calls,
+        "model_routes": trace.model_routes,
+        "error": trace.error
+    }), flush=True)
+    _current_trace.set(None)
@@ -0,0 +1,130 @@
+"""
+Deal-Fi AI Agent - Roteamento entre modelos (tiers)
+Turnos curtos guiados por tools (preencher formulário, editar marcos, confirmar
+uma ação já executada) vão para um modelo menor e mais rápido; explicações e
+pedidos com várias etapas vão para o modelo grande (OPENAI_MODEL).
+
+Se o modelo pequeno devolver uma tool_call malformada (função inexistente,
+JSON inválido, argumento obrigatório ausente ou fora do enum/tipo), a mesma
+chamada é refeita no modelo grande.
+
+Políticas (MODEL_ROUTER_POLICY):
+- auto:  decide por turno (padrão);
+- large: sempre o modelo grande (comportamento anterior);
+- small: sempre o modelo pequeno (ainda escala em tool_call malformada).
+"""
+
+import os
+import re
+
+from core import MODEL
+from metrics import Counter, Histogram, current_trace, register_metric
+from response_cache import normalize
+from tool_validation import parse_arguments, repair_arguments, schema_problem
+
+OPENAI_SMALL_MODEL = os.getenv("OPENAI_SMALL_MODEL", "gpt-4o-mini")
+MODEL_ROUTER_POLICY = os.getenv("MODEL_ROUTER_POLICY", "auto")
+# Mensagens do usuário acima deste tamanho vão para o modelo grande
+MODEL_ROUTER_SMALL_MAX_CHARS = int(os.getenv("MODEL_ROUTER_SMALL_MAX_CHARS", 200))
+
+ROUTES = register_metric(Counter("dealfi_model_routes_total", "Chamadas por tier e motivo da escolha"))
+ESCALATIONS = register_metric(Counter("dealfi_model_escalations_total", "Escalonamentos do modelo pequeno para o grande"))
+TIER_DURATION = register_metric(Histogram("dealfi_model_tier_duration_seconds", "Latência das chamadas por tier"))
+
+# Tools cujo resultado só precisa de uma confirmação curta
+_SMALL_TOOLS = {
+    "navigate_to_page", "go_home", "get_current_page", "fill_form_field", "add_milestone",
+    "update_milestone", "remove_milestone", "connect_wallet", "get_wallet_status", "list_my_contracts"
+}
+_EXPLANATORY = re.compile(
+    r"\b(?:como|por que|porque|pq|o que|qual a diferenca|explique|explica|funciona|seguro|"
+    r"how|why|what is|what are|explain|difference|works|safe)\b"
+)
+_MULTI_STEP = re.compile(r"\b(?:e depois|depois|em seguida|e tambem|and then|then|after that|also)\b")
+_FORM_ACTION = re.compile(
+    r"\b(?:preench\w*|coloc\w*|mud\w*|alter\w*|defin\w*|valor|prazo|dias?|endereco|recebedor|"
+    r"marcos?|adicion\w*|remov\w*|exclu\w*|porcentage\w*|percentu\w*|usdc|pol|"
+    r"fill|set|change|amount|duration|days?|address|payee|milestones?|add|remove|percent\w*)\b"
+)
+
+
+def _last_user_text(messages):
+    for message in reversed(messages):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return ""
+
+
+def _pending_tool_names(messages):
+    """Nomes das tools cujos resultados encerram `messages` (vazio se a última mensagem não é de tool)."""
+    if not messages or messages[-1].get("role") != "tool":
+        return set()
+    for message in reversed(messages):
+        if message.get("role") == "assistant":
+            return {tc["function"]["name"] for tc in message.get("tool_calls") or []}
+    return set()
+
+
+def choose_model(messages):
+    """Tier da próxima chamada: (tier, modelo, motivo)."""
+    if MODEL_ROUTER_POLICY == "large" or not OPENAI_SMALL_MODEL or OPENAI_SMALL_MODEL == MODEL:
+        return "large", MODEL, "policy"
+    if MODEL_ROUTER_POLICY == "small":
+        return "small", OPENAI_SMALL_MODEL, "policy"
+
+    text = _last_user_text(messages)
+    normalized = normalize(text)
+    if _EXPLANATORY.search(normalized) or text.rstrip().endswith("?"):
+        return "large", MODEL, "explanatory"
+    if _MULTI_STEP.search(normalized):
+        return "large", MODEL, "multi_step"
+    if len(text) > MODEL_ROUTER_SMALL_MAX_CHARS:
+        return "large", MODEL, "long_turn"
+
+    pending = _pending_tool_names(messages)
+    if pending:
+        if pending <= _SMALL_TOOLS:
+            return "small", OPENAI_SMALL_MODEL, "tool_result"
+        return "large", MODEL, "tool_result"
+    if _FORM_ACTION.search(normalized):
+        return "small", OPENAI_SMALL_MODEL, "form_action"
+    return "large", MODEL, "default"
+
+
+def malformed_tool_call(message):
+    """
+    Motivo pelo qual a resposta do modelo pequeno deve ser refeita, ou None.
+    `message` é a mensagem do assistente (dict ou objeto pydantic). Argumentos que
+    a validação consegue corrigir (apelidos, unidades) não contam como malformados.
+    """
+    if not isinstance(message, dict):
+        message = message.model_dump()
+    tool_calls = message.get("tool_calls") or []
+    if not tool_calls and not message.get("content"):
+        return "empty_response"
+
+    for tc in tool_calls:
+        name = tc["function"]["name"]
+        args = parse_arguments(tc)
+        if args is None:
+            return "invalid_json"
+        problem = schema_problem(name, repair_arguments(name, args))
+        if problem:
+            return problem
+    return None
+
+
+def escalate(reason):
+    """Tier usado ao refazer uma resposta malformada do modelo pequeno."""
+    ESCALATIONS.inc(reason=reason)
+    print(f"[model-router] escalando para {MODEL}: {reason}")
+    return "large", MODEL, f"escalated_{reason}"
+
+
+def record_route(tier, reason, seconds, trace=None):
+    """Registra a escolha do tier e a latência da chamada."""
+    ROUTES.inc(tier=tier, reason=reason)
+    TIER_DURATION.observe(seconds, tier=tier)
+    trace = trace or current_trace()
+    if trace is not None:
+        trace.model_routes.append(f"{tier}:{reason}")
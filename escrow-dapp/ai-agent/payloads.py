@@ -0,0 +1,213 @@
+"""
+Deal-Fi AI Agent - Serialização e compressão dos corpos HTTP
+JSON com orjson (quando instalado), modo de resposta enxuto e negociação de
+gzip/brotli nos corpos de requisição e de resposta.
+
+Modo enxuto (header `Prefer: return=minimal` ou `"lean": true` no payload):
+a resposta do /chat traz só o que o ai-chat-service.js usa
+(`choices[0].message`, `finish_reason`, `usage`, `server_messages`, `session_id`),
+sem os campos nulos do `model_dump()` (refusal, audio, function_call, logprobs...).
+Como a mensagem do assistente volta no histórico, o próximo request também encolhe.
+
+Compressão:
+- resposta: `Accept-Encoding` com br (se o módulo brotli existir) ou gzip, a
+  partir de COMPRESSION_MIN_BYTES; SSE não é comprimido (atrasaria os deltas);
+- requisição: `Content-Encoding: gzip`, `deflate` ou `br`, limitada a
+  MAX_REQUEST_BYTES depois de descomprimida.
+"""
+
+import gzip
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:  # fallback: json da stdlib
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # sem brotli só gzip é oferecido
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+# Corpos menores que isto não compensam o custo de comprimir
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 512))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+# Tamanho máximo do corpo da requisição depois de descomprimido
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 4 * 1024 * 1024))
+
+JSON_CONTENT_TYPE = "application/json"
+_BROTLI_ERRORS = (brotli.error,) if brotli is not None else ()
+
+
+class PayloadError(ValueError):
+    """Corpo de requisição inválido; `status` é o código HTTP a devolver."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def payload_error_body(e):
+    """Corpo de erro para um PayloadError (mesmo formato de core.error_body)."""
+    return {"error": {"message": str(e), "type": "invalid_request"}}
+
+# ============================================================================
+# JSON
+# ============================================================================
+
+def dumps(obj):
+    """JSON em bytes (UTF-8, sem espaços)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# ============================================================================
+# REQUISIÇÃO
+# ============================================================================
+
+def _inflate(decompressor, data):
+    out = decompressor.decompress(data, MAX_REQUEST_BYTES + 1)
+    if len(out) > MAX_REQUEST_BYTES or decompressor.unconsumed_tail:
+        raise PayloadError("Corpo da requisição grande demais.", 413)
+    return out
+
+
+def _unbrotli(data):
+    # Saída limitada como no _inflate: um corpo pequeno não aloca o descomprimido inteiro
+    decompressor = brotli.Decompressor()
+    out = decompressor.process(data, output_buffer_limit=MAX_REQUEST_BYTES + 1)
+    if len(out) > MAX_REQUEST_BYTES:
+        raise PayloadError("Corpo da requisição grande demais.", 413)
+    if not decompressor.is_finished():
+        raise PayloadError("Corpo comprimido inválido: stream brotli incompleto")
+    return out
+
+
+def decode_body(data, content_encoding=None):
+    """Corpo da requisição descomprimido conforme `Content-Encoding`."""
+    encoding = (content_encoding or "identity").strip().lower()
+    try:
+        if encoding == "identity":
+            body = data
+        elif encoding in ("gzip", "x-gzip"):
+            body = _inflate(zlib.decompressobj(16 + zlib.MAX_WBITS), data)
+        elif encoding == "deflate":
+            body = _inflate(zlib.decompressobj(), data)
+        elif encoding == "br" and brotli is not None:
+            body = _unbrotli(data)
+        else:
+            raise PayloadError(f"Content-Encoding não suportado: {encoding}", 415)
+    except (zlib.error, *_BROTLI_ERRORS) as e:
+        raise PayloadError(f"Corpo comprimido inválido: {e}")
+
+    if len(body) > MAX_REQUEST_BYTES:
+        raise PayloadError("Corpo da requisição grande demais.", 413)
+    return body
+
+
+def read_payload(data, content_encoding=None):
+    """Payload JSON (dict) da requisição, descomprimido."""
+    body = decode_body(data, content_encoding)
+    try:
+        payload = loads(body or b"{}")
+    except ValueError as e:
+        raise PayloadError(f"JSON inválido: {e}")
+    if not isinstance(payload, dict):
+        raise PayloadError("O payload deve ser um objeto JSON.")
+    return payload
+
+# ============================================================================
+# RESPOSTA
+# ============================================================================
+
+def wants_lean(prefer_header, payload=None):
+    """Se o cliente pediu o modo enxuto (`Prefer: return=minimal` ou `"lean": true`)."""
+    if payload and payload.get("lean"):
+        return True
+    return "return=minimal" in (prefer_header or "").replace(" ", "").lower()
+
+
+def _lean_message(message):
+    lean = {"role": message.get("role", "assistant"), "content": message.get("content")}
+    if message.get("tool_calls"):
+        lean["tool_calls"] = [{
+            "id": tc["id"],
+            "type": tc.get("type", "function"),
+            "function": {"name": tc["function"]["name"], "arguments": tc["function"]["arguments"]}
+        } for tc in message["tool_calls"]]
+    return lean
+
+
+def lean_body(body):
+    """Só os campos do corpo do /chat que o frontend lê."""
+    choice = body["choices"][0]
+    lean = {"choices": [{"message": _lean_message(choice["message"]), "finish_reason": choice.get("finish_reason")}]}
+    usage = body.get("usage")
+    if usage:
+        lean["usage"] = {key: usage.get(key) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    for key in ("server_messages", "session_id"):
+        if body.get(key):
+            lean[key] = body[key]
+    return lean
+
+
+def _accepts(accept_encoding, coding):
+    """Se `coding` é aceito (q > 0) no header Accept-Encoding."""
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() not in (coding, "*"):
+            continue
+        quality = params.strip().replace(" ", "")
+        if not quality.startswith("q="):
+            return True
+        try:
+            return float(quality[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def choose_encoding(accept_encoding):
+    """Codificação da resposta: "br", "gzip" ou None."""
+    if not COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return "br"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_json(body, accept_encoding=None, lean=False):
+    """
+    Corpo JSON pronto para a resposta: (bytes, headers).
+    Os headers trazem Content-Type, Vary e, se comprimido, Content-Encoding.
+    """
+    if lean and "choices" in body:
+        body = lean_body(body)
+    data = dumps(body)
+    # O corpo muda com a compressão e com o modo enxuto (Prefer)
+    headers = {"Content-Type": JSON_CONTENT_TYPE, "Vary": "Accept-Encoding, Prefer"}
+    encoding = choose_encoding(accept_encoding) if len(data) >= COMPRESSION_MIN_BYTES else None
+    if encoding:
+        data = compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+    if lean:
+        headers["Preference-Applied"] = "return=minimal"
+    return data, headers
@@ -0,0 +1,169 @@
+"""
+Deal-Fi AI Agent - Prompt caching do provedor
+Mantém o prefixo estático (system prompt + tools) byte a byte idêntico entre
+requisições e mede quanto dele a OpenAI serviu do cache (`cached_tokens`).
+
+O cache da OpenAI só é aproveitado quando o início do prompt é exatamente igual
+ao de requisições anteriores, por isso:
+- o system prompt do servidor é sempre a primeira mensagem (o mesmo objeto);
+- as tools são sempre a mesma lista, na mesma ordem;
+- o prefixo é serializado uma vez no startup e sua impressão digital é conferida.
+
+Variantes por página: o prompt e as tools são montados conforme a página e o
+estado da carteira do `client_state` (prompts.compose_system_prompt). Há poucas
+variantes (página × carteira conectada, mais a completa); todas são montadas e
+serializadas no startup e cada uma tem a sua `prompt_cache_key`, então cada
+variante continua com um prefixo estável. A variante de uma conversa é
+identificada pela mensagem de sistema (`variant_for`), que leva junto as tools.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from metrics import register_collector
+from prompts import PAGES, SYSTEM_PROMPT, TOOLS, compose_system_prompt, page_tools
+
+# Envia `prompt_cache_key` para a OpenAI agrupar as requisições com o mesmo prefixo
+PROMPT_CACHE_KEY_ENABLED = os.getenv("OPENAI_PROMPT_CACHE_KEY", "1") == "1"
+# Prompt e tools conforme a página do client_state (0 = sempre o prompt completo)
+PAGE_PROMPTS_ENABLED = os.getenv("PAGE_PROMPTS", "1") == "1"
+
+
+def _serialize_prefix(system, tools):
+    return json.dumps({"system": system, "tools": tools}, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptVariant:
+    """System prompt + tools de uma página, serializados uma vez no startup."""
+
+    def __init__(self, name, system, tools):
+        self.name = name
+        self.tools = tools
+        # Mensagem de sistema única da variante, reaproveitada em todas as requisições
+        self.system_message = {"role": "system", "content": system}
+        self.prefix_json = _serialize_prefix(system, tools)
+        self.fingerprint = hashlib.sha256(self.prefix_json.encode("utf-8")).hexdigest()[:16]
+
+    def is_stable(self):
+        return _serialize_prefix(self.system_message["content"], self.tools) == self.prefix_json
+
+
+def _build_variants():
+    variants = {"full": PromptVariant("full", SYSTEM_PROMPT, TOOLS)}
+    for page in PAGES:
+        for wallet_connected in (False, True):
+            name = f"{page}:wallet" if wallet_connected else page
+            variants[name] = PromptVariant(
+                name, compose_system_prompt(page, wallet_connected), page_tools(page, wallet_connected)
+            )
+    return variants
+
+
+VARIANTS = _build_variants()
+FULL_VARIANT = VARIANTS["full"]
+_BY_SYSTEM = {}
+for _variant in VARIANTS.values():
+    # Variantes com o mesmo conteúdo (ex.: a completa e a de criação) são o mesmo prefixo
+    _BY_SYSTEM.setdefault(_variant.system_message["content"], _variant)
+
+# Prefixo completo (sem client_state), mantido para compatibilidade
+PREFIX_JSON = FULL_VARIANT.prefix_json
+PREFIX_FINGERPRINT = FULL_VARIANT.fingerprint
+SYSTEM_MESSAGE = FULL_VARIANT.system_message
+
+
+def select_variant(client_state=None):
+    """Variante da página/carteira informadas pelo frontend (a completa se não houver)."""
+    if not PAGE_PROMPTS_ENABLED or not isinstance(client_state, dict) or client_state.get("page") not in PAGES:
+        return FULL_VARIANT
+    wallet = client_state.get("wallet") or {}
+    connected = isinstance(wallet, dict) and bool(wallet.get("connected"))
+    return VARIANTS[f"{client_state['page']}:wallet" if connected else client_state["page"]]
+
+
+def variant_for(messages):
+    """Variante de uma lista de mensagens, pela mensagem de sistema do servidor."""
+    if messages and messages[0].get("role") == "system":
+        return _BY_SYSTEM.get(messages[0].get("content"), FULL_VARIANT)
+    return FULL_VARIANT
+
+
+def is_server_system_prompt(content):
+    return content in _BY_SYSTEM
+
+
+def prefix_is_stable():
+    """Confere se nenhuma variante (system prompt + tools) mudou desde o startup."""
+    return all(variant.is_stable() for variant in VARIANTS.values())
+
+
+def upstream_extra_body(messages=None):
+    """Campos extras da chamada à OpenAI para favorecer o cache do prefixo da variante."""
+    if PROMPT_CACHE_KEY_ENABLED:
+        return {"prompt_cache_key": f"dealfi-{variant_for(messages).fingerprint}"}
+    return None
+
+
+class PromptCacheStats:
+    """Contadores de uso do cache de prompt do provedor (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.requests_with_hit = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage):
+        """Registra o `usage` de um completion (objeto pydantic ou dict)."""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.cached_tokens += cached
+            if cached:
+                self.requests_with_hit += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "prefix_fingerprint": PREFIX_FINGERPRINT,
+                "prefix_stable": prefix_is_stable(),
+                "variants": {
+                    name: {"fingerprint": variant.fingerprint, "prefix_chars": len(variant.prefix_json)}
+                    for name, variant in VARIANTS.items()
+                },
+                "requests": self.requests,
+                "requests_with_hit": self.requests_with_hit,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "request_hit_rate": self.requests_with_hit / self.requests if self.requests else 0.0,
+                "token_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def _collect():
+    stats = prompt_cache_stats.snapshot()
+    return [
+        ("dealfi_prompt_cache_prompt_tokens_total", "counter",
+         "Tokens de prompt com usage reportado", stats["prompt_tokens"]),
+        ("dealfi_prompt_cache_cached_tokens_total", "counter",
+         "Tokens de prompt servidos do cache da OpenAI", stats["cached_tokens"]),
+        ("dealfi_prompt_cache_token_hit_ratio", "gauge",
+         "Fração dos tokens de prompt servida do cache", stats["token_hit_rate"]),
+        ("dealfi_prompt_prefix_stable", "gauge",
+         "1 se os prefixos (system + tools) são iguais aos do startup", int(stats["prefix_stable"])),
+    ]
+
+
+register_collector(_collect)
@@ -0,0 +1,289 @@
+"""
+Deal-Fi AI Agent - Limite de requisições por cliente
+Token buckets por cliente para requisições e para tokens da OpenAI, checados
+antes de o corpo da requisição ser lido (recusa barata, 429 + Retry-After).
+
+Um cliente é identificado pelo IP e, quando existirem, pela sessão (/sessions/<id>/chat)
+e pela carteira (header X-Wallet-Address); cada identidade tem os seus buckets e todas
+precisam ter saldo. O header de carteira não é autenticado, mas trocar de carteira não
+escapa do bucket do IP. A identidade mais específica é a chave do cliente na fila justa
+da OpenAI (resilience.UpstreamLimiter).
+
+O bucket de tokens é cobrado depois da chamada, pelo `usage` real: a requisição entra
+se o saldo for positivo e pode deixá-lo negativo (o cliente espera a dívida ser paga).
+
+Backends (RATE_LIMIT_BACKEND):
+- memory: dicionário em memória com despejo LRU (padrão; um processo)
+- sqlite: arquivo SQLite (RATE_LIMIT_DB_PATH), compartilhado entre workers do gunicorn
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from metrics import Counter, register_metric
+from resilience import UpstreamUnavailable
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "rate_limit.db")
+# Requisições por minuto por cliente e rajada máxima
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", 30))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 10))
+# Tokens da OpenAI (prompt + resposta) por minuto por cliente; a rajada é um minuto
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", 60000))
+# Clientes acompanhados no backend memory (os mais antigos são esquecidos = bucket cheio)
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", 100000))
+# Proxies confiáveis na frente do servidor (Railway: 1); o IP vem do X-Forwarded-For.
+# Só este valor escolhe o salto: o servidor não pode reescrever o endereço da conexão
+# (uvicorn --no-proxy-headers, como no Procfile; sem ProxyFix no Flask)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 0))
+# Pesos na fila justa, ex.: "ip:10.0.0.5=4,wallet:0xabc...=2" (padrão 1)
+RATE_LIMIT_WEIGHTS = os.getenv("RATE_LIMIT_WEIGHTS", "")
+
+_WALLET = re.compile(r"^0x[0-9a-fA-F]{40}$")
+_SESSION = re.compile(r"^[\w-]{1,64}$")
+
+RATE_LIMITED = register_metric(Counter(
+    "dealfi_rate_limited_total", "Requisições recusadas pelo limite por cliente"
+))
+
+
+def _parse_weights(value):
+    weights = {}
+    for item in value.split(","):
+        key, _, weight = item.strip().rpartition("=")
+        if key and weight:
+            weights[key.lower()] = float(weight)
+    return weights
+
+
+WEIGHTS = _parse_weights(RATE_LIMIT_WEIGHTS)
+
+
+class Client:
+    """Identidades de quem fez a requisição; `flow` é a chave na fila justa."""
+
+    __slots__ = ("keys", "flow", "weight")
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self.flow = self.keys[-1] if self.keys else None
+        self.weight = max((WEIGHTS[k] for k in self.keys if k in WEIGHTS), default=1.0)
+
+
+ANONYMOUS = Client(())
+
+_current_client = ContextVar("dealfi_rate_limit_client", default=ANONYMOUS)
+
+
+def client_ip(remote_addr, forwarded_for=None, trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES):
+    """
+    IP do cliente: o endereço da conexão ou, atrás de N proxies, o N-ésimo do fim do
+    X-Forwarded-For (os saltos à esquerda dele vêm do cliente e podem ser forjados).
+    `remote_addr` precisa ser o endereço real da conexão, não um já tirado do header.
+    """
+    if trusted_proxies > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return remote_addr or "unknown"
+
+
+def client_identity(headers, remote_addr, session_id=None):
+    """
+    Client a partir dos headers e do endereço da conexão (sem ler o corpo).
+    `headers` é qualquer mapeamento com get() sem distinção de maiúsculas (Flask/Starlette).
+    """
+    keys = [f"ip:{client_ip(remote_addr, headers.get('X-Forwarded-For'))}"]
+    wallet = headers.get("X-Wallet-Address")
+    if wallet and _WALLET.match(wallet):
+        keys.append(f"wallet:{wallet.lower()}")
+    if session_id and _SESSION.match(session_id):
+        keys.append(f"session:{session_id}")
+    return Client(keys)
+
+
+def current_client():
+    """Client da requisição atual (ANONYMOUS fora de uma requisição com limite)."""
+    return _current_client.get()
+
+
+def bind_client(client):
+    """
+    Torna `client` o cliente da requisição atual. No ASGI o admit roda no threadpool,
+    num contexto copiado: o cliente precisa ser ligado antes, no event loop.
+    """
+    _current_client.set(client)
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class MemoryBucketStore:
+    """Buckets em memória com despejo LRU (thread-safe)."""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # chave -> (requests, tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def update(self, keys, fn):
+        """
+        Aplica fn({chave: estado ou None}, agora) e grava os estados que ela devolver.
+        Uma exceção em fn não grava nada.
+        """
+        with self._lock:
+            now = self.clock()
+            states = fn({key: self._buckets.get(key) for key in keys}, now)
+            for key, state in states.items():
+                self._buckets[key] = state
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets num arquivo SQLite, compartilhados entre processos."""
+
+    clock = staticmethod(time.time)
+
+    # Uma limpeza de buckets parados a cada N atualizações
+    PURGE_EVERY = 1000
+
+    def __init__(self, path=RATE_LIMIT_DB_PATH, idle_ttl=None):
+        # Sem uso por mais que isso o bucket já estaria cheio: pode ser apagado
+        self.idle_ttl = idle_ttl or max(60.0, 60.0 * RATE_LIMIT_BURST / max(RATE_LIMIT_RPM, 0.001))
+        self._lock = threading.Lock()
+        self._updates = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def update(self, keys, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                placeholders = ",".join("?" * len(keys))
+                rows = self._conn.execute(
+                    f"SELECT key, requests, tokens, updated_at FROM rate_buckets WHERE key IN ({placeholders})",
+                    keys
+                ).fetchall()
+                found = {row[0]: row[1:] for row in rows}
+                states = fn({key: found.get(key) for key in keys}, now)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (key, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                    [(key, *state) for key, state in states.items()]
+                )
+                self._updates += 1
+                if self._updates % self.PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - self.idle_ttl,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+def create_store():
+    """Instancia o backend configurado em RATE_LIMIT_BACKEND."""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBucketStore()
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore()
+    raise ValueError(f"RATE_LIMIT_BACKEND inválido: {RATE_LIMIT_BACKEND} (use memory ou sqlite)")
+
+
+# ============================================================================
+# LIMITADOR
+# ============================================================================
+
+class RateLimiter:
+    """Token buckets de requisições e de tokens para cada identidade do cliente."""
+
+    def __init__(self, store=None, rpm=RATE_LIMIT_RPM, burst=RATE_LIMIT_BURST, tpm=RATE_LIMIT_TPM,
+                 enabled=RATE_LIMIT_ENABLED):
+        self.store = store if store is not None else create_store()
+        self.enabled = enabled
+        self.burst = burst
+        self.token_burst = tpm
+        self.request_rate = rpm / 60.0   # por segundo
+        self.token_rate = tpm / 60.0
+
+    def _refill(self, state, now):
+        """(requests, tokens) do bucket em `now`; sem estado, o bucket está cheio."""
+        if state is None:
+            return self.burst, self.token_burst
+        requests, tokens, updated_at = state
+        elapsed = max(0.0, now - updated_at)
+        return (
+            min(self.burst, requests + elapsed * self.request_rate),
+            min(self.token_burst, tokens + elapsed * self.token_rate)
+        )
+
+    def admit(self, client):
+        """
+        Consome uma requisição de cada identidade do cliente e o torna o cliente
+        da requisição atual, ou levanta UpstreamUnavailable("rate_limited").
+        """
+        bind_client(client)
+        if not self.enabled or not client.keys:
+            return
+
+        def take(states, now):
+            balances = {key: self._refill(state, now) for key, state in states.items()}
+            wait, bucket = 0.0, None
+            for requests, tokens in balances.values():
+                if requests < 1 and (1 - requests) / self.request_rate > wait:
+                    wait, bucket = (1 - requests) / self.request_rate, "requests"
+                if tokens <= 0 and (1 - tokens) / self.token_rate > wait:
+                    wait, bucket = (1 - tokens) / self.token_rate, "tokens"
+            if bucket is not None:
+                RATE_LIMITED.inc(bucket=bucket)
+                raise UpstreamUnavailable("rate_limited", wait)
+            return {key: (requests - 1, tokens, now) for key, (requests, tokens) in balances.items()}
+
+        self.store.update(client.keys, take)
+
+    def charge(self, client, usage):
+        """Desconta os tokens usados numa chamada à OpenAI (`usage` pydantic ou dict)."""
+        if not self.enabled or not client.keys or usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        used = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+        if not used:
+            return
+
+        def spend(states, now):
+            charged = {}
+            for key, state in states.items():
+                requests, tokens = self._refill(state, now)
+                # A dívida fica limitada a um minuto de tokens
+                charged[key] = (requests, max(-self.token_burst, tokens - used), now)
+            return charged
+
+        self.store.update(client.keys, spend)
+
+    def collect(self):
+        return [
+            ("dealfi_rate_limit_clients", "gauge", "Identidades com bucket acompanhado", len(self.store)),
+        ]
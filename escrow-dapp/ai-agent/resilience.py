@@ -0,0 +1,559 @@
+"""
+Deal-Fi AI Agent - Resiliência das chamadas à OpenAI
+Timeouts e pool de conexões ajustáveis, retries com backoff exponencial e jitter
+(respeitando os headers de rate limit), limite de chamadas simultâneas com fila
+e descarte de carga (429 + Retry-After) e circuit breaker.
+
+A fila de espera por uma vaga é justa e ponderada por cliente (start-time fair
+queueing): a vaga liberada vai para o cliente que menos usou, e não para quem
+chegou primeiro, então um cliente com muitas requisições não atrasa os demais.
+
+Os retries do SDK ficam desligados (max_retries=0): quem decide se e quanto
+esperar é este módulo, que também alimenta o circuit breaker.
+
+O SDK da OpenAI é importado dentro das funções que o usam (não no import do módulo),
+para que o servidor suba sem ele; ver startup.py.
+"""
+
+import asyncio
+import email.utils
+import heapq
+import itertools
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+
+from metrics import register_collector
+
+# Timeouts (segundos). `read` é o intervalo máximo entre bytes (no streaming, entre chunks).
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", 60))
+OPENAI_WRITE_TIMEOUT = float(os.getenv("OPENAI_WRITE_TIMEOUT", 10))
+OPENAI_POOL_TIMEOUT = float(os.getenv("OPENAI_POOL_TIMEOUT", 5))
+
+# Pool de conexões HTTP com a OpenAI
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", 32))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+
+# Retries: espera sorteada em [0, min(MAX_DELAY, BASE * 2^tentativa)] ("full jitter").
+# Se a OpenAI pedir uma espera maior que MAX_DELAY, a chamada falha na hora.
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_RETRY_BASE = float(os.getenv("UPSTREAM_RETRY_BASE", 0.5))
+UPSTREAM_RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", 8))
+
+# Chamadas simultâneas à OpenAI; excedentes esperam numa fila limitada
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", 32))
+UPSTREAM_QUEUE_SIZE = int(os.getenv("UPSTREAM_QUEUE_SIZE", 64))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", 10))
+# Requisições de um mesmo cliente esperando na fila (as excedentes recebem 429)
+UPSTREAM_QUEUE_PER_CLIENT = int(os.getenv("UPSTREAM_QUEUE_PER_CLIENT", 8))
+# Retry-After sugerido ao cliente quando a requisição é descartada
+UPSTREAM_SHED_RETRY_AFTER = int(os.getenv("UPSTREAM_SHED_RETRY_AFTER", 2))
+
+# Circuit breaker: abre após N falhas seguidas e testa de novo depois de RESET segundos
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+
+UPSTREAM_TIMEOUT = httpx.Timeout(
+    connect=OPENAI_CONNECT_TIMEOUT,
+    read=OPENAI_READ_TIMEOUT,
+    write=OPENAI_WRITE_TIMEOUT,
+    pool=OPENAI_POOL_TIMEOUT
+)
+UPSTREAM_LIMITS = httpx.Limits(
+    max_connections=OPENAI_MAX_CONNECTIONS,
+    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+)
+
+
+def client_options():
+    """Argumentos de OpenAI(...) / AsyncOpenAI(...) (sem o http_client)."""
+    return {"timeout": UPSTREAM_TIMEOUT, "max_retries": 0}
+
+
+def http_client():
+    """Cliente HTTP do SDK síncrono com o pool ajustado."""
+    import openai
+
+    return openai.DefaultHttpxClient(limits=UPSTREAM_LIMITS, timeout=UPSTREAM_TIMEOUT)
+
+
+def async_http_client():
+    """Cliente HTTP do SDK assíncrono com o pool ajustado."""
+    import openai
+
+    return openai.DefaultAsyncHttpxClient(limits=UPSTREAM_LIMITS, timeout=UPSTREAM_TIMEOUT)
+
+
+class UpstreamUnavailable(Exception):
+    """Chamada recusada sem ir à OpenAI (fila cheia ou circuito aberto)."""
+
+    def __init__(self, reason, retry_after):
+        messages = {
+            "overloaded": "Servidor ocupado, tente novamente em instantes",
+            "rate_limited": "Limite de requisições excedido, tente novamente em instantes",
+            "circuit_open": "OpenAI indisponível no momento, tente novamente em instantes"
+        }
+        super().__init__(messages[reason])
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+# ============================================================================
+# RATE LIMIT HEADERS
+# ============================================================================
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_duration(value):
+    """Duração no formato da OpenAI ("20ms", "1s", "6m0s") em segundos."""
+    parts = _DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers):
+    """
+    Espera pedida pela OpenAI, em segundos (None se não houver indicação):
+    retry-after-ms, retry-after (segundos ou data HTTP) ou, sem eles, o reset
+    do limite (requests/tokens) que chegou a zero.
+    """
+    if headers is None:
+        return None
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(retry_after)
+            if date is not None:
+                return max(date.timestamp() - time.time(), 0.0)
+
+    waits = [
+        _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        for kind in ("requests", "tokens")
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+    ]
+    waits = [w for w in waits if w is not None]
+    return max(waits) if waits else None
+
+
+def _is_retryable(e):
+    import openai
+
+    if isinstance(e, openai.APIConnectionError):  # inclui APITimeoutError
+        return True
+    if isinstance(e, openai.APIStatusError):
+        should_retry = e.response.headers.get("x-should-retry")
+        if should_retry in ("true", "false"):
+            return should_retry == "true"
+        return e.status_code in (408, 409, 429) or e.status_code >= 500
+    return False
+
+
+def _is_failure(e):
+    """Erros que indicam a OpenAI fora do ar (contam para o circuit breaker)."""
+    import openai
+
+    if isinstance(e, openai.APIConnectionError):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _retry_delay(e, attempt):
+    """Espera antes da próxima tentativa, ou None para desistir."""
+    import openai
+
+    if attempt >= UPSTREAM_MAX_RETRIES or not _is_retryable(e):
+        return None
+    hinted = retry_after_seconds(e.response.headers) if isinstance(e, openai.APIStatusError) else None
+    if hinted is not None:
+        return hinted if hinted <= UPSTREAM_RETRY_MAX_DELAY else None
+    return random.uniform(0, min(UPSTREAM_RETRY_MAX_DELAY, UPSTREAM_RETRY_BASE * 2 ** attempt))
+
+
+def error_status(e):
+    """Status HTTP e headers da resposta de erro para uma exceção do /chat."""
+    if isinstance(e, UpstreamUnavailable):
+        status = 503 if e.reason == "circuit_open" else 429
+        return status, {"Retry-After": str(e.retry_after)}
+    import openai
+
+    if isinstance(e, openai.APITimeoutError):
+        return 504, {}
+    if isinstance(e, openai.APIConnectionError):
+        return 502, {}
+    if isinstance(e, openai.RateLimitError):
+        retry_after = retry_after_seconds(e.response.headers)
+        return 429, {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else {}
+    if isinstance(e, openai.APIStatusError) and e.status_code >= 500:
+        return 502, {}
+    return 500, {}
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    closed → (N falhas seguidas) → open → (RESET segundos) → half_open.
+    Em half_open uma única chamada de teste passa: sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Libera a chamada ou levanta UpstreamUnavailable("circuit_open")."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            raise UpstreamUnavailable("circuit_open", max(remaining, 1))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """Chamada terminou com erro que não é falha da OpenAI (ex.: 400)."""
+        with self._lock:
+            self._probing = False
+
+
+breaker = CircuitBreaker()
+retries = 0
+
+
+def _attempt_failed(e, attempt):
+    """Atualiza o breaker e retorna a espera até a próxima tentativa (None = desistir)."""
+    global retries
+    if _is_failure(e):
+        breaker.record_failure()
+    else:
+        breaker.record_neutral()
+    delay = _retry_delay(e, attempt)
+    if delay is not None:
+        retries += 1
+        print(f"[upstream] {type(e).__name__}; nova tentativa em {delay:.2f}s")
+    return delay
+
+
+def call_with_retry(fn):
+    """Executa `fn()` (chamada à OpenAI) com circuit breaker e retries."""
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _attempt_failed(e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+        else:
+            breaker.record_success()
+            return result
+
+
+async def acall_with_retry(fn):
+    """Versão assíncrona de call_with_retry (`fn` retorna uma corrotina)."""
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.record_neutral()
+            raise
+        except Exception as e:
+            delay = _attempt_failed(e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+        else:
+            breaker.record_success()
+            return result
+
+# ============================================================================
+# LIMITE DE CONCORRÊNCIA
+# ============================================================================
+
+class _Slot:
+    """Vaga ocupada no limitador; release() pode ser chamado mais de uma vez."""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class _Waiter:
+    """Requisição esperando vaga; `wake` é um threading.Event ou um Future."""
+
+    def __init__(self, flow, wake):
+        self.flow = flow
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class _FairQueue:
+    """
+    Fila justa ponderada (start-time fair queueing) das requisições sem vaga.
+
+    Cada requisição recebe a etiqueta start = max(V, fim da anterior do cliente)
+    e o cliente avança 1/peso; a vaga liberada vai para a menor etiqueta e V passa
+    a ser a etiqueta atendida. Quem teve muitas requisições atendidas fica atrás de
+    quem teve poucas, e um cliente que volta depois de um tempo parado não acumula
+    crédito. Sem trava própria: quem usa é responsável pela exclusão mútua.
+    """
+
+    # Acima disso, clientes já alcançados por V são esquecidos
+    PRUNE_AT = 4096
+
+    def __init__(self, per_client=UPSTREAM_QUEUE_PER_CLIENT):
+        self.per_client = per_client
+        self._heap = []      # (start, seq, waiter)
+        self._finish = {}    # cliente -> etiqueta de fim da última requisição
+        self._queued = {}    # cliente -> requisições esperando
+        self._seq = itertools.count()
+        self._virtual = 0.0
+        self.waiting = 0
+
+    def tag(self, flow, weight=1.0):
+        """Etiqueta de início da próxima requisição do cliente."""
+        start = max(self._virtual, self._finish.get(flow, 0.0))
+        self._finish[flow] = start + 1.0 / max(weight, 0.001)
+        if len(self._finish) > self.PRUNE_AT:
+            self._finish = {f: t for f, t in self._finish.items() if t > self._virtual}
+        return start
+
+    def dispatch(self, start):
+        """Registra uma requisição atendida (V avança até a etiqueta dela)."""
+        self._virtual = max(self._virtual, start)
+
+    def client_full(self, flow):
+        return self._queued.get(flow, 0) >= self.per_client
+
+    def push(self, start, waiter):
+        heapq.heappush(self._heap, (start, next(self._seq), waiter))
+        self._queued[waiter.flow] = self._queued.get(waiter.flow, 0) + 1
+        self.waiting += 1
+
+    def pop(self):
+        """Próxima requisição a ser atendida (None se a fila estiver vazia)."""
+        while self._heap:
+            start, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            self._dequeued(waiter)
+            self.dispatch(start)
+            return waiter
+        return None
+
+    def cancel(self, waiter):
+        """Retira da fila uma requisição que desistiu (removida do heap quando chegar a vez)."""
+        waiter.cancelled = True
+        self._dequeued(waiter)
+
+    def _dequeued(self, waiter):
+        self.waiting -= 1
+        remaining = self._queued[waiter.flow] - 1
+        if remaining:
+            self._queued[waiter.flow] = remaining
+        else:
+            del self._queued[waiter.flow]
+
+
+class UpstreamLimiter:
+    """Limite de chamadas simultâneas à OpenAI para o servidor Flask (threads)."""
+
+    def __init__(self, limit=UPSTREAM_CONCURRENCY, queue_size=UPSTREAM_QUEUE_SIZE,
+                 queue_timeout=UPSTREAM_QUEUE_TIMEOUT, per_client=UPSTREAM_QUEUE_PER_CLIENT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._queue = _FairQueue(per_client)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.shed = 0
+
+    @property
+    def waiting(self):
+        return self._queue.waiting
+
+    def acquire(self, flow=None, weight=1.0):
+        """
+        Ocupa uma vaga para o cliente `flow` (esperando na fila justa) ou
+        levanta UpstreamUnavailable("overloaded").
+        """
+        with self._lock:
+            if self.in_use < self.limit and not self._queue.waiting:
+                self._queue.dispatch(self._queue.tag(flow, weight))
+                self.in_use += 1
+                return _Slot(self)
+            if self._queue.waiting >= self.queue_size or self._queue.client_full(flow):
+                self.shed += 1
+                raise UpstreamUnavailable("overloaded", UPSTREAM_SHED_RETRY_AFTER)
+            waiter = _Waiter(flow, threading.Event())
+            self._queue.push(self._queue.tag(flow, weight), waiter)
+
+        waiter.wake.wait(self.queue_timeout)
+        with self._lock:
+            # A vaga pode ter sido entregue junto com o timeout
+            if waiter.granted:
+                return _Slot(self)
+            self._queue.cancel(waiter)
+            self.shed += 1
+        raise UpstreamUnavailable("overloaded", UPSTREAM_SHED_RETRY_AFTER)
+
+    def _release(self):
+        with self._lock:
+            waiter = self._queue.pop()
+            if waiter is None:
+                self.in_use -= 1
+                return
+            # A vaga passa direto para o próximo da fila (in_use não muda)
+            waiter.granted = True
+        waiter.wake.set()
+
+    @contextmanager
+    def slot(self, flow=None, weight=1.0):
+        slot = self.acquire(flow, weight)
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def collect(self):
+        return _limiter_metrics(self)
+
+
+class AsyncUpstreamLimiter:
+    """Limite de chamadas simultâneas à OpenAI para o servidor ASGI (um event loop)."""
+
+    def __init__(self, limit=UPSTREAM_CONCURRENCY, queue_size=UPSTREAM_QUEUE_SIZE,
+                 queue_timeout=UPSTREAM_QUEUE_TIMEOUT, per_client=UPSTREAM_QUEUE_PER_CLIENT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._queue = _FairQueue(per_client)
+        self.in_use = 0
+        self.shed = 0
+
+    @property
+    def waiting(self):
+        return self._queue.waiting
+
+    async def acquire(self, flow=None, weight=1.0):
+        if self.in_use < self.limit and not self._queue.waiting:
+            self._queue.dispatch(self._queue.tag(flow, weight))
+            self.in_use += 1
+            return _Slot(self)
+        if self._queue.waiting >= self.queue_size or self._queue.client_full(flow):
+            self.shed += 1
+            raise UpstreamUnavailable("overloaded", UPSTREAM_SHED_RETRY_AFTER)
+
+        waiter = _Waiter(flow, asyncio.get_running_loop().create_future())
+        self._queue.push(self._queue.tag(flow, weight), waiter)
+        try:
+            await asyncio.wait([waiter.wake], timeout=self.queue_timeout)
+        except BaseException:
+            # Cliente desconectado enquanto esperava: a vaga (se já veio) passa adiante
+            if waiter.granted:
+                self._release()
+            else:
+                self._queue.cancel(waiter)
+            raise
+        if not waiter.granted:
+            self._queue.cancel(waiter)
+            self.shed += 1
+            raise UpstreamUnavailable("overloaded", UPSTREAM_SHED_RETRY_AFTER)
+        return _Slot(self)
+
+    def _release(self):
+        waiter = self._queue.pop()
+        if waiter is None:
+            self.in_use -= 1
+            return
+        waiter.granted = True
+        waiter.wake.set_result(True)
+
+    @asynccontextmanager
+    async def slot(self, flow=None, weight=1.0):
+        slot = await self.acquire(flow, weight)
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def collect(self):
+        return _limiter_metrics(self)
+
+
+def _limiter_metrics(limiter):
+    return [
+        ("dealfi_upstream_slots_in_use", "gauge", "Chamadas à OpenAI em andamento", limiter.in_use),
+        ("dealfi_upstream_slots_limit", "gauge", "Máximo de chamadas simultâneas à OpenAI", limiter.limit),
+        ("dealfi_upstream_queue_waiting", "gauge", "Requisições esperando vaga", limiter.waiting),
+        ("dealfi_upstream_shed_total", "counter", "Requisições descartadas com 429", limiter.shed),
+    ]
+
+
+def _collect():
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    return [
+        ("dealfi_upstream_retries_total", "counter", "Novas tentativas de chamadas à OpenAI", retries),
+        ("dealfi_circuit_breaker_state", "gauge",
+         "Circuit breaker da OpenAI (0=closed, 1=half_open, 2=open)", states[breaker.state]),
+        ("dealfi_circuit_breaker_opens_total", "counter", "Vezes que o circuito abriu", breaker.opens),
+    ]
+
+
+register_collector(_collect)
@@ -0,0 +1,178 @@
+"""
+Deal-Fi AI Agent - Cache de respostas
+Responde perguntas frequentes de primeiro turno ("o que é escrow?", "o que é POL?",
+"qual a taxa?") sem chamar o GPT.
+
+Regras:
+- só o primeiro turno da conversa é cacheável (nenhum nome ou dado do usuário ainda);
+- mensagens com números ou endereços 0x são tratadas como específicas do usuário;
+- respostas com tool_calls ou com tools resolvidas no servidor nunca são guardadas.
+
+A chave é o texto normalizado da mensagem (minúsculas, sem acentos e pontuação).
+Opcionalmente (RESPONSE_CACHE_SIMILARITY > 0) uma pergunta parecida também acerta,
+por similaridade de cosseno entre trigramas de caracteres calculada localmente.
+"""
+
+import copy
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from core import MODEL
+from metrics import register_collector
+from prompt_cache import variant_for
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 512))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 86400))
+# Similaridade mínima (0-1) para acerto aproximado; 0 desativa (só acerto exato)
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0))
+
+_USER_SPECIFIC = re.compile(r"\d|0x", re.IGNORECASE)
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Minúsculas, sem acentos, sem pontuação e com espaços colapsados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a, a_norm, b, b_norm):
+    if not a_norm or not b_norm:
+        return 0.0
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    return dot / (a_norm * b_norm)
+
+
+def _norm(vector):
+    return math.sqrt(sum(v * v for v in vector.values()))
+
+
+def cache_key(messages):
+    """
+    Chave do cache para a conversa, ou None se ela não for cacheável
+    (não é o primeiro turno, tem tools ou dados específicos do usuário).
+    """
+    conversation = [m for m in messages if m.get("role") != "system"]
+    if len(conversation) != 1:
+        return None
+    message = conversation[0]
+    content = message.get("content")
+    if message.get("role") != "user" or not isinstance(content, str):
+        return None
+    if _USER_SPECIFIC.search(content):
+        return None
+    key = normalize(content)
+    return key or None
+
+
+class ResponseCache:
+    """Cache LRU com TTL de corpos de resposta do /chat (thread-safe)."""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 similarity=RESPONSE_CACHE_SIMILARITY):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self.namespace = MODEL
+        self._entries = OrderedDict()  # key -> (stored_at, body, trigrams, norm)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, messages):
+        """Corpo em cache para a conversa (cópia) ou None."""
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        key = cache_key(messages)
+        if key is None:
+            return None
+
+        namespace = self._namespace(messages)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None and self.similarity > 0:
+                entry = self._nearest(namespace, key, now)
+            if entry is None or now - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            body = copy.deepcopy(entry[1])
+
+        body["cache"] = "hit"
+        return body
+
+    def _namespace(self, messages):
+        # Modelo + variante do prompt: páginas diferentes oferecem tools diferentes
+        return f"{self.namespace}:{variant_for(messages).fingerprint}"
+
+    def _nearest(self, namespace, key, now):
+        grams = _trigrams(key)
+        norm = _norm(grams)
+        best, best_score = None, self.similarity
+        for (entry_namespace, _), entry in self._entries.items():
+            if entry_namespace != namespace or now - entry[0] > self.ttl:
+                continue
+            score = _cosine(grams, norm, entry[2], entry[3])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def put(self, messages, body):
+        """Guarda a resposta se ela for cacheável (sem tool_calls nem tools do servidor)."""
+        if not RESPONSE_CACHE_ENABLED or body.get("server_messages"):
+            return
+        message = body["choices"][0]["message"]
+        if message.get("tool_calls") or not message.get("content"):
+            return
+        key = cache_key(messages)
+        if key is None:
+            return
+
+        namespace = self._namespace(messages)
+        grams = _trigrams(key)
+        stored = {k: v for k, v in body.items() if k != "context"}
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic(), stored, grams, _norm(grams))
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+response_cache = ResponseCache()
+
+
+def _collect():
+    stats = response_cache.stats()
+    return [
+        ("dealfi_response_cache_hits_total", "counter", "Respostas servidas do cache", stats["hits"]),
+        ("dealfi_response_cache_misses_total", "counter", "Perguntas cacheáveis sem acerto", stats["misses"]),
+        ("dealfi_response_cache_entries", "gauge", "Entradas no cache de respostas", stats["entries"]),
+    ]
+
+
+register_collector(_collect)
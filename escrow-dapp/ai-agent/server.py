@@ -3,410 +3,140 @@ Deal-Fi AI Agent - Backend
 Servidor Flask que conecta o frontend ao GPT-4o via Function Calling
 """
 
+# Primeiro import: marca o início do startup (tempo de import no log e no /readyz)
+from startup import PREWARM_ENABLED, Lazy, health_body, mark_imported, prewarm, readiness
+
 import os
-from flask import Flask, request, jsonify
+import queue
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
-from dotenv import load_dotenv
 
-# Carregar variáveis de ambiente
-load_dotenv()
+from abi_registry import (
+    ABI_ADDRESS_CACHE_CONTROL, ABI_CACHE_CONTROL, ABI_INDEX_CACHE_CONTROL, AbiRegistry
+)
+from chain_events import CHAIN_EVENTS_HEARTBEAT, CHAIN_EVENTS_QUEUE_SIZE, ChainEventHub, resume_block
+from chain_state import ChainStateError, ChainStateService, chain_error_body, not_modified
+from contract_index import INDEXER_ENABLED, ContractIndexer, contract_index, contracts_page, history_page
+from coalescing import SingleFlight, request_key
+from core import MODEL, SSE_HEADERS, error_body, index_body, prepare_messages, require_api_key
+from intent_router import route_intent
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    current_trace,
+    finish_request,
+    record_error,
+    record_upstream,
+    register_collector,
+    render as render_metrics,
+    start_request
+)
+from model_router import choose_model, escalate, malformed_tool_call, record_route
+from payloads import PayloadError, encode_json, payload_error_body, read_payload, wants_lean
+from prompt_cache import prompt_cache_stats, upstream_extra_body, variant_for
+from rate_limit import RateLimiter, client_identity, current_client
+from resilience import (
+    UpstreamLimiter, UpstreamUnavailable, breaker, call_with_retry, client_options, error_status, http_client
+)
+from response_cache import response_cache
+from server_tools import (
+    MAX_SERVER_TOOL_ROUNDS,
+    chat_with_server_tools,
+    completion_body,
+    resolve_server_round
+)
+from sessions import SessionNotFound, create_store, session_not_found_body, turn_messages
+from streaming import ChatStreamAccumulator, replay_events, sse_event
+from tool_validation import repair_tool_calls
 
 app = Flask(__name__)
 CORS(app)  # Permitir requisições do frontend
 
-# Configuração OpenAI
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError(
-        "OPENAI_API_KEY não encontrada. "
-        "Crie um arquivo .env com OPENAI_API_KEY=sua_chave_aqui"
-    )
 
-client = OpenAI(api_key=api_key)
-MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 
-# ============================================================================
-# DEFINIÇÃO DAS TOOLS (Function Calling)
-# ============================================================================
+def _openai_client():
+    from openai import OpenAI
+
+    return OpenAI(api_key=require_api_key(), http_client=http_client(), **client_options())
+
+
+# Configuração OpenAI (criada no prewarm ou na primeira chamada; sem chave, só /chat falha)
+client = Lazy(_openai_client)
+
+# Chamadas simultâneas à OpenAI (fila justa por cliente; excedentes recebem 429)
+limiter = UpstreamLimiter()
+register_collector(limiter.collect)
+
+# Limite de requisições e de tokens por cliente (checado antes de ler o corpo)
+rate_limiter = RateLimiter()
+register_collector(rate_limiter.collect)
+RATE_LIMITED_ENDPOINTS = {"chat", "chat_stream", "session_chat", "create_session"}
+
+# Histórico das conversas mantido no servidor
+sessions = create_store()
 
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "navigate_to_page",
-            "description": "Navega para uma página específica do Deal-Fi. Use quando o usuário pedir para ir a algum lugar.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "page": {
-                        "type": "string",
-                        "enum": ["home", "create", "manage"],
-                        "description": "Página de destino: home (início), create (criar contrato), manage (gerenciar contratos)"
-                    }
-                },
-                "required": ["page"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "go_home",
-            "description": "Volta para a página inicial do Deal-Fi. Use quando o usuário pedir para voltar ao início.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_current_page",
-            "description": "Obtém informação sobre a página atual em que o usuário está.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_form_fields",
-            "description": "Obtém os valores atuais dos campos do formulário de criação de contrato. Use quando o usuário perguntar sobre o que está preenchido ou quiser ver o estado atual do formulário.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "fill_form_field",
-            "description": "Preenche um campo específico do formulário de criação de contrato. Use quando o usuário fornecer informações para preencher.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "field": {
-                        "type": "string",
-                        "enum": ["payeeAddress", "amount", "duration"],
-                        "description": "Campo a ser preenchido: payeeAddress (endereço do recebedor), amount (valor em USDC), duration (prazo em dias)"
-                    },
-                    "value": {
-                        "type": "string",
-                        "description": "Valor a ser inserido no campo. Para amount, use número (ex: '100'). Para duration, use número de dias (ex: '30'). Para payeeAddress, use endereço Ethereum (ex: '0x...')"
-                    }
-                },
-                "required": ["field", "value"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_milestones",
-            "description": "Obtém informações sobre os marcos de pagamento configurados no formulário.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "add_milestone",
-            "description": "Adiciona um novo marco de pagamento ao formulário. O sistema redistribuirá os percentuais automaticamente.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "update_milestone",
-            "description": "Atualiza o percentual de um marco específico. Os marcos devem somar 100% no total.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "index": {
-                        "type": "integer",
-                        "description": "Índice do marco (começando em 0). Use get_milestones para ver os índices disponíveis."
-                    },
-                    "percentage": {
-                        "type": "integer",
-                        "description": "Novo percentual do marco (1-100). A soma de todos os marcos deve ser 100%."
-                    }
-                },
-                "required": ["index", "percentage"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "remove_milestone",
-            "description": "Remove um marco de pagamento. Não é possível remover se houver apenas um marco.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "index": {
-                        "type": "integer",
-                        "description": "Índice do marco a ser removido (começando em 0). Use get_milestones para ver os índices disponíveis."
-                    }
-                },
-                "required": ["index"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "connect_wallet",
-            "description": "Conecta a carteira MetaMask do usuário. Use quando o usuário pedir para conectar a carteira, conectar MetaMask, ou conectar wallet.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_wallet_status",
-            "description": "Obtém o status atual da conexão da carteira (conectada ou não, endereço se conectado). Use quando o usuário perguntar sobre o status da carteira.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    }
-]
+# Chamadas idênticas em andamento (single-flight)
+inflight = SingleFlight()
+register_collector(lambda: [(
+    "dealfi_coalesced_requests_total", "counter",
+    "Requisições atendidas por uma chamada idêntica em andamento", inflight.coalesced
+)])
+
+# Estado dos contratos de escrow (uma leitura JSON-RPC em lote por bloco)
+chain_state = ChainStateService()
+chain_events = ChainEventHub(chain_state)
+# Índice e indexador abertos no primeiro uso; a thread do indexador sobe no startup
+contract_indexer = Lazy(lambda: ContractIndexer(contract_index.get(), chain_state))
+# ABIs do repositório (endereçadas por conteúdo) e ABI por endereço; o abi_registry.db
+# é aberto na primeira consulta
+abi_registry = Lazy(lambda: AbiRegistry(chain_state.rpc))
 
 # ============================================================================
-# SYSTEM PROMPT
+# MÉTRICAS
 # ============================================================================
 
-SYSTEM_PROMPT = """Você é o assistente do Deal-Fi, uma plataforma de contratos escrow não-custodial na blockchain Polygon.
-
-═══════════════════════════════════════════════════════════════════════════════
-📚 CONTEXTO COMPLETO DO DEAL-FI
-═══════════════════════════════════════════════════════════════════════════════
-
-O QUE É O DEAL-FI?
-O Deal-Fi é uma aplicação descentralizada (dApp) que permite criar contratos escrow 
-inteligentes na blockchain Polygon. Ele traz transparência e confiança para pagamentos 
-por marcos em transações comerciais, eliminando a necessidade de intermediários.
-
-O QUE É UM CONTRATO ESCROW?
-Um contrato escrow funciona como um "cofre inteligente" onde o dinheiro fica bloqueado 
-até que condições específicas sejam atendidas. No Deal-Fi:
-- O PAGADOR (payer) deposita USDC no contrato inteligente
-- O RECEBEDOR (payee) pode ver que o dinheiro está disponível e bloqueado
-- O dinheiro só é liberado quando ambas as partes concordam que um marco foi atingido
-- Isso cria confiança através de código, não de promessas
-
-COMO FUNCIONA O FLUXO COMPLETO:
-1. CRIAÇÃO: Payer ou Payee cria o contrato com parâmetros (endereços, valor, prazo, marcos)
-2. TAXA DE PLATAFORMA: 1 USDC deve ser pago antes do depósito (obrigatório)
-3. CONFIRMAÇÕES MÚTUAS: Ambas as partes devem confirmar identidade
-4. DEPÓSITO: Payer deposita o valor total em USDC no contrato
-5. EXECUÇÃO: Marcos são liberados conforme acordado entre as partes
-6. ENCERRAMENTO: Contrato finaliza quando todos os marcos são executados
-
-CONCEITOS IMPORTANTES:
-- MARCOS: Divisão do pagamento em etapas (ex: 30% na entrega inicial, 70% na finalização)
-- TAXA DE PLATAFORMA: 1 USDC obrigatório pago para 0xC101e76Da55BC93438a955546E93D56312a3CF16
-- POLYGON: Rede Layer 2 da Ethereum com custos muito menores (centavos vs dólares)
-- USDC: Token estável usado para os pagamentos (endereço: 0x3c499c542cEF5E3811e1192ce70d8cC03d5c3359)
-- POL: Token nativo para pagar as taxas (gas) na Polygon. Algumas carteiras/exchanges ainda exibem como “MATIC”; trate como POL na conversa.
-
-PRÉ-REQUISITO (ANTES DE FALAR DE CONTRATO):
-- Sempre confirme (ou oriente) que o usuário tem a MetaMask conectada
-- E que tem USDC (valor do contrato + taxa) e POL para taxas (gas)
-- Referência prática: ~1 POL costuma ser suficiente para usar várias vezes
-
-═══════════════════════════════════════════════════════════════════════════════
-📄 PÁGINAS E SEUS PROPÓSITOS
-═══════════════════════════════════════════════════════════════════════════════
-
-HOME (Página Inicial):
-- Propósito: Boas-vindas, visão geral da plataforma e acesso rápido às principais ações
-- Quando usar: Usuário quer entender o Deal-Fi, ver opções disponíveis ou voltar ao início
-- Não empurre: Deixe o usuário explorar e decidir quando avançar
-
-CREATE (Criação de Contrato):
-- Propósito: Formulário completo para criar um novo contrato escrow
-- Campos disponíveis:
-  * payeeAddress: Endereço da carteira do recebedor (formato: 0x... com 42 caracteres)
-  * amount: Valor total do contrato em USDC (ex: 100, 500.50)
-  * duration: Prazo do contrato em dias (1 a 365 dias)
-  * milestones: Marcos de pagamento com percentuais (devem somar exatamente 100%)
-- Quando usar: Usuário quer criar um novo contrato
-- Não empurre: Ajude a preencher os campos conforme solicitado, mas não sugira submeter até que o usuário peça
-
-═══════════════════════════════════════════════════════════════════════════════
-📋 INFORMAÇÕES NECESSÁRIAS PARA CRIAR UM CONTRATO
-═══════════════════════════════════════════════════════════════════════════════
-
-Quando o usuário perguntar sobre informações necessárias:
-- Responda de forma gradual, uma informação por vez
-- Não liste tudo de uma vez
-- Pergunte se entendeu antes de continuar
-- Explique conceitos técnicos apenas se necessário
-
-PERSONALIZAÇÃO:
-- No início da conversa, pergunte o nome do usuário
-- Use o nome do usuário nas respostas para tornar a experiência mais pessoal
-
-CAMPOS OBRIGATÓRIOS DO FORMULÁRIO:
-1. Endereço do Recebedor (payeeAddress):
-   - Endereço da carteira Ethereum do recebedor
-   - Formato: deve começar com 0x e ter 42 caracteres
-   - Exemplo: 0x1234567890123456789012345678901234567890
-   - Este é o endereço que receberá os pagamentos dos marcos
-
-2. Valor Total (amount):
-   - Valor do contrato em USDC (token estável)
-   - Deve ser um número maior que 0
-   - Exemplos: 100, 500.50, 1000
-   - Este é o valor total que será bloqueado no contrato
-
-3. Prazo (duration):
-   - Prazo máximo para execução do contrato em DIAS
-   - Deve estar entre 1 e 365 dias
-   - Exemplos: 30 dias, 60 dias, 90 dias
-   - Após este prazo, o payer pode sacar o saldo restante
-
-4. Marcos de Pagamento (milestones):
-   - Divisão do pagamento em etapas
-   - Cada marco tem um percentual (ex: 30%, 50%, 20%)
-   - A SOMA de todos os marcos DEVE ser exatamente 100%
-   - Mínimo: 1 marco, Máximo: 10 marcos
-   - Exemplo: Marco 1 = 30%, Marco 2 = 70% (total = 100%)
-
-REQUISITOS TÉCNICOS:
-- Carteira MetaMask conectada (o endereço do pagador é obtido automaticamente)
-- Rede Polygon configurada no MetaMask (Chain ID: 137)
-- Saldo de POL suficiente para pagar as taxas de gas (às vezes aparece como “MATIC” em algumas telas)
-- Saldo de USDC suficiente para:
-  * Taxa de plataforma: 1 USDC (obrigatória, paga após o deploy)
-  * Valor do contrato: o valor total que será depositado
-
-VALIDAÇÕES IMPORTANTES:
-- Os marcos devem somar exatamente 100% (não pode ser 99% ou 101%)
-- O valor do contrato deve ser maior que 0
-- O prazo deve estar entre 1 e 365 dias
-- O endereço do recebedor deve ser válido (formato Ethereum)
-
-APÓS O DEPLOY:
-- Taxa de plataforma de 1 USDC deve ser paga (obrigatória)
-- Ambas as partes (payer e payee) devem confirmar identidade
-- Payer deve fazer o depósito do valor total em USDC
-
-QUANDO USUÁRIO PERGUNTAR SOBRE CRIAR CONTRATO:
-- Responda de forma curta e gradual
-- Não liste todos os requisitos de uma vez
-- Comece oferecendo ajuda para navegar até a página
-- Explique conceitos técnicos (MetaMask, USDC, etc.) apenas se o usuário não souber
-- Sempre pergunte se entendeu antes de continuar
-
-PRIMEIRO PASSO (SEMPRE):
-- Antes de entrar em detalhes de contrato, verifique: MetaMask conectada + USDC + POL (gas)
-
-═══════════════════════════════════════════════════════════════════════════════
-🔗 CONEXÃO DE CARTEIRA
-═══════════════════════════════════════════════════════════════════════════════
-
-Quando o usuário pedir para conectar a carteira (ex: "quero conectar minha carteira",
-"conecte o MetaMask", "conectar wallet"), você deve:
-1. Usar a função connect_wallet para acionar a conexão
-2. Confirmar que iniciou o processo
-3. Explicar que o MetaMask abrirá uma janela para aprovação
-4. NÃO assumir que a conexão foi bem-sucedida até confirmar
-
-A conexão abre uma janela do MetaMask que requer aprovação do usuário.
-Após a conexão, o endereço da carteira será usado automaticamente como "payer" no contrato.
-
-MANAGE (Gerenciamento):
-- Propósito: Visualizar, gerenciar e interagir com contratos existentes
-- Quando usar: Usuário quer ver seus contratos, executar ações ou verificar status
-- Não empurre: Deixe o usuário explorar seus contratos no seu próprio ritmo
-
-═══════════════════════════════════════════════════════════════════════════════
-🤖 SUAS CAPACIDADES
-═══════════════════════════════════════════════════════════════════════════════
-
-NAVEGAÇÃO:
-- Navegar entre páginas (home, create, manage)
-- Voltar para página inicial
-- Informar em qual página o usuário está
-
-FORMULÁRIO DE CRIAÇÃO:
-- Obter informações dos campos atuais
-- Preencher campos (payeeAddress, amount, duration)
-- Visualizar marcos configurados
-- Adicionar novos marcos
-- Remover marcos
-- Atualizar percentuais dos marcos
-
-CARTEIRA:
-- Conectar carteira MetaMask
-- Verificar status da conexão (conectada/desconectada, endereço)
-
-═══════════════════════════════════════════════════════════════════════════════
-🎯 PRINCÍPIOS DE ATENDIMENTO
-═══════════════════════════════════════════════════════════════════════════════
-
-PACIÊNCIA E RESPEITO AO RITMO DO USUÁRIO:
-- NUNCA empurre o usuário para a próxima etapa sem que ele peça
-- NUNCA sugira ações que o usuário não mencionou
-- SEMPRE espere o usuário solicitar uma ação antes de executá-la
-- Se o usuário está preenchendo o formulário, ajude apenas com o que ele pedir
-- Não assuma que ele quer submeter o formulário só porque preencheu campos
-
-EXEMPLOS DO QUE NÃO FAZER:
-❌ "Você preencheu todos os campos. Quer que eu submeta o contrato?"
-❌ "Agora você precisa pagar a taxa de plataforma. Quer que eu te leve para isso?"
-❌ "Você está na página de criação. Vou preencher os campos para você?"
-
-EXEMPLOS DO QUE FAZER:
-✅ "Pronto! Preenchi o endereço do recebedor."
-✅ "O formulário está assim: [mostra estado atual]. O que você gostaria de fazer?"
-✅ "Você está na página de criação de contratos. Como posso ajudar?"
-
-RESPOSTAS CONTEXTUALIZADAS:
-- Quando o usuário perguntar sobre o Deal-Fi, explique o conceito de escrow
-- Quando estiver na página de criação, explique o propósito de cada campo se perguntado
-- Quando estiver gerenciando contratos, explique os estados e ações disponíveis
-- Sempre forneça contexto relevante para a página atual
-
-ESTILO DE COMUNICAÇÃO - REGRAS MINIMALISTAS:
-1. BREVIDADE: Máximo 30 palavras por resposta
-2. GRADUALIDADE: Uma informação por vez, sempre perguntar se entendeu antes de continuar
-3. SIMPLICIDADE: Use linguagem simples, evite jargões técnicos
-4. DIDÁTICO: Não assuma conhecimento técnico - explique conceitos básicos quando necessário
-5. CONVERSACIONAL: Seja natural, como uma conversa pessoal
-6. PACIENTE: Aguarde confirmação antes de avançar para próximo tópico
-7. PERSONALIZAÇÃO: Pergunte o nome do usuário no início da conversa e use-o nas respostas
-7. PERSONALIZAÇÃO: Pergunte o nome do usuário no início da conversa e use-o nas respostas
-
-═══════════════════════════════════════════════════════════════════════════════
-📋 INSTRUÇÕES TÉCNICAS
-═══════════════════════════════════════════════════════════════════════════════
-
-- Use as funções disponíveis para executar ações
-- Sempre confirme a ação realizada de forma breve
-- Quando o usuário fornecer informações, pergunte se quer preencher o formulário ANTES de preencher
-- Se não entender, peça esclarecimento de forma educada
-- Para preencher múltiplos campos, faça uma chamada por campo
-- Valide informações quando possível (endereços Ethereum, valores numéricos)
-- Se o usuário estiver em uma página diferente da necessária, informe e pergunte se quer navegar"""
+# Sondas do Railway/Prometheus não geram trace nem linha de log
+UNTRACED_ENDPOINTS = {"metrics", "healthz", "readyz"}
+
+
+@app.before_request
+def _start_trace():
+    if request.endpoint not in UNTRACED_ENDPOINTS:
+        g.trace = start_request(request.content_length or 0)
+
+
+@app.after_request
+def _finish_trace(response):
+    trace = g.pop("trace", None)
+    if trace is not None:
+        # call_on_close roda depois do último byte (inclusive em respostas streaming)
+        endpoint, status = request.endpoint or "not_found", response.status_code
+        response.call_on_close(lambda: finish_request(trace, endpoint, status))
+    return response
+
+
+@app.before_request
+def _rate_limit():
+    """429 antes de o corpo ser lido quando o cliente estourou o seu limite."""
+    # O preflight CORS (OPTIONS automático da rota) não conta: no ASGI o CORSMiddleware o responde antes
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS or request.method == "OPTIONS":
+        return None
+    client = client_identity(request.headers, request.remote_addr, (request.view_args or {}).get("session_id"))
+    try:
+        rate_limiter.admit(client)
+    except UpstreamUnavailable as e:
+        # Sem log por recusa (contada em dealfi_rate_limited_total): um cliente insistente não enche o log
+        status, headers = error_status(e)
+        return _json_response(error_body(e), status, headers)
+    return None
+
+
+@app.route("/metrics")
+def metrics():
+    """Métricas no formato texto do Prometheus."""
+    return Response(render_metrics(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
 
 # ============================================================================
 # ENDPOINTS
@@ -415,11 +145,102 @@ ESTILO DE COMUNICAÇÃO - REGRAS MINIMALISTAS:
 @app.route("/")
 def index():
     """Health check"""
-    return jsonify({
-        "status": "ok",
-        "service": "Deal-Fi AI Agent",
-        "model": MODEL
-    })
+    return jsonify(index_body())
+
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: o processo responde (sem checagens)."""
+    return jsonify(health_body())
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: chave configurada, OpenAI alcançável e prompts aquecidos (503 enquanto não)."""
+    _start_prewarm()
+    ready, body = readiness.snapshot(breaker.state)
+    return jsonify(body), 200 if ready else 503
+
+
+@app.route("/prompt-cache")
+def prompt_cache():
+    """Uso do cache de prompt da OpenAI (cached_tokens) e estabilidade do prefixo."""
+    return jsonify({**prompt_cache_stats.snapshot(), "response_cache": response_cache.stats()})
+
+
+def _create_completion(messages, model=MODEL, **kwargs):
+    """
+    Chamada à OpenAI com as tools do Deal-Fi (com retries e circuit breaker).
+    Sem streaming, ocupa uma vaga do limitador; no streaming a vaga é do chamador.
+    """
+
+    def create():
+        return client.get().chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=variant_for(messages).tools,
+            tool_choice="auto",
+            extra_body=upstream_extra_body(messages),
+            **kwargs
+        )
+
+    started = time.perf_counter()
+    if kwargs.get("stream"):
+        return call_with_retry(create)
+    requester = current_client()
+    with limiter.slot(requester.flow, requester.weight):
+        completion = call_with_retry(create)
+    rate_limiter.charge(requester, completion.usage)
+    prompt_cache_stats.record(completion.usage)
+    record_upstream(started, completion.usage, completion.choices[0].message)
+    return completion
+
+
+def _routed_completion(messages):
+    """
+    Completion sem streaming no tier escolhido pelo roteador de modelos;
+    tool_call malformada do modelo pequeno é refeita no modelo grande.
+    """
+    tier, model, reason = choose_model(messages)
+    while True:
+        started = time.perf_counter()
+        completion = _create_completion(messages, model=model)
+        record_route(tier, reason, time.perf_counter() - started)
+        malformed = malformed_tool_call(completion.choices[0].message) if tier == "small" else None
+        if malformed is None:
+            return completion
+        tier, model, reason = escalate(malformed)
+
+
+def _read_payload():
+    """Payload JSON da requisição (corpo gzip/br/deflate é descomprimido)."""
+    g.payload = read_payload(request.get_data(), request.headers.get("Content-Encoding"))
+    return g.payload
+
+
+def _json_response(body, status=200, headers=None):
+    """
+    JSON serializado com orjson, comprimido conforme Accept-Encoding e no modo
+    enxuto se o cliente mandou `Prefer: return=minimal` ou `"lean": true` no payload.
+    """
+    data, base_headers = encode_json(
+        body, request.headers.get("Accept-Encoding"),
+        wants_lean(request.headers.get("Prefer"), g.get("payload"))
+    )
+    return Response(data, status=status, headers={**base_headers, **(headers or {})})
+
+
+def _error_response(e):
+    """Resposta de erro do /chat com o status adequado (400/404/413/415/429/502/503/504/500)."""
+    if isinstance(e, SessionNotFound):
+        # A sessão foi apagada ou expirou durante o turno (o histórico não é recriado)
+        return _json_response(session_not_found_body(e.session_id), 404)
+    record_error(e)
+    if isinstance(e, PayloadError):
+        return _json_response(payload_error_body(e), e.status)
+    print(f"Erro na API OpenAI: {str(e)}")
+    status, headers = error_status(e)
+    return _json_response(error_body(e), status, headers)
 
 
 @app.post("/chat")
@@ -427,36 +248,417 @@ def chat():
     """
     Endpoint principal de chat.
     Recebe mensagens e retorna resposta do GPT com possíveis tool_calls.
+    Com "stream": true no payload, responde como SSE (igual a /chat/stream).
+    Se o payload trouxer "client_state", as tools de leitura são resolvidas aqui.
     """
     try:
-        payload = request.get_json(force=True)
-        messages = payload.get("messages", [])
-        
-        # Adicionar system prompt se não existir
-        if not messages or messages[0].get("role") != "system":
-            messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
-        
-        # Chamar OpenAI
-        completion = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto"
-        )
-        
-        return jsonify(completion.model_dump())
+        payload = _read_payload()
+        messages, context = prepare_messages(payload)
+        client_state = payload.get("client_state")
+
+        routed = route_intent(messages, client_state)
+        if routed is not None:
+            return _routed_response(routed, payload.get("stream"))
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            return _cached_response(cached, payload.get("stream"))
+
+        if payload.get("stream"):
+            return _stream_response(messages, context, client_state)
+
+        # Chamar OpenAI (resolvendo tools de leitura no servidor); requisições
+        # idênticas simultâneas compartilham a mesma chamada
+        def complete():
+            body = chat_with_server_tools(_routed_completion, messages, client_state, context)
+            response_cache.put(messages, body)
+            return body
+
+        body = inflight.do(request_key("chat", request.get_data()), complete)
+
+        return _json_response(body)
     
     except Exception as e:
-        print(f"Erro na API OpenAI: {str(e)}")
-        
-        error_response = {
-            "error": {
-                "message": f"Erro na API: {str(e)}",
-                "type": "api_error",
-                "model_used": MODEL
-            }
-        }
-        return jsonify(error_response), 500
+        return _error_response(e)
+
+
+@app.post("/chat/stream")
+def chat_stream():
+    """
+    Versão streaming do /chat (Server-Sent Events).
+
+    Eventos emitidos:
+    - delta:           {"content": "..."} e/ou {"tool_calls": [...]} assim que chegam
+    - server_messages: {"messages": [...]} tools resolvidas no servidor nesta rodada
+    - message:         completion final no mesmo formato de /chat
+    - error:           mesmo corpo de erro de /chat
+    - done:            fim do stream
+    """
+    try:
+        payload = _read_payload()
+        messages, context = prepare_messages(payload)
+
+        routed = route_intent(messages, payload.get("client_state"))
+        if routed is not None:
+            return _routed_response(routed, stream=True)
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            return _cached_response(cached, stream=True)
+
+        return _stream_response(messages, context, payload.get("client_state"))
+    except Exception as e:
+        return _error_response(e)
+
+
+def _stream_response(messages, context, client_state=None, on_complete=None):
+    """
+    Abre o stream na OpenAI e repassa os chunks como SSE.
+    `on_complete(body)` é chamado com o corpo final (usado pelas sessões).
+    A vaga no limitador é ocupada antes da resposta (para poder responder 429)
+    e liberada quando o stream termina.
+    """
+
+    requester = current_client()
+    slot = limiter.acquire(requester.flow, requester.weight)
+    trace = current_trace()
+
+    def generate():
+        server_messages = []
+        try:
+            for round_index in range(MAX_SERVER_TOOL_ROUNDS + 1):
+                tier, model, reason = choose_model(messages)
+                while True:
+                    acc = ChatStreamAccumulator(model)
+                    started = time.perf_counter()
+                    stream = _create_completion(
+                        messages,
+                        model=model,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    for chunk in stream:
+                        delta = acc.add_chunk(chunk)
+                        if delta and tier == "small":
+                            # tool_calls do modelo pequeno só no evento `message` (podem ser refeitas)
+                            delta.pop("tool_calls", None)
+                        if delta:
+                            if trace is not None:
+                                trace.first_token()
+                            yield sse_event("delta", delta)
+
+                    rate_limiter.charge(requester, acc.usage)
+                    prompt_cache_stats.record(acc.usage)
+                    record_upstream(started, acc.usage, acc.message(), trace)
+                    record_route(tier, reason, time.perf_counter() - started, trace)
+
+                    malformed = malformed_tool_call(acc.message()) if tier == "small" else None
+                    if malformed is None:
+                        break
+                    # O cliente descarta os deltas desta rodada e recebe a resposta do modelo grande
+                    tier, model, reason = escalate(malformed)
+                    yield sse_event("escalated", {"model": model, "reason": malformed})
+
+                message = acc.message()
+                errors = repair_tool_calls(message, client_state)
+                if round_index == MAX_SERVER_TOOL_ROUNDS:
+                    break
+                new_messages = resolve_server_round(message, messages, client_state, errors)
+                if new_messages is None:
+                    break
+                server_messages.extend(new_messages)
+                yield sse_event("server_messages", {"messages": new_messages})
+
+            body = completion_body(acc.completion(), server_messages, context)
+            response_cache.put(messages, body)
+            if on_complete:
+                on_complete(body)
+            yield sse_event("message", body)
+        except SessionNotFound as e:
+            yield sse_event("error", session_not_found_body(e.session_id))
+        except Exception as e:
+            print(f"Erro na API OpenAI (stream): {str(e)}")
+            record_error(e, trace)
+            yield sse_event("error", error_body(e))
+        finally:
+            slot.release()
+
+        yield sse_event("done", {})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS
+    )
+    # Cliente que desconecta antes do primeiro byte: o gerador nem chega a rodar
+    response.call_on_close(slot.release)
+    return response
+
+
+def _cached_response(body, stream=False):
+    """Resposta vinda do cache de respostas, em JSON ou como SSE."""
+    return _local_response(body, stream, {"X-Cache": "HIT"})
+
+
+def _routed_response(body, stream=False):
+    """Resposta montada pelo roteador local de intents, em JSON ou como SSE."""
+    return _local_response(body, stream, {"X-Intent-Router": body["router"]["intent"]})
+
+
+def _local_response(body, stream, headers):
+    """Resposta pronta (sem chamar a OpenAI), em JSON ou reproduzida como SSE."""
+    if stream:
+        return Response(replay_events(body), mimetype="text/event-stream", headers={**SSE_HEADERS, **headers})
+    return _json_response(body, headers=headers)
+
+
+# ============================================================================
+# SESSÕES
+# ============================================================================
+
+@app.post("/sessions")
+def create_session():
+    """Cria uma conversa no servidor e retorna seu id."""
+    return jsonify({"session_id": sessions.create()}), 201
+
+
+@app.delete("/sessions/<session_id>")
+def delete_session(session_id):
+    """Encerra a conversa e descarta o histórico."""
+    if not sessions.delete(session_id):
+        return jsonify(session_not_found_body(session_id)), 404
+    return "", 204
+
+
+@app.post("/sessions/<session_id>/chat")
+def session_chat(session_id):
+    """
+    Chat com histórico no servidor: o payload traz só as mensagens novas
+    (mensagem do usuário ou resultados de tools), além de client_state/stream.
+    A resposta tem o mesmo formato de /chat.
+    """
+    history = sessions.get(session_id)
+    if history is None:
+        return jsonify(session_not_found_body(session_id)), 404
+
+    try:
+        payload = _read_payload()
+        new_messages = payload.get("messages", [])
+        client_state = payload.get("client_state")
+        messages, context = prepare_messages({"messages": history + new_messages, "client_state": client_state})
+
+        def save(body):
+            sessions.append(session_id, turn_messages(new_messages, body))
+
+        routed = route_intent(messages, client_state)
+        if routed is not None:
+            save(routed)
+            routed["session_id"] = session_id
+            return _routed_response(routed, payload.get("stream"))
+
+        cached = response_cache.get(messages)
+        if cached is not None:
+            cached["context"] = context
+            save(cached)
+            cached["session_id"] = session_id
+            return _cached_response(cached, payload.get("stream"))
+
+        if payload.get("stream"):
+            return _stream_response(messages, context, client_state, on_complete=save)
+
+        def complete():
+            body = chat_with_server_tools(_routed_completion, messages, client_state, context)
+            response_cache.put(messages, body)
+            save(body)
+            return body
+
+        body = inflight.do(request_key(f"session:{session_id}", request.get_data()), complete)
+        body["session_id"] = session_id
+
+        return _json_response(body)
+
+    except Exception as e:
+        return _error_response(e)
+
+
+# ============================================================================
+# ESTADO DOS CONTRATOS
+# ============================================================================
+
+@app.get("/contracts/<address>/state")
+def contract_state(address):
+    """
+    Estado do contrato de escrow no mesmo formato de getContractDetails
+    (deadline em segundos), lido uma vez por bloco e compartilhado entre os clientes.
+    Com If-None-Match igual ao ETag atual responde 304.
+    """
+    try:
+        state = chain_state.get(address)
+    except ChainStateError as e:
+        return _chain_error_response(address, e)
+
+    headers = {"ETag": state.etag, "Cache-Control": "no-cache", "X-Block-Number": str(state.block)}
+    if not_modified(request.headers.get("If-None-Match"), state.etag):
+        return Response(status=304, headers=headers)
+    return _json_response(state.response_body(), headers=headers)
+
+
+@app.get("/contracts/<address>/events")
+def contract_events(address):
+    """
+    Eventos do contrato via SSE: `snapshot` ao conectar e `update` com os eventos
+    e os campos alterados a cada bloco com logs do contrato.
+    Last-Event-ID (ou ?from_block=) reenvia os eventos perdidos na reconexão.
+    """
+    items = queue.Queue(CHAIN_EVENTS_QUEUE_SIZE)
+
+    def deliver(item):
+        try:
+            items.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    try:
+        subscription = chain_events.subscribe(address, deliver)
+    except ChainStateError as e:
+        return _chain_error_response(address, e)
+    try:
+        initial, sent_block = chain_events.initial_events(
+            subscription, resume_block(request.headers.get("Last-Event-ID"), request.args.get("from_block"))
+        )
+    except ChainStateError as e:
+        chain_events.unsubscribe(subscription)
+        return _chain_error_response(address, e)
+
+    def generate():
+        block = sent_block
+        try:
+            yield from initial
+            while True:
+                try:
+                    item = items.get(timeout=CHAIN_EVENTS_HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if subscription.lagging:
+                    while not items.empty():
+                        items.get_nowait()
+                    event, block = chain_events.resync(subscription)
+                    yield event
+                elif item is not None and item[0] > block:
+                    block, event = item
+                    yield event
+        except ChainStateError as e:
+            # Fecha o stream; o EventSource reconecta com Last-Event-ID
+            print(f"Erro no stream de eventos de {address}: {str(e)}")
+        finally:
+            chain_events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+# ============================================================================
+# ÍNDICE DE CONTRATOS
+# ============================================================================
+
+@app.get("/contracts")
+def list_contracts():
+    """
+    Contratos do índice, ordenados por prazo e paginados por cursor:
+    ?participant=0x...&role=payer|payee&status=active,completed&deadline_before=&limit=&cursor=
+    """
+    try:
+        return _json_response(contracts_page(request.args))
+    except ChainStateError as e:
+        return _chain_error_response("(índice)", e)
+
+
+@app.get("/contracts/<address>/history")
+def contract_history(address):
+    """Eventos do contrato gravados pelo indexador (?limit=&cursor=)."""
+    try:
+        return _json_response(history_page(address, request.args))
+    except ChainStateError as e:
+        return _chain_error_response(address, e)
+
+
+@app.post("/contracts/index")
+def index_contract():
+    """Registra um contrato no índice: {"address": "0x...", "from_block": <bloco do deploy>}."""
+    try:
+        payload = _read_payload()
+        return _json_response(contract_indexer.get().register_body(payload), 202)
+    except PayloadError as e:
+        return _error_response(e)
+    except ChainStateError as e:
+        return _chain_error_response(payload.get("address"), e)
+
+
+# ============================================================================
+# REGISTRO DE ABIs
+# ============================================================================
+
+@app.get("/abi")
+def abi_index():
+    """ABIs e bytecodes conhecidos (id, nome, fontes), sem o conteúdo das ABIs."""
+    body = abi_registry.get().index()
+    return _json_response(body, headers={"ETag": f'"{body["build"]}"', "Cache-Control": ABI_INDEX_CACHE_CONTROL})
+
+
+@app.get("/abi/<abi_id>")
+def abi_content(abi_id):
+    """ABI pelo id (hash do conteúdo): nunca muda, vai para o cache sem prazo."""
+    headers = {"ETag": f'"{abi_id}"', "Cache-Control": ABI_CACHE_CONTROL}
+    if not_modified(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status=304, headers=headers)
+    try:
+        return _json_response(abi_registry.get().get(abi_id), headers=headers)
+    except ChainStateError as e:
+        return _chain_error_response(abi_id, e)
+
+
+@app.get("/contracts/<address>/abi")
+def contract_abi(address):
+    """ABI do contrato implantado no endereço (registro local; PolygonScan só se nenhuma servir)."""
+    try:
+        body = abi_registry.get().for_address(address)
+    except ChainStateError as e:
+        return _chain_error_response(address, e)
+    headers = {"ETag": f'"{body["id"]}"', "Cache-Control": ABI_ADDRESS_CACHE_CONTROL}
+    if not_modified(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status=304, headers=headers)
+    return _json_response(body, headers=headers)
+
+
+def _chain_error_response(address, e):
+    print(f"Erro ao ler o contrato {address}: {str(e)}")
+    record_error(e)
+    return _json_response(chain_error_body(e), e.status)
+
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+def _start_prewarm():
+    """Aquecimento em segundo plano (de novo pelo /readyz se a OpenAI estava inalcançável)."""
+    if readiness.begin_attempt():
+        threading.Thread(target=prewarm, args=(client,), name="prewarm", daemon=True).start()
+
+
+def _start_indexer():
+    """Thread do indexador de contratos (cria o contracts.db; start() é idempotente)."""
+    if INDEXER_ENABLED:
+        contract_indexer.get().start()
+
+
+mark_imported("server")
+if PREWARM_ENABLED:
+    _start_prewarm()
+_start_indexer()
 
 
 # ============================================================================
@@ -0,0 +1,235 @@
+"""
+Deal-Fi AI Agent - Tools resolvidas no servidor
+Responde as tools de leitura a partir do snapshot de estado enviado pelo frontend
+(`client_state`), evitando uma ida e volta navegador ↔ backend por rodada de tools.
+
+`list_my_contracts` é respondida pelo índice de contratos (contract_index) com o
+endereço da carteira do `client_state`.
+
+Formato esperado de `client_state` (ver AIChatService.getClientState):
+    {
+        "page": "create",
+        "form": {"payeeAddress": "0x...", "amount": "100", "duration": "30"},
+        "milestones": [{"percentage": 30}, {"percentage": 70}],
+        "wallet": {"connected": true, "address": "0x..."}
+    }
+
+Ações que dependem do navegador (navegação, preenchimento, MetaMask) continuam
+sendo devolvidas ao frontend como tool_calls, depois de validadas (tool_validation):
+uma rodada com tool_call inválida também é respondida aqui, com a mensagem de erro.
+"""
+
+import asyncio
+import os
+import time
+
+from chain_state import ChainStateError, normalize_address
+from contract_index import contract_index
+from tool_validation import NOT_EXECUTED, milestone_percentage, repair_tool_calls
+
+# Máximo de rodadas resolvidas no servidor numa mesma requisição
+MAX_SERVER_TOOL_ROUNDS = int(os.getenv("MAX_SERVER_TOOL_ROUNDS", 4))
+
+PAGE_DESCRIPTIONS = {
+    "home": "Você está na página inicial.",
+    "create": "Você está na página de criação de contratos.",
+    "manage": "Você está na página de gerenciamento de contratos."
+}
+
+# ============================================================================
+# RESOLVEDORES (mesmos textos do ai-chat-service.js)
+# ============================================================================
+
+def _valid_state(state):
+    """
+    `client_state` no formato que os resolvedores leem (vem do navegador): dict, com
+    form e wallet dicts, wallet.address string e milestones lista. Fora disso as
+    tools voltam ao frontend, que lê o próprio estado.
+    """
+    if not isinstance(state, dict):
+        return False
+    form, wallet, milestones = state.get("form"), state.get("wallet"), state.get("milestones")
+    if form is not None and not isinstance(form, dict):
+        return False
+    if milestones is not None and not isinstance(milestones, list):
+        return False
+    if wallet is None:
+        return True
+    return isinstance(wallet, dict) and (wallet.get("address") is None or isinstance(wallet["address"], str))
+
+
+def _get_current_page(state):
+    page = state.get("page")
+    return PAGE_DESCRIPTIONS.get(page) or f"Página atual: {page}"
+
+
+def _milestones_message(state):
+    try:
+        amount = float((state.get("form") or {}).get("amount") or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+
+    milestones = []
+    for index, milestone in enumerate(state.get("milestones") or []):
+        percentage = milestone_percentage(milestone)
+        value = f"{amount * percentage / 100:.2f}"
+        milestones.append((index, percentage, value))
+
+    if not milestones:
+        return "Nenhum marco configurado."
+
+    total = sum(m[1] for m in milestones)
+    listed = ", ".join(f"Marco {i + 1}: {p}% ({v} USDC)" for i, p, v in milestones)
+    status = " (válido)" if total == 100 else " (deve somar 100%)"
+    return f"Marcos: {listed}. Total: {total}%{status}."
+
+
+def _get_form_fields(state):
+    if state.get("page") != "create":
+        return "Você precisa estar na página de criação de contrato para ver os campos do formulário."
+
+    form = state.get("form") or {}
+    message = "📋 Estado do Formulário:\n"
+    message += f"• Endereço do Recebedor: {form.get('payeeAddress') or '(vazio)'}\n"
+    message += f"• Valor Total: {form.get('amount') or '(vazio)'} USDC\n"
+    message += f"• Prazo: {form.get('duration') or '(vazio)'} dias\n"
+    message += f"\n{_milestones_message(state)}"
+    return message
+
+
+def _get_milestones(state):
+    if state.get("page") != "create":
+        return "Você precisa estar na página de criação de contrato para ver os marcos."
+    return _milestones_message(state)
+
+
+def _get_wallet_status(state):
+    wallet = state.get("wallet") or {}
+    address = wallet.get("address")
+    if wallet.get("connected") and address:
+        short = f"{address[:6]}...{address[38:]}"
+        return f"✅ Carteira conectada\nEndereço: {short}\nEndereço completo: {address}"
+    return '❌ Carteira não conectada. Use "conectar carteira" para conectar sua MetaMask.'
+
+
+def _list_my_contracts(state):
+    wallet = state.get("wallet") or {}
+    if not (wallet.get("connected") and wallet.get("address")):
+        return '❌ Carteira não conectada. Use "conectar carteira" para ver seus contratos.'
+    try:
+        address = normalize_address(wallet["address"])
+        contracts, next_cursor = contract_index.get().contracts(participant=address, limit=10)
+    except ChainStateError as e:
+        return f"Não foi possível consultar seus contratos: {e}"
+    if not contracts:
+        return "Nenhum contrato encontrado para a sua carteira no Deal-Fi."
+
+    more = " (mostrando os 10 primeiros)" if next_cursor else ""
+    lines = [f"📄 Seus contratos{more}:"]
+    for i, contract in enumerate(contracts, 1):
+        role = "pagador" if contract["payer"] == address else "recebedor"
+        released = sum(1 for m in contract["milestoneInfo"] if m["released"])
+        deadline = time.strftime("%d/%m/%Y", time.gmtime(contract["deadline"]))
+        short = f"{contract['address'][:6]}...{contract['address'][38:]}"
+        lines.append(
+            f"{i}. {short} — você é {role}, {contract['amount']} USDC, {contract['statusLabel']}, "
+            f"marcos {released}/{contract['totalMilestones']}, prazo {deadline}"
+        )
+    return "\n".join(lines)
+
+
+SERVER_TOOLS = {
+    "get_current_page": _get_current_page,
+    "get_form_fields": _get_form_fields,
+    "get_milestones": _get_milestones,
+    "get_wallet_status": _get_wallet_status,
+    "list_my_contracts": _list_my_contracts
+}
+
+# ============================================================================
+# LOOP DE TOOLS
+# ============================================================================
+
+def resolve_server_round(message, messages, client_state, errors=None):
+    """
+    Se todas as tool_calls de `message` (dict) podem ser resolvidas no servidor,
+    anexa a mensagem do assistente e os resultados em `messages` e retorna
+    as mensagens novas. Caso contrário (inclusive com `client_state` em formato
+    inesperado) retorna None e a resposta vai ao frontend.
+
+    `errors` ({tool_call_id: erro}, de repair_tool_calls) faz a rodada inteira ser
+    respondida aqui: as chamadas inválidas recebem o erro e as demais não são executadas.
+    """
+    tool_calls = message.get("tool_calls")
+    if not tool_calls:
+        return None
+    if errors:
+        results = {tc["id"]: errors.get(tc["id"], NOT_EXECUTED) for tc in tool_calls}
+    elif not client_state or not _valid_state(client_state) or any(
+        tc["function"]["name"] not in SERVER_TOOLS for tc in tool_calls
+    ):
+        return None
+    else:
+        results = {tc["id"]: SERVER_TOOLS[tc["function"]["name"]](client_state) for tc in tool_calls}
+
+    new_messages = [{k: v for k, v in message.items() if v is not None}]
+    for tc in tool_calls:
+        new_messages.append({"role": "tool", "tool_call_id": tc["id"], "content": results[tc["id"]]})
+
+    messages.extend(new_messages)
+    return new_messages
+
+
+def chat_with_server_tools(create, messages, client_state, context=None):
+    """
+    Chama `create(messages)` e resolve as rodadas de tools de leitura (e as
+    tool_calls inválidas) no servidor. Retorna o corpo da resposta: o último
+    completion + `server_messages` (mensagens que o frontend deve anexar ao
+    histórico antes da resposta final).
+    """
+    server_messages = []
+    for round_index in range(MAX_SERVER_TOOL_ROUNDS + 1):
+        body = create(messages).model_dump()
+        message = body["choices"][0]["message"]
+        errors = repair_tool_calls(message, client_state)
+        if round_index == MAX_SERVER_TOOL_ROUNDS:
+            break
+        new_messages = resolve_server_round(message, messages, client_state, errors)
+        if new_messages is None:
+            break
+        server_messages.extend(new_messages)
+
+    return completion_body(body, server_messages, context)
+
+
+async def achat_with_server_tools(create, messages, client_state, context=None):
+    """
+    Versão assíncrona de `chat_with_server_tools` (create é uma corrotina). As tools
+    rodam numa thread: list_my_contracts consulta o índice SQLite.
+    """
+    server_messages = []
+    for round_index in range(MAX_SERVER_TOOL_ROUNDS + 1):
+        body = (await create(messages)).model_dump()
+        message = body["choices"][0]["message"]
+        errors = repair_tool_calls(message, client_state)
+        if round_index == MAX_SERVER_TOOL_ROUNDS:
+            break
+        new_messages = await asyncio.to_thread(resolve_server_round, message, messages, client_state, errors)
+        if new_messages is None:
+            break
+        server_messages.extend(new_messages)
+
+    return completion_body(body, server_messages, context)
+
+
+def completion_body(completion, server_messages, context=None):
+    """
+    Corpo do /chat: `completion.model_dump()` + `server_messages` quando houver
+    + `context` (tokens do prompt enviados nesta requisição).
+    """
+    body = completion if isinstance(completion, dict) else completion.model_dump()
+    if server_messages:
+        body["server_messages"] = server_messages
+    if context:
+        body["context"] = context
+    return body
@@ -0,0 +1,234 @@
+"""
+Deal-Fi AI Agent - Sessões de conversa
+Histórico mantido no servidor, para que o frontend envie só as mensagens novas.
+
+Backends (SESSION_BACKEND):
+- memory: dicionário em memória com TTL e despejo LRU (padrão)
+- sqlite: arquivo SQLite (SESSION_DB_PATH), sobrevive a reinícios do processo
+
+Uma sessão apagada ou expirada não é recriada pelo append: o turno termina com
+SessionNotFound (404), mesmo que a sessão tenha sumido durante a chamada ao GPT.
+
+O system prompt não é guardado: ele é inserido por prepare_messages a cada requisição.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", 3600))            # segundos sem uso
+SESSION_MAX = int(os.getenv("SESSION_MAX", 10000))           # sessões em memória
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+class SessionNotFound(LookupError):
+    """Sessão inexistente, expirada ou apagada (404 com session_not_found_body)."""
+
+    def __init__(self, session_id):
+        super().__init__(session_id)
+        self.session_id = session_id
+
+
+class MemorySessionStore:
+    """Sessões em memória com TTL e despejo LRU (thread-safe)."""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # id -> (updated_at, messages)
+        self._lock = threading.Lock()
+
+    def create(self):
+        session_id = _new_id()
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), [])
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def _live(self, session_id):
+        """Entrada da sessão ou None se não existir/expirou (chamado com o lock)."""
+        entry = self._sessions.get(session_id)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._sessions[session_id]
+            entry = None
+        return entry
+
+    def get(self, session_id):
+        """Histórico da sessão (cópia) ou None se não existir/expirou."""
+        with self._lock:
+            entry = self._live(session_id)
+            if entry is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def append(self, session_id, messages):
+        """Anexa as mensagens do turno; SessionNotFound se a sessão foi apagada ou expirou."""
+        with self._lock:
+            entry = self._live(session_id)
+            if entry is None:
+                raise SessionNotFound(session_id)
+            entry[1].extend(messages)
+            self._sessions[session_id] = (time.monotonic(), entry[1])
+            self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+class SQLiteSessionStore:
+    """
+    Sessões em SQLite com TTL; as menos usadas são removidas acima de `max_sessions`.
+    Uma linha por mensagem (session_messages): cada turno só insere as mensagens novas.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Apagar a sessão apaga as mensagens (ON DELETE CASCADE)
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate_v1()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_messages ("
+            " seq INTEGER PRIMARY KEY,"
+            " session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,"
+            " message TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_session_messages ON session_messages(session_id, seq)")
+
+    def _migrate_v1(self):
+        """Converte o formato antigo (histórico inteiro em JSON na coluna sessions.messages)."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "messages" not in columns:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("ALTER TABLE sessions RENAME TO sessions_v1")
+                self._conn.execute("DROP INDEX IF EXISTS idx_sessions_updated")
+                self._conn.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+                self._conn.execute(
+                    "CREATE TABLE session_messages ("
+                    " seq INTEGER PRIMARY KEY,"
+                    " session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,"
+                    " message TEXT NOT NULL)"
+                )
+                for session_id, messages, updated_at in self._conn.execute(
+                    "SELECT id, messages, updated_at FROM sessions_v1"
+                ).fetchall():
+                    self._conn.execute("INSERT INTO sessions (id, updated_at) VALUES (?, ?)", (session_id, updated_at))
+                    self._conn.executemany(
+                        "INSERT INTO session_messages (session_id, message) VALUES (?, ?)",
+                        [(session_id, json.dumps(m, ensure_ascii=False)) for m in json.loads(messages)]
+                    )
+                self._conn.execute("DROP TABLE sessions_v1")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def create(self):
+        session_id = _new_id()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.execute("INSERT INTO sessions (id, updated_at) VALUES (?, ?)", (session_id, now))
+            self._conn.execute(
+                "DELETE FROM sessions WHERE id IN ("
+                " SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+        return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            now = time.time()
+            cursor = self._conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE id = ? AND updated_at >= ?",
+                (now, session_id, now - self.ttl)
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute("DELETE FROM sessions WHERE id = ? AND updated_at < ?", (session_id, now - self.ttl))
+                return None
+            rows = self._conn.execute(
+                "SELECT message FROM session_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            return [json.loads(row[0]) for row in rows]
+
+    def append(self, session_id, messages):
+        """Anexa as mensagens do turno; SessionNotFound se a sessão foi apagada ou expirou."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                cursor = self._conn.execute(
+                    "UPDATE sessions SET updated_at = ? WHERE id = ? AND updated_at >= ?",
+                    (now, session_id, now - self.ttl)
+                )
+                if cursor.rowcount == 0:
+                    raise SessionNotFound(session_id)
+                self._conn.executemany(
+                    "INSERT INTO session_messages (session_id, message) VALUES (?, ?)",
+                    [(session_id, json.dumps(m, ensure_ascii=False)) for m in messages]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            return cursor.rowcount > 0
+
+
+def create_store():
+    """Instancia o backend configurado em SESSION_BACKEND."""
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    if SESSION_BACKEND == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"SESSION_BACKEND inválido: {SESSION_BACKEND} (use memory ou sqlite)")
+
+
+def session_not_found_body(session_id):
+    """Corpo de erro para sessão inexistente ou expirada."""
+    return {
+        "error": {
+            "message": f"Sessão não encontrada ou expirada: {session_id}",
+            "type": "session_not_found"
+        }
+    }
+
+
+def turn_messages(new_messages, body):
+    """
+    Mensagens a anexar ao histórico após um turno: as enviadas pelo cliente,
+    as resolvidas no servidor e a resposta final do assistente.
+    """
+    final = body["choices"][0]["message"]
+    return (
+        list(new_messages)
+        + body.get("server_messages", [])
+        + [{k: v for k, v in final.items() if v is not None}]
+    )
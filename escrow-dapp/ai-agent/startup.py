@@ -0,0 +1,208 @@
+"""
+Deal-Fi AI Agent - Startup rápido e prontidão
+Objetos pesados são criados sob demanda (Lazy): o cliente da OpenAI (que importa o
+SDK, a maior parte do tempo de import) e o encoding do tiktoken. Logo depois do
+startup, um aquecimento em segundo plano (prewarm) cria o cliente, abre a conexão
+com a OpenAI (que fica no pool) e conta os tokens dos prefixos de todas as variantes
+do prompt. O processo já responde /healthz enquanto aquece, e o primeiro /chat não
+paga o import do SDK nem o handshake TLS.
+
+- /healthz: liveness (o processo responde), sem checagens;
+- /readyz: readiness - OPENAI_API_KEY configurada, OpenAI alcançável com o circuito
+  fechado e prefixos do prompt aquecidos; 503 com o detalhe enquanto não estiver pronto.
+
+Este módulo não importa nada pesado: os servidores o importam primeiro e o tempo de
+import deles é medido a partir daqui (linha [startup] no log e campo `startup` do /readyz).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Início do import do servidor (este módulo é o primeiro import de server.py/asgi.py)
+IMPORT_STARTED = time.perf_counter()
+
+PREWARM_ENABLED = os.getenv("PREWARM", "1") == "1"
+# Timeout da chamada de aquecimento à OpenAI (GET /models, sem retries)
+PREWARM_TIMEOUT = float(os.getenv("PREWARM_TIMEOUT", 5))
+# Com a OpenAI inalcançável, /readyz dispara um novo aquecimento no máximo a cada N s
+READY_RETRY_INTERVAL = float(os.getenv("READY_RETRY_INTERVAL", 10))
+
+READY_CHECKS = ("api_key", "prompts", "upstream")
+
+
+class Lazy:
+    """Valor criado na primeira chamada de get() (uma vez só, thread-safe)."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._value = self._factory()
+                    self._created = True
+        return self._value
+
+    @property
+    def created(self):
+        return self._created
+
+
+class Readiness:
+    """Resultado das checagens de prontidão e tempos do startup (preenchidos pelo prewarm)."""
+
+    def __init__(self):
+        self.checks = {}    # nome -> {"ok": bool, "detail": str | None}
+        self.timings = {}   # etapa -> ms
+        self._attempted_at = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def set(self, name, ok, detail=None):
+        with self._lock:
+            self.checks[name] = {"ok": ok, "detail": detail}
+
+    @contextmanager
+    def stage(self, name):
+        """Mede uma etapa do startup (ms, exibida no /readyz)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def begin_attempt(self):
+        """Reserva um aquecimento (False se já há um rodando ou o último foi há pouco)."""
+        with self._lock:
+            if self._running:
+                return False
+            recent = self._attempted_at is not None and time.monotonic() - self._attempted_at < READY_RETRY_INTERVAL
+            if recent or (self._attempted_at is not None and self._ready_locked()):
+                return False
+            self._running = True
+            self._attempted_at = time.monotonic()
+            return True
+
+    def end_attempt(self):
+        with self._lock:
+            self._running = False
+
+    def _ready_locked(self):
+        return all(self.checks.get(name, {}).get("ok") for name in READY_CHECKS)
+
+    def snapshot(self, breaker_state="closed"):
+        """(pronto, corpo do /readyz); o estado do circuit breaker é avaliado na hora."""
+        with self._lock:
+            checks = {name: dict(self.checks.get(name) or {"ok": False, "detail": "aquecendo"})
+                      for name in READY_CHECKS}
+        checks["circuit_breaker"] = {"ok": breaker_state != "open", "detail": breaker_state}
+        ready = all(check["ok"] for check in checks.values())
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "startup": dict(self.timings)
+        }
+
+
+readiness = Readiness()
+
+
+def mark_imported(server):
+    """Registra e exibe o tempo de import do servidor (desde o import deste módulo)."""
+    readiness.timings["import"] = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
+    print(f"[startup] {server} importado em {readiness.timings['import']:.0f} ms "
+          f"(prewarm={'on' if PREWARM_ENABLED else 'off'})", flush=True)
+
+
+def health_body():
+    """Resposta do /healthz (liveness)."""
+    return {"status": "ok", "uptime_s": round(time.perf_counter() - IMPORT_STARTED, 1)}
+
+
+# ============================================================================
+# AQUECIMENTO
+# ============================================================================
+
+def warm_prompts():
+    """Carrega o tiktoken e conta os tokens dos prefixos (system + tools) de todas as variantes."""
+    from context import prefix_tokens
+    from prompt_cache import VARIANTS, prefix_is_stable
+
+    with readiness.stage("prompts"):
+        for variant in VARIANTS.values():
+            prefix_tokens(variant)
+    stable = prefix_is_stable()
+    readiness.set("prompts", stable, f"{len(VARIANTS)} variantes" if stable else "prefixo alterado desde o startup")
+
+
+def _check_api_key():
+    ok = bool(os.getenv("OPENAI_API_KEY"))
+    readiness.set("api_key", ok, None if ok else "OPENAI_API_KEY não encontrada")
+    if not ok:
+        readiness.set("upstream", False, "sem OPENAI_API_KEY")
+    return ok
+
+
+def _probe_result(error):
+    """(ok, detalhe) do GET /models: qualquer resposta HTTP prova que a OpenAI é alcançável."""
+    import openai
+
+    if error is None:
+        return True, None
+    if isinstance(error, openai.AuthenticationError):
+        return False, "OPENAI_API_KEY recusada pela OpenAI"
+    if isinstance(error, openai.APIStatusError):
+        return True, f"HTTP {error.status_code}"
+    return False, f"{type(error).__name__}: {error}"
+
+
+def prewarm(client):
+    """Aquecimento síncrono (thread do servidor Flask); `client` é o Lazy do cliente OpenAI."""
+    try:
+        warm_prompts()
+        if not _check_api_key():
+            return
+        with readiness.stage("openai_client"):
+            openai_client = client.get()
+        with readiness.stage("upstream"):
+            # Sem retries; a conexão aberta aqui fica no pool do cliente para o primeiro /chat
+            try:
+                openai_client.with_options(max_retries=0, timeout=PREWARM_TIMEOUT).models.list()
+                error = None
+            except Exception as e:
+                error = e
+        readiness.set("upstream", *_probe_result(error))
+    except Exception as e:
+        print(f"[startup] Erro no prewarm: {e}")
+    finally:
+        readiness.end_attempt()
+        print(f"[startup] prewarm: {readiness.timings}", flush=True)
+
+
+async def aprewarm(client):
+    """Aquecimento do servidor ASGI: o import do SDK e o tiktoken rodam fora do event loop."""
+    try:
+        await asyncio.to_thread(warm_prompts)
+        if not _check_api_key():
+            return
+        with readiness.stage("openai_client"):
+            openai_client = await asyncio.to_thread(client.get)
+        with readiness.stage("upstream"):
+            try:
+                await openai_client.with_options(max_retries=0, timeout=PREWARM_TIMEOUT).models.list()
+                error = None
+            except Exception as e:
+                error = e
+        readiness.set("upstream", *_probe_result(error))
+    except Exception as e:
+        print(f"[startup] Erro no prewarm: {e}")
+    finally:
+        readiness.end_attempt()
+        print(f"[startup] prewarm: {readiness.timings}", flush=True)
@@ -0,0 +1,127 @@
+"""
+Deal-Fi AI Agent - Streaming
+Utilitários para repassar a resposta do GPT como Server-Sent Events (SSE)
+"""
+
+import json
+import time
+
+
+def sse_event(event, data, event_id=None):
+    """
+    Formata um evento SSE (uma linha `event:` e uma linha `data:` com JSON).
+    Com `event_id`, inclui a linha `id:` (o navegador a reenvia em Last-Event-ID).
+    """
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {payload}\n\n"
+
+
+class ChatStreamAccumulator:
+    """
+    Monta a mensagem final a partir dos chunks do stream da OpenAI.
+
+    O resultado de `completion()` tem o mesmo formato de `completion.model_dump()`
+    no modo sem streaming, para que o frontend possa migrar aos poucos.
+    """
+
+    def __init__(self, model):
+        self.id = None
+        self.model = model
+        self.created = int(time.time())
+        self.role = "assistant"
+        self.content_parts = []
+        self.tool_calls = {}
+        self.finish_reason = None
+        self.usage = None
+
+    def add_chunk(self, chunk):
+        """
+        Incorpora um chunk e retorna o delta a ser repassado ao cliente
+        (ou None se o chunk não trouxer conteúdo nem tool_calls).
+        """
+        self.id = chunk.id or self.id
+        self.model = chunk.model or self.model
+        self.created = chunk.created or self.created
+
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage.model_dump()
+
+        if not chunk.choices:
+            return None
+
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+
+        delta = choice.delta
+        if delta is None:
+            return None
+
+        out = {}
+        if delta.role:
+            self.role = delta.role
+        if delta.content:
+            self.content_parts.append(delta.content)
+            out["content"] = delta.content
+
+        if delta.tool_calls:
+            out["tool_calls"] = []
+            for tc in delta.tool_calls:
+                entry = self.tool_calls.setdefault(tc.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tc.id:
+                    entry["id"] = tc.id
+                if tc.function is not None:
+                    if tc.function.name:
+                        entry["function"]["name"] += tc.function.name
+                    if tc.function.arguments:
+                        entry["function"]["arguments"] += tc.function.arguments
+                out["tool_calls"].append(tc.model_dump(exclude_none=True))
+
+        return out or None
+
+    def message(self):
+        """Mensagem do assistente já montada."""
+        content = "".join(self.content_parts) or None
+        tool_calls = [self.tool_calls[i] for i in sorted(self.tool_calls)] or None
+        return {
+            "role": self.role,
+            "content": content,
+            "tool_calls": tool_calls,
+            "function_call": None,
+            "refusal": None,
+            "audio": None
+        }
+
+    def completion(self):
+        """Completion completo no formato de `ChatCompletion.model_dump()`."""
+        return {
+            "id": self.id,
+            "object": "chat.completion",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{
+                "index": 0,
+                "message": self.message(),
+                "finish_reason": self.finish_reason,
+                "logprobs": None
+            }],
+            "usage": self.usage,
+            "system_fingerprint": None,
+            "service_tier": None
+        }
+
+
+def replay_events(body):
+    """Eventos SSE de uma resposta já pronta (cache, roteador local), no formato do stream."""
+    if body.get("server_messages"):
+        yield sse_event("server_messages", {"messages": body["server_messages"]})
+    message = body["choices"][0]["message"]
+    if message.get("content"):
+        yield sse_event("delta", {"content": message["content"]})
+    yield sse_event("message", body)
+    yield sse_event("done", {})
@@ -0,0 +1,265 @@
+"""
+Deal-Fi AI Agent - Validação das tool_calls
+Confere as tool_calls do modelo contra os schemas de TOOLS e as regras do
+formulário (as mesmas do SYSTEM_PROMPT e do ai-chat-service.js) antes de
+devolvê-las ao navegador:
+
+- payeeAddress: 0x + 40 hexadecimais (42 caracteres);
+- amount: número maior que 0;
+- duration: inteiro de 1 a 365 dias;
+- marcos: de 1 a 10, índices existentes, percentuais de 1 a 100 somando 100%.
+
+O que dá para corrigir sem ambiguidade é corrigido no lugar ("100 USDC" → "100",
+"1.500,50" → "1500.50", "valor" → "amount", "30%" → 30). O que continua inválido
+volta ao modelo como resultado de tool com a mensagem de erro, na mesma requisição.
+"""
+
+import json
+import math
+import re
+
+from metrics import Counter, register_metric
+from prompts import TOOLS
+
+REPAIRS = register_metric(Counter("dealfi_tool_call_repairs_total", "Argumentos de tool_calls corrigidos no servidor"))
+REJECTIONS = register_metric(Counter("dealfi_tool_call_rejections_total", "Tool_calls inválidas devolvidas ao modelo"))
+
+MAX_MILESTONES = 10
+NOT_EXECUTED = "Não executado: outra chamada desta resposta é inválida. Corrija e repita todas as chamadas."
+
+_SCHEMAS = {tool["function"]["name"]: tool["function"]["parameters"] for tool in TOOLS}
+_JSON_TYPES = {"string": str, "integer": int, "number": (int, float), "boolean": bool, "object": dict, "array": list}
+
+_FIELD_ALIASES = {
+    "payeeaddress": "payeeAddress", "payee_address": "payeeAddress", "payee": "payeeAddress",
+    "address": "payeeAddress", "endereco": "payeeAddress", "endereço": "payeeAddress", "recebedor": "payeeAddress",
+    "amount": "amount", "valor": "amount", "value": "amount", "total": "amount",
+    "duration": "duration", "prazo": "duration", "dias": "duration", "days": "duration",
+    "duracao": "duration", "duração": "duration"
+}
+_PAGE_ALIASES = {
+    "inicio": "home", "início": "home", "inicial": "home",
+    "criar": "create", "criacao": "create", "criação": "create",
+    "gerenciar": "manage", "gerenciamento": "manage"
+}
+_ADDRESS = re.compile(r"^0x[a-fA-F0-9]{40}$")
+_THOUSANDS = re.compile(r"^\d{1,3}(?:\.\d{3})+$")
+
+
+def _number_text(value):
+    """Texto numérico sem unidade, com ponto decimal ("1.500,50 USDC" → "1500.50")."""
+    text = re.sub(r"(?i)usdc|pol|dias?|days?|us\$|r\$|\$|%", "", str(value)).strip().replace(" ", "")
+    if "," in text and "." in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif "," in text:
+        text = text.replace(",", ".")
+    elif _THOUSANDS.match(text):
+        text = text.replace(".", "")
+    return text
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            number = float(_number_text(value))
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else value
+    return value
+
+
+def repair_arguments(name, args):
+    """Argumentos normalizados (cópia) para a tool `name`."""
+    args = dict(args)
+    if name == "fill_form_field":
+        field = args.get("field")
+        if isinstance(field, str):
+            field = args["field"] = _FIELD_ALIASES.get(field.strip().lower(), field)
+        value = args.get("value")
+        if value is not None and not isinstance(value, str):
+            value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        if isinstance(value, str):
+            value = value.strip()
+            if field == "payeeAddress":
+                value = value.replace(" ", "")
+                if re.match(r"^0X", value):
+                    value = "0x" + value[2:]
+                elif re.match(r"^[a-fA-F0-9]{40}$", value):
+                    value = "0x" + value
+            elif field == "amount":
+                value = _number_text(value)
+            elif field == "duration":
+                number = _to_int(value)
+                value = str(number) if isinstance(number, int) else _number_text(value)
+            args["value"] = value
+    elif name in ("update_milestone", "remove_milestone"):
+        for key in ("index", "percentage"):
+            if key in args:
+                args[key] = _to_int(args[key])
+    elif name == "navigate_to_page" and isinstance(args.get("page"), str):
+        page = args["page"].strip().lower()
+        args["page"] = _PAGE_ALIASES.get(page, page)
+    return args
+
+
+def schema_problem(name, args):
+    """Motivo pelo qual `args` não segue o schema da tool (ou None)."""
+    schema = _SCHEMAS.get(name)
+    if schema is None:
+        return "unknown_tool"
+    if not isinstance(args, dict):
+        return "invalid_json"
+    if any(key not in args for key in schema.get("required", [])):
+        return "missing_argument"
+    for key, value in args.items():
+        spec = schema.get("properties", {}).get(key)
+        if spec is None:
+            return "unknown_argument"
+        expected = _JSON_TYPES.get(spec.get("type"))
+        if expected and (not isinstance(value, expected) or isinstance(value, bool) and expected is not bool):
+            return "invalid_type"
+        if "enum" in spec and value not in spec["enum"]:
+            return "invalid_enum"
+    return None
+
+
+def parse_arguments(tool_call):
+    """Argumentos da tool_call como dict, ou None se o JSON for inválido."""
+    try:
+        args = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError:
+        return None
+    return args if isinstance(args, dict) else None
+
+
+def _schema_error(name, problem):
+    if problem == "unknown_tool":
+        return f"Erro: função {name} não existe."
+    if problem == "invalid_json":
+        return "Erro: argumentos não são um JSON válido."
+    required = ", ".join(_SCHEMAS[name].get("required", [])) or "nenhum"
+    allowed = {
+        key: spec["enum"] for key, spec in _SCHEMAS[name].get("properties", {}).items() if "enum" in spec
+    }
+    hint = f" Valores aceitos: {allowed}." if allowed else ""
+    return f"Erro: argumentos inválidos para {name} ({problem}). Obrigatórios: {required}.{hint}"
+
+
+def _field_error(args):
+    field, value = args["field"], args["value"]
+    if field == "payeeAddress" and not _ADDRESS.match(value):
+        return "Erro: Endereço inválido. Deve começar com 0x e ter 42 caracteres."
+    if field == "amount":
+        try:
+            valid = math.isfinite(float(value)) and float(value) > 0
+        except ValueError:
+            valid = False
+        if not valid:
+            return "Erro: Valor deve ser um número maior que 0."
+    if field == "duration":
+        if not value.isdigit() or not 1 <= int(value) <= 365:
+            return "Erro: Prazo deve ser entre 1 e 365 dias."
+    return None
+
+# ============================================================================
+# MARCOS (simulação das alterações da resposta sobre o estado do formulário)
+# ============================================================================
+
+def milestone_percentage(milestone):
+    """Percentual de um marco do client_state como o frontend lê (parseInt; inválido = 0)."""
+    try:
+        return int(float(milestone.get("percentage") or 0))
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _redistribute(count):
+    """Mesma redistribuição do create-contract-form.js (último marco recebe o resto)."""
+    share = 100 // count
+    return [share] * (count - 1) + [100 - share * (count - 1)]
+
+
+def _milestone_error(name, args, milestones):
+    """Aplica a alteração em `milestones` (lista de percentuais) ou retorna o erro."""
+    if name == "add_milestone":
+        if milestones is not None:
+            if len(milestones) >= MAX_MILESTONES:
+                return f"Erro: Máximo de {MAX_MILESTONES} marcos permitidos."
+            milestones[:] = _redistribute(len(milestones) + 1)
+        return None
+
+    index = args["index"]
+    if index < 0 or milestones is not None and index >= len(milestones):
+        available = f" Marcos disponíveis: 0 a {len(milestones) - 1}." if milestones else ""
+        return f"Erro: Índice inválido (começa em 0).{available}"
+
+    if name == "remove_milestone":
+        if milestones is not None:
+            if len(milestones) <= 1:
+                return "Erro: Não é possível remover o último marco. Deve haver pelo menos um marco."
+            del milestones[index]
+            milestones[:] = _redistribute(len(milestones))
+        return None
+
+    if not 1 <= args["percentage"] <= 100:
+        return "Erro: Percentual deve estar entre 1 e 100."
+    if milestones is not None:
+        milestones[index] = args["percentage"]
+    return None
+
+
+def repair_tool_calls(message, client_state=None):
+    """
+    Corrige no lugar os argumentos das tool_calls de `message` (dict) e retorna
+    {tool_call_id: mensagem de erro} para as que continuam inválidas.
+    Sem `client_state`, índices e quantidade de marcos não são conferidos.
+    """
+    errors = {}
+    milestones = None
+    if isinstance(client_state, dict) and isinstance(client_state.get("milestones"), list):
+        milestones = [milestone_percentage(m) for m in client_state["milestones"]]
+    updates = []
+
+    for tc in message.get("tool_calls") or []:
+        name = tc["function"]["name"]
+        args = parse_arguments(tc)
+        if args is None or name not in _SCHEMAS:
+            errors[tc["id"]] = _schema_error(name, "invalid_json" if name in _SCHEMAS else "unknown_tool")
+            continue
+
+        repaired = repair_arguments(name, args)
+        if repaired != args:
+            tc["function"]["arguments"] = json.dumps(repaired, ensure_ascii=False)
+            REPAIRS.inc(function=name)
+
+        problem = schema_problem(name, repaired)
+        if problem:
+            errors[tc["id"]] = _schema_error(name, problem)
+        elif name == "fill_form_field":
+            error = _field_error(repaired)
+            if error:
+                errors[tc["id"]] = error
+        elif name in ("add_milestone", "update_milestone", "remove_milestone"):
+            error = _milestone_error(name, repaired, milestones)
+            if error:
+                errors[tc["id"]] = error
+            elif name == "update_milestone":
+                updates.append(tc["id"])
+
+    # Soma conferida só depois de aplicar todas as alterações da resposta
+    if updates and milestones is not None and sum(milestones) != 100 and not errors:
+        listed = ", ".join(f"Marco {i + 1}: {p}%" for i, p in enumerate(milestones))
+        error = (
+            f"Erro: Depois destas alterações os marcos somariam {sum(milestones)}% ({listed}). "
+            "Ajuste os percentuais na mesma resposta para somar exatamente 100%."
+        )
+        errors.update({tool_call_id: error for tool_call_id in updates})
+
+    for tc in message.get("tool_calls") or []:
+        if tc["id"] in errors:
+            REJECTIONS.inc(function=tc["function"]["name"])
+    return errors
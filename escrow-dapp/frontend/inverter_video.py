@@ -1,31 +1,273 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips, vfx
-import os
+"""
+Gera os vídeos ping-pong (ida + volta) usados como fundo no frontend.
+
+O vídeo de entrada é decodificado uma vez só, em ordem (sem o acesso aleatório que o
+time_mirror do moviepy faz para tocar de trás para frente), para um arquivo de frames
+RGB brutos em disco. A renderização lê um frame de cada vez desse arquivo para buffers
+reaproveitados, então a memória usada é de poucos frames, qualquer que seja a duração
+do vídeo (o cache de páginas do sistema cuida do resto). A partir desse buffer:
+- a volta é só a lista de índices invertida, sem decodificar de novo;
+- o crossfade é calculado apenas nos frames da janela de transição, onde o fim da ida
+  se sobrepõe ao início da volta; os outros frames vão direto do buffer para o encoder
+  (nada de compor todos os frames como no concatenate_videoclips(method="compose"));
+- cada variante (resolução, curva de easing, perfil de encode) é renderizada num
+  processo próprio, em paralelo, lendo o mesmo buffer.
 
-# Caminho do vídeo original
-caminho_video = r"C:\Users\david\OneDrive\Documentos\02_Python Scripts\SmartContractsBrasil\escrow-dapp\frontend\video_pronto.mp4"
+Uso (a partir de escrow-dapp/frontend):
+    python inverter_video.py                          # video_pronto_pingpong.mp4 e video_pingpong_ease.mp4
+    python inverter_video.py video.mp4 --variant orig:linear --variant 720:ease:web
+    python inverter_video.py --cache-dir .frames      # mantém o buffer e o reaproveita na próxima vez
 
-# Extrai diretório e nomes
-diretorio, nome_arquivo = os.path.split(caminho_video)
-nome, ext = os.path.splitext(nome_arquivo)
-novo_nome = f"{nome}_pingpong{ext}"
-caminho_saida = os.path.join(diretorio, novo_nome)
+Variantes: ALTURA[:CURVA[:PERFIL]][=ARQUIVO]
+- ALTURA: "orig" ou altura em pixels (a largura segue a proporção);
+- CURVA: linear, ease (smoothstep) ou sine - a velocidade cai perto das viradas;
+- PERFIL: padrao (libx264 crf 20) ou web (crf 28, preset slow, +faststart);
+- ARQUIVO: nome do arquivo de saída (padrão: <vídeo>_pingpong[_curva][_Np][_perfil].mp4).
+"""
 
-# Carrega o vídeo
-clip = VideoFileClip(caminho_video)
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Cria a versão invertida
-clip_invertido = clip.fx(vfx.time_mirror)
+import numpy as np
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+VIDEO_PADRAO = os.path.join(DIRETORIO, "video_pronto.mp4")
+# Os mesmos arquivos que o frontend já usa
+VARIANTES_PADRAO = ("orig:linear", "orig:ease=video_pingpong_ease.mp4")
 
 # Tempo de transição em segundos (crossfade)
-transicao = 0.5
+TRANSICAO = 0.5
+
+CURVAS = {
+    "linear": lambda t: t,
+    "ease": lambda t: t * t * (3 - 2 * t),
+    "sine": lambda t: 0.5 - 0.5 * math.cos(math.pi * t),
+}
+
+# Vídeo de fundo: sem áudio; o perfil web prioriza o tamanho e o início rápido no navegador
+PERFIS = {
+    "padrao": {"preset": "medium", "ffmpeg_params": ["-crf", "20"]},
+    "web": {"preset": "slow", "ffmpeg_params": ["-crf", "28", "-profile:v", "high", "-movflags", "+faststart"]},
+}
+
+
+# ============================================================================
+# DECODIFICAÇÃO (uma vez, para o buffer em disco)
+# ============================================================================
+
+def _chave_fonte(caminho_video):
+    stat = os.stat(caminho_video)
+    return {"video": os.path.abspath(caminho_video), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def decodificar(caminho_video, cache_dir):
+    """
+    Decodifica o vídeo em ordem para <cache_dir>/frames.rgb (frames uint8 [h, w, 3] em
+    sequência). Se o buffer já existe para o mesmo arquivo (caminho, mtime e tamanho),
+    é reaproveitado. A decodificação vai para um .tmp renomeado no fim, então um buffer
+    incompleto (decodificação interrompida) nunca é reaproveitado.
+    Devolve os metadados {"frames", "shape", "fps", "decode_s"}.
+    """
+    from moviepy.editor import VideoFileClip
+
+    caminho_frames = os.path.join(cache_dir, "frames.rgb")
+    caminho_meta = os.path.join(cache_dir, "frames.json")
+    chave = _chave_fonte(caminho_video)
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["fonte"] == chave and os.path.getsize(caminho_frames) == math.prod(meta["shape"]):
+            meta["decode_s"] = 0.0
+            return meta
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    inicio = time.perf_counter()
+    clip = VideoFileClip(caminho_video, audio=False)
+    largura, altura = clip.size
+    n = 0
+    temp_frames = f"{caminho_frames}.tmp"
+    with open(temp_frames, "wb") as f:
+        for frame in clip.iter_frames(dtype="uint8"):
+            f.write(np.ascontiguousarray(frame))
+            n += 1
+    fps = clip.fps
+    clip.close()
+    os.replace(temp_frames, caminho_frames)
+
+    meta = {"fonte": chave, "frames": n, "shape": [n, altura, largura, 3], "fps": fps}
+    temp = f"{caminho_meta}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(temp, caminho_meta)
+    meta["decode_s"] = time.perf_counter() - inicio
+    return meta
+
+
+# ============================================================================
+# LINHA DO TEMPO (índices no buffer; mistura só na janela de transição)
+# ============================================================================
+
+def linha_do_tempo(n, curva="linear", frames_transicao=0):
+    """
+    Lista de (a, b, peso) por frame de saída: o frame a do buffer misturado com o b
+    (peso de b; 0 = só a, sem mistura). A ida percorre os n frames pela curva, a volta
+    é a ida invertida e os `frames_transicao` finais da ida se sobrepõem aos iniciais
+    da volta. O último frame da volta é o primeiro da ida, então o loop fecha sem salto.
+    """
+    ease = CURVAS[curva]
+    ida = [round(ease(i / (n - 1)) * (n - 1)) for i in range(n)] if n > 1 else [0] * n
+    volta = ida[::-1]
+    k = max(0, min(frames_transicao, n - 1))
+    tempo = [(a, a, 0.0) for a in ida[:n - k]]
+    for i in range(k):
+        tempo.append((ida[n - k + i], volta[i], (i + 1) / (k + 1)))
+    tempo.extend((b, b, 0.0) for b in volta[k:])
+    return tempo
+
+
+# ============================================================================
+# RENDERIZAÇÃO (uma variante por processo)
+# ============================================================================
+
+def parse_variante(spec):
+    """
+    '720:ease:web' -> {"altura": 720, "curva": "ease", "perfil": "web", "arquivo": None}
+    (altura None = original; '...=nome.mp4' define o arquivo de saída).
+    """
+    spec, _, arquivo = spec.partition("=")
+    partes = spec.split(":")
+    altura, curva, perfil = (partes + ["linear", "padrao"][len(partes) - 1:])[:3]
+    if curva not in CURVAS:
+        raise ValueError(f"Curva inválida em {spec!r}: use {', '.join(CURVAS)}")
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil inválido em {spec!r}: use {', '.join(PERFIS)}")
+    return {"altura": None if altura == "orig" else int(altura), "curva": curva, "perfil": perfil,
+            "arquivo": arquivo or None}
+
+
+def nome_saida(caminho_video, variante, diretorio_saida=None):
+    """video_pronto.mp4 + 720:ease:web -> video_pronto_pingpong_ease_720p_web.mp4 (ou o ARQUIVO da variante)"""
+    diretorio, nome_arquivo = os.path.split(caminho_video)
+    if variante["arquivo"]:
+        return os.path.join(diretorio_saida or diretorio, variante["arquivo"])
+    nome, ext = os.path.splitext(nome_arquivo)
+    sufixos = ["pingpong"]
+    if variante["curva"] != "linear":
+        sufixos.append(variante["curva"])
+    if variante["altura"]:
+        sufixos.append(f"{variante['altura']}p")
+    if variante["perfil"] != "padrao":
+        sufixos.append(variante["perfil"])
+    return os.path.join(diretorio_saida or diretorio, f"{nome}_{'_'.join(sufixos)}{ext}")
+
+
+def renderizar(args):
+    """Renderiza uma variante a partir do buffer; devolve (caminho, frames, segundos)."""
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+    caminho_frames, meta, variante, transicao, caminho_saida, threads = args
+    inicio = time.perf_counter()
+    n, altura, largura, _ = meta["shape"]
+    # Dois buffers reaproveitados: o frame atual e, na transição, o que é misturado a ele
+    frame_a = np.empty((altura, largura, 3), dtype=np.uint8)
+    frame_b = np.empty_like(frame_a)
+    tamanho = frame_a.nbytes
+    tempo = linha_do_tempo(n, variante["curva"], round(transicao * meta["fps"]))
+
+    perfil = PERFIS[variante["perfil"]]
+    params = list(perfil["ffmpeg_params"])
+    if variante["altura"] and variante["altura"] != altura:
+        # O ffmpeg redimensiona; -2 mantém a proporção com largura par (exigência do yuv420p)
+        params += ["-vf", f"scale=-2:{variante['altura']}"]
+    temp = f"{caminho_saida}.tmp{os.path.splitext(caminho_saida)[1]}"
+    writer = FFMPEG_VideoWriter(temp, (largura, altura), meta["fps"], codec="libx264",
+                                preset=perfil["preset"], threads=threads, ffmpeg_params=params)
+    try:
+        with open(caminho_frames, "rb") as frames:
+            for a, b, peso in tempo:
+                frames.seek(a * tamanho)
+                frames.readinto(frame_a)
+                if peso:
+                    frames.seek(b * tamanho)
+                    frames.readinto(frame_b)
+                    writer.write_frame((frame_a * (1.0 - peso) + frame_b * peso).astype(np.uint8))
+                else:
+                    writer.write_frame(frame_a)
+    finally:
+        writer.close()
+    # O arquivo final só aparece completo (um encode interrompido não sobrescreve o anterior)
+    os.replace(temp, caminho_saida)
+    return caminho_saida, len(tempo), time.perf_counter() - inicio
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera vídeos ping-pong (ida + volta) para o fundo do frontend.")
+    parser.add_argument("video", nargs="?", default=VIDEO_PADRAO, help="vídeo de entrada (padrão: video_pronto.mp4)")
+    parser.add_argument("--variant", action="append", dest="variantes",
+                        metavar="ALTURA[:CURVA[:PERFIL]][=ARQUIVO]",
+                        help=f"variante a renderizar; pode repetir (padrão: {' '.join(VARIANTES_PADRAO)})")
+    parser.add_argument("--transicao", type=float, default=TRANSICAO, help="crossfade na virada, em segundos")
+    parser.add_argument("--output-dir", default=None, help="diretório de saída (padrão: o do vídeo)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="mantém o buffer de frames aqui e o reaproveita (padrão: temporário, apagado no fim)")
+    parser.add_argument("--workers", type=int, default=None, help="variantes renderizadas em paralelo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isfile(args.video):
+        sys.exit(f"Vídeo não encontrado: {args.video}")
+    variantes = [parse_variante(spec) for spec in args.variantes or VARIANTES_PADRAO]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="pingpong-")
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        meta = decodificar(args.video, cache_dir)
+        n = meta["frames"]
+        if meta["decode_s"]:
+            print(f"Decodificados {n} frames em {meta['decode_s']:.1f} s ({n / meta['decode_s']:.0f} frames/s)")
+        else:
+            print(f"Buffer reaproveitado: {n} frames de {cache_dir}")
+
+        # Cada processo tem um ffmpeg; as threads do encoder são divididas entre eles
+        cpus = os.cpu_count() or 1
+        workers = max(1, min(args.workers or cpus, len(variantes)))
+        threads = max(1, cpus // workers)
+        tarefas = [(os.path.join(cache_dir, "frames.rgb"), meta, variante, args.transicao,
+                    nome_saida(args.video, variante, args.output_dir), threads) for variante in variantes]
+        inicio = time.perf_counter()
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                resultados = list(pool.map(renderizar, tarefas))
+        else:
+            resultados = [renderizar(tarefa) for tarefa in tarefas]
+        total_s = time.perf_counter() - inicio
+    finally:
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
 
-# Concatena normal + reverso, com sobreposição suave
-pingpong = concatenate_videoclips(
-    [clip.crossfadeout(transicao), clip_invertido.crossfadein(transicao)],
-    method="compose"
-)
+    for caminho_saida, frames, segundos in resultados:
+        print(f"Ping-pong gerado em: {caminho_saida} ({frames} frames, {frames / segundos:.0f} frames/s)")
+    total_frames = sum(frames for _, frames, _ in resultados)
+    print(f"Total: {len(resultados)} variantes, {total_frames} frames em {total_s:.1f} s "
+          f"({total_frames / total_s:.0f} frames/s, {workers} em paralelo)")
+    return 0
 
-# Exporta o vídeo final sem áudio (ideal para background)
-pingpong.write_videofile(caminho_saida, codec="libx264", audio=False, preset="medium", threads=4)
 
-print(f"Ping-pong gerado em: {caminho_saida}")
+if __name__ == "__main__":
+    sys.exit(main())
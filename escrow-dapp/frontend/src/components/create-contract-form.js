@@ -469,6 +469,10 @@ class CreateContractForm {
             console.log('⏳ Aguardando confirmação do deploy...');
             await contract.deployed();
             
+            // Registrar no índice do backend a partir do bloco do deploy
+            const deployReceipt = await contract.deployTransaction.wait();
+            window.realContractService?.indexContract(contract.address, deployReceipt.blockNumber);
+            
             console.log('✅ Contrato deployado com sucesso!');
             console.log('📍 Endereço do contrato deployado:', contract.address);
             console.log('💰 Valor do contrato deployado:', formData.amount, 'USDC');
@@ -31,8 +31,18 @@ class AIChatService {
             console.warn('⚠️ Chat AI não disponível. Configure window.AI_BACKEND_URL ou hospede o backend.');
         }
         
-        // Histórico de mensagens para contexto
+        // Histórico de mensagens para contexto (cópia local; o backend guarda a sessão)
         this.messages = [];
+        this.sessionId = null;
+        // Respostas de erro às tool_calls que sobraram no limite de rodadas; vão ao backend
+        // junto com a próxima mensagem (a sessão não pode ter tool_calls sem resposta)
+        this.pendingToolResults = [];
+
+        // Máximo de rodadas de tools do navegador por mensagem
+        this.maxToolRounds = 5;
+
+        // Corpos de requisição acima disto vão comprimidos com gzip
+        this.compressMinBytes = 4096;
         
         // Estado
         this.isProcessing = false;
@@ -65,35 +75,21 @@ class AIChatService {
 
         try {
             // Adicionar mensagem do usuário ao histórico
-            this.messages.push({
+            const userEntry = {
                 role: 'user',
                 content: userMessage
-            });
-
-            // Chamar backend
-            const response = await fetch(`${this.backendUrl}/chat`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ messages: this.messages })
-            });
-
-            if (!response.ok) {
-                throw new Error(`Erro ${response.status}: ${response.statusText}`);
-            }
-
-            const data = await response.json();
-
-            if (data.error) {
-                throw new Error(data.error.message);
-            }
+            };
+            this.messages.push(userEntry);
 
-            // Processar resposta do GPT
-            const assistantMessage = data.choices[0].message;
-            this.messages.push(assistantMessage);
+            // Chamar backend (só a mensagem nova; o histórico fica na sessão)
+            let data = await this.postChat([...this.pendingToolResults, userEntry]);
+            this.pendingToolResults = [];
 
-            // Executar tool calls se existirem
+            // Executar tool calls enquanto o GPT pedir ações do navegador
             const actions = [];
-            if (assistantMessage.tool_calls) {
+            let assistantMessage = data.choices[0].message;
+            for (let round = 0; assistantMessage.tool_calls && round < this.maxToolRounds; round++) {
+                const toolResults = [];
                 for (const toolCall of assistantMessage.tool_calls) {
                     const result = await this.executeToolCall(toolCall);
                     actions.push({
@@ -102,26 +98,30 @@ class AIChatService {
                     });
 
                     // Adicionar resultado ao histórico
-                    this.messages.push({
+                    const toolEntry = {
                         role: 'tool',
                         tool_call_id: toolCall.id,
                         content: result
-                    });
+                    };
+                    this.messages.push(toolEntry);
+                    toolResults.push(toolEntry);
                 }
 
                 // Se houve tool calls, buscar resposta final
-                const followUpResponse = await fetch(`${this.backendUrl}/chat`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ messages: this.messages })
-                });
+                data = await this.postChat(toolResults);
+                assistantMessage = data.choices[0].message;
+            }
 
-                const followUpData = await followUpResponse.json();
-                if (followUpData.choices && followUpData.choices[0].message.content) {
-                    const finalMessage = followUpData.choices[0].message;
-                    this.messages.push(finalMessage);
-                    return { text: finalMessage.content, actions };
-                }
+            // Limite de rodadas: as tool_calls restantes já estão na sessão e recebem um erro
+            // (enviado com a próxima mensagem), senão a OpenAI recusaria o histórico com 400
+            for (const toolCall of assistantMessage.tool_calls || []) {
+                const toolEntry = {
+                    role: 'tool',
+                    tool_call_id: toolCall.id,
+                    content: 'Não executado: limite de ações por mensagem atingido.'
+                };
+                this.messages.push(toolEntry);
+                this.pendingToolResults.push(toolEntry);
             }
 
             return { 
@@ -149,6 +149,116 @@ class AIChatService {
         }
     }
 
+    /**
+     * Comprime com gzip corpos grandes (ex.: histórico reenviado após a sessão expirar)
+     * quando o navegador tem CompressionStream; senão envia o JSON como está.
+     * @param {string} json - Corpo JSON
+     * @param {Object} headers - Headers da requisição (recebe Content-Encoding)
+     * @returns {Promise<string|Blob>}
+     */
+    async encodeBody(json, headers) {
+        if (json.length < this.compressMinBytes || typeof CompressionStream === 'undefined') {
+            return json;
+        }
+        const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+        headers['Content-Encoding'] = 'gzip';
+        return new Response(stream).blob();
+    }
+
+    /**
+     * Cria uma sessão de conversa no backend
+     */
+    async createSession() {
+        const response = await fetch(`${this.backendUrl}/sessions`, { method: 'POST' });
+        if (!response.ok) {
+            throw new Error(`Erro ${response.status}: ${response.statusText}`);
+        }
+        this.sessionId = (await response.json()).session_id;
+    }
+
+    /**
+     * Envia mensagens novas para a sessão e registra a resposta no histórico local.
+     * Se a sessão expirou no servidor, cria outra e reenvia o histórico completo.
+     * @param {Array} newMessages - Mensagens ainda não enviadas (já incluídas em this.messages)
+     * @returns {Promise<Object>} - Resposta no formato de /chat
+     */
+    async postChat(newMessages) {
+        const send = async (messages) => {
+            // Resposta enxuta: só message/usage/server_messages (ver payloads.py)
+            const headers = { 'Content-Type': 'application/json', 'Prefer': 'return=minimal' };
+            // Carteira conectada: o backend aplica o limite de requisições também por carteira
+            if (window.walletService?.isConnected && window.walletService.account) {
+                headers['X-Wallet-Address'] = window.walletService.account;
+            }
+            const body = await this.encodeBody(
+                JSON.stringify({ messages, client_state: this.getClientState() }),
+                headers
+            );
+            return fetch(`${this.backendUrl}/sessions/${this.sessionId}/chat`, { method: 'POST', headers, body });
+        };
+
+        if (!this.sessionId) {
+            await this.createSession();
+            newMessages = this.messages;
+        }
+
+        let response = await send(newMessages);
+        if (response.status === 404) {
+            await this.createSession();
+            response = await send(this.messages);
+        }
+
+        // Limite por cliente ou servidor ocupado: não reenviar antes do Retry-After
+        if (response.status === 429) {
+            const retryAfter = response.headers.get('Retry-After') || '1';
+            throw new Error(`Muitas requisições, tente novamente em ${retryAfter} s`);
+        }
+
+        if (!response.ok) {
+            throw new Error(`Erro ${response.status}: ${response.statusText}`);
+        }
+
+        const data = await response.json();
+
+        if (data.error) {
+            throw new Error(data.error.message);
+        }
+
+        // Tools de leitura já resolvidas no backend
+        if (data.server_messages) {
+            this.messages.push(...data.server_messages);
+        }
+        this.messages.push(data.choices[0].message);
+
+        return data;
+    }
+
+    /**
+     * Snapshot do estado da interface enviado ao backend, que resolve
+     * get_current_page, get_form_fields, get_milestones, get_wallet_status e
+     * list_my_contracts sem devolver as tool_calls ao navegador.
+     * @returns {Object}
+     */
+    getClientState() {
+        const milestones = window.createContractForm && window.createContractForm.milestones
+            ? window.createContractForm.milestones.map(m => ({ percentage: m.percentage }))
+            : this.getMilestonesInfo().milestones.map(m => ({ percentage: m.percentage }));
+
+        return {
+            page: window.navigationService ? window.navigationService.currentPage : null,
+            form: {
+                payeeAddress: document.getElementById('payeeAddress')?.value || '',
+                amount: document.getElementById('amount')?.value || '',
+                duration: document.getElementById('duration')?.value || ''
+            },
+            milestones,
+            wallet: {
+                connected: !!(window.walletService && window.walletService.isConnected),
+                address: window.walletService ? window.walletService.account || null : null
+            }
+        };
+    }
+
     /**
      * Executa uma tool call retornada pelo GPT
      * @param {Object} toolCall - Objeto com name e arguments
@@ -194,6 +304,9 @@ class AIChatService {
             case 'get_wallet_status':
                 return this.getWalletStatus();
 
+            case 'list_my_contracts':
+                return await this.listMyContracts();
+
             default:
                 return `Função ${funcName} não implementada.`;
         }
@@ -541,11 +654,48 @@ class AIChatService {
         }
     }
 
+    /**
+     * Lista os contratos da carteira pelo índice do backend
+     * (normalmente resolvida no servidor com o client_state)
+     */
+    async listMyContracts() {
+        const account = window.walletService?.account;
+        if (!window.walletService?.isConnected || !account) {
+            return '❌ Carteira não conectada. Use "conectar carteira" para ver seus contratos.';
+        }
+
+        try {
+            const response = await fetch(`${this.backendUrl}/contracts?participant=${account}&limit=10`);
+            const data = await response.json();
+            if (!response.ok) {
+                return `Não foi possível consultar seus contratos: ${data.error?.message}`;
+            }
+            if (data.contracts.length === 0) {
+                return 'Nenhum contrato encontrado para a sua carteira no Deal-Fi.';
+            }
+            const lines = data.contracts.map((c, i) => {
+                const role = c.payer.toLowerCase() === account.toLowerCase() ? 'pagador' : 'recebedor';
+                const released = c.milestoneInfo.filter(m => m.released).length;
+                const deadline = new Date(c.deadline * 1000).toLocaleDateString('pt-BR', { timeZone: 'UTC' });
+                return `${i + 1}. ${c.address.substring(0, 6)}...${c.address.substring(38)} — você é ${role}, ` +
+                    `${c.amount} USDC, ${c.statusLabel}, marcos ${released}/${c.totalMilestones}, prazo ${deadline}`;
+            });
+            return `📄 Seus contratos:\n${lines.join('\n')}`;
+        } catch (error) {
+            return `Não foi possível consultar seus contratos: ${error.message}`;
+        }
+    }
+
     /**
      * Limpa histórico de conversa
      */
     clearHistory() {
+        if (this.sessionId) {
+            fetch(`${this.backendUrl}/sessions/${this.sessionId}`, { method: 'DELETE' }).catch(() => {});
+        }
         this.messages = [];
+        this.sessionId = null;
+        this.pendingToolResults = [];
         console.log('🗑️ Histórico de chat limpo');
     }
 }
@@ -1,10 +1,16 @@
 /**
  * Serviço de Polling para Atualização Automática
  * Monitora mudanças no contrato na blockchain
+ *
+ * Com o backend disponível, recebe as mudanças por SSE (/contracts/<endereço>/events):
+ * um snapshot ao conectar e depois só os campos alterados a cada bloco com eventos.
+ * Sem backend (ou sem EventSource), volta ao polling a cada 5 segundos.
  */
 class ContractPollingService {
     constructor() {
         this.pollingInterval = null;
+        this.eventSource = null;
+        this.streamState = null; // estado recebido pelo SSE (deadline em segundos)
         this.pollingFrequency = 5000; // 5 segundos
         this.isPolling = false;
         this.lastState = null;
@@ -21,13 +27,24 @@ class ContractPollingService {
             return;
         }
         
-        console.log('🔄 Iniciando polling de atualizações (a cada 5 segundos)...');
         this.isPolling = true;
         this.consecutiveErrors = 0;
         
         // Mostrar indicador visual
         this.showPollingIndicator();
         
+        // Eventos empurrados pelo backend, quando disponível
+        if (!this.subscribeToEvents()) {
+            this.startIntervalPolling();
+        }
+    }
+    
+    /**
+     * Polling periódico (sem backend de eventos)
+     */
+    startIntervalPolling() {
+        console.log('🔄 Iniciando polling de atualizações (a cada 5 segundos)...');
+        
         // Primeira verificação imediata
         this.checkForUpdates();
         
@@ -41,9 +58,10 @@ class ContractPollingService {
      * Para o polling
      */
     stopPolling() {
-        if (this.pollingInterval) {
+        if (this.pollingInterval || this.eventSource) {
             clearInterval(this.pollingInterval);
             this.pollingInterval = null;
+            this.closeEventSource();
             this.isPolling = false;
             
             // Remover indicador visual
@@ -69,24 +87,9 @@ class ContractPollingService {
             }
             
             // Obter dados atuais do contrato
-            const contractData = await window.realContractService.getContractDetails();
+            const contractData = await this.fetchContractDetails();
             
-            // Criar hash do estado para comparação
-            const currentStateHash = this.createStateHash(contractData);
-            
-            // Comparar com último estado
-            if (this.lastState && this.lastState !== currentStateHash) {
-                console.log('🔔 Mudança detectada no contrato! Atualizando interface...');
-                
-                // Atualizar interface
-                await this.updateInterface(contractData);
-                
-                // Mostrar notificação
-                this.showUpdateNotification();
-            }
-            
-            // Salvar estado atual
-            this.lastState = currentStateHash;
+            await this.applyContractData(contractData);
             
             // Resetar contador de erros
             this.consecutiveErrors = 0;
@@ -103,6 +106,124 @@ class ContractPollingService {
         }
     }
     
+    /**
+     * Compara o estado com o último conhecido e atualiza a interface se mudou
+     */
+    async applyContractData(contractData) {
+        // Criar hash do estado para comparação
+        const currentStateHash = this.createStateHash(contractData);
+        
+        // Comparar com último estado
+        if (this.lastState && this.lastState !== currentStateHash) {
+            console.log('🔔 Mudança detectada no contrato! Atualizando interface...');
+            
+            // Atualizar interface
+            await this.updateInterface(contractData);
+            
+            // Mostrar notificação
+            this.showUpdateNotification();
+        }
+        
+        // Salvar estado atual
+        this.lastState = currentStateHash;
+    }
+    
+    /**
+     * Assina os eventos do contrato no backend (SSE).
+     * Retorna false se não houver backend/contrato/EventSource (usa o polling).
+     * O navegador reconecta sozinho e manda Last-Event-ID: o backend reenvia
+     * os eventos perdidos e um snapshot novo.
+     */
+    subscribeToEvents() {
+        const backendUrl = window.aiChatService?.backendUrl;
+        const address = window.realContractService?.contractAddress;
+        if (!backendUrl || !address || typeof EventSource === 'undefined') {
+            return false;
+        }
+        
+        console.log('📡 Recebendo atualizações do contrato por eventos (SSE)...');
+        const source = new EventSource(`${backendUrl}/contracts/${address}/events`);
+        this.eventSource = source;
+        
+        source.addEventListener('snapshot', (event) => {
+            const data = JSON.parse(event.data);
+            this.streamState = data.state;
+            this.consecutiveErrors = 0;
+            this.applyStreamState();
+        });
+        
+        source.addEventListener('update', (event) => {
+            const data = JSON.parse(event.data);
+            if (!this.streamState) {
+                return;
+            }
+            data.events.forEach(e => console.log(`⛓️ Evento ${e.event} no bloco ${e.block}`, e.args));
+            this.streamState = { ...this.streamState, ...data.changes };
+            this.applyStreamState();
+        });
+        
+        source.addEventListener('events', (event) => {
+            const data = JSON.parse(event.data);
+            console.log(`⛓️ ${data.events.length} evento(s) perdido(s) durante a reconexão`);
+        });
+        
+        source.onerror = () => {
+            // CLOSED: resposta de erro (endereço inválido, sem contrato...) → polling
+            if (source.readyState === EventSource.CLOSED && this.eventSource === source) {
+                console.warn('⚠️ Eventos do backend indisponíveis, voltando ao polling');
+                this.closeEventSource();
+                this.startIntervalPolling();
+            }
+        };
+        
+        return true;
+    }
+    
+    /**
+     * Aplica o estado recebido pelo SSE (mesmas condições do polling)
+     */
+    async applyStreamState() {
+        if (!window.realContractService?.contract ||
+            window.navigationService?.currentPage !== 'manage' ||
+            !window.walletService?.isConnected) {
+            return;
+        }
+        const state = this.streamState;
+        await this.applyContractData({ ...state, deadline: new Date(state.deadline * 1000) });
+    }
+    
+    closeEventSource() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.streamState = null;
+    }
+    
+    /**
+     * Estado do contrato pelo backend (uma leitura em lote por bloco, compartilhada
+     * entre todas as abas; o ETag evita baixar o mesmo estado de novo).
+     * Sem backend disponível, lê direto da blockchain.
+     */
+    async fetchContractDetails() {
+        const backendUrl = window.aiChatService?.backendUrl;
+        const address = window.realContractService.contractAddress;
+
+        if (backendUrl && address) {
+            try {
+                const response = await fetch(`${backendUrl}/contracts/${address}/state`);
+                if (response.ok) {
+                    const data = await response.json();
+                    return { ...data, deadline: new Date(data.deadline * 1000) };
+                }
+            } catch (error) {
+                console.warn('⚠️ Estado pelo backend indisponível, lendo da blockchain:', error.message);
+            }
+        }
+
+        return window.realContractService.getContractDetails();
+    }
+
     /**
      * Cria hash do estado para comparação
      */
@@ -189,6 +310,16 @@ class ContractPollingService {
     resetState() {
         this.lastState = null;
         this.consecutiveErrors = 0;
+        
+        // O stream é de um endereço: reassinar quando o novo contrato estiver ativo
+        if (this.eventSource) {
+            this.closeEventSource();
+            setTimeout(() => {
+                if (this.isPolling && !this.eventSource && !this.pollingInterval && !this.subscribeToEvents()) {
+                    this.startIntervalPolling();
+                }
+            }, 1000);
+        }
         console.log('🔄 Estado do polling resetado');
     }
     
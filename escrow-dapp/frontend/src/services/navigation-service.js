@@ -1885,15 +1885,16 @@ class NavigationService {
             const balance = await provider.getBalance(contractAddress);
             console.log('💰 Saldo do contrato:', ethers.utils.formatEther(balance), 'POL');
             
-            // Buscar ABI do PolygonScan
-            console.log('🔍 Buscando ABI do PolygonScan...');
+            // Buscar ABI no registro do backend (ABIs do repositório; cache do navegador)
+            console.log('🔍 Buscando ABI no registro do backend...');
             try {
-                const abiResponse = await fetch(`https://api.polygonscan.com/api?module=contract&action=getabi&address=${contractAddress}`);
-                const abiData = await abiResponse.json();
+                const backendUrl = window.aiChatService?.backendUrl;
+                const abiResponse = backendUrl ? await fetch(`${backendUrl}/contracts/${contractAddress}/abi`) : null;
                 
-                if (abiData.status === '1') {
-                    const realABI = JSON.parse(abiData.result);
-                    console.log('✅ ABI encontrado no PolygonScan:', realABI);
+                if (abiResponse?.ok) {
+                    const abiData = await abiResponse.json();
+                    const realABI = abiData.abi;
+                    console.log(`✅ ABI encontrado no registro (${abiData.name}, ${abiData.match}):`, realABI);
                     
                     // Usar o ABI real
                     const contract = new ethers.Contract(contractAddress, realABI, signer);
@@ -1905,13 +1906,14 @@ class NavigationService {
                     const functions = realABI.filter(item => item.type === 'function');
                     console.log('📋 Funções disponíveis:', functions.map(f => f.name));
                     
-                    alert(`✅ ABI encontrado no PolygonScan!\n\n` +
+                    alert(`✅ ABI encontrado no registro!\n\n` +
+                          `Contrato: ${abiData.name}\n` +
                           `Funções disponíveis: ${functions.map(f => f.name).join(', ')}\n\n` +
                           `Veja o console para detalhes`);
                     
                     return true;
                 } else {
-                    console.log('❌ ABI não encontrado no PolygonScan:', abiData.message);
+                    console.log('❌ ABI não encontrado no registro:', abiResponse?.status);
                 }
             } catch (e) {
                 console.log('❌ Erro ao buscar ABI:', e.message);
@@ -261,6 +261,7 @@ class RealContractService {
                 
                 console.log('✅ [setActiveContract] Contrato ativo atualizado para:', this.contractAddress);
                 console.log('✅ [setActiveContract] Objeto do contrato:', this.contract.address);
+                this.indexContract(this.contractAddress);
                 return true;
             } else {
                 console.log('⚠️ Contrato não encontrado ou usuário não envolvido');
@@ -397,6 +398,41 @@ class RealContractService {
         }
     }
 
+    // Registra o contrato no índice do backend (listagem sem varrer a blockchain)
+    indexContract(address, fromBlock = null) {
+        const backendUrl = window.aiChatService?.backendUrl;
+        if (!backendUrl || !address) {
+            return;
+        }
+        fetch(`${backendUrl}/contracts/index`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ address, from_block: fromBlock })
+        }).catch(error => console.warn('⚠️ Não foi possível registrar o contrato no índice:', error.message));
+    }
+
+    // Contratos da carteira pelo índice do backend (null se indisponível)
+    async fetchIndexedContracts() {
+        const backendUrl = window.aiChatService?.backendUrl;
+        const account = window.walletService?.account;
+        if (!backendUrl || !account) {
+            return null;
+        }
+        try {
+            const response = await fetch(`${backendUrl}/contracts?participant=${account}&limit=100`);
+            if (!response.ok) {
+                return null;
+            }
+            const data = await response.json();
+            return data.contracts.map((item, i) => this.toContractData(
+                { ...item, deadline: new Date(item.deadline * 1000) }, i + 1, item.address
+            ));
+        } catch (error) {
+            console.warn('⚠️ Índice de contratos indisponível:', error.message);
+            return null;
+        }
+    }
+
     // Buscar contratos reais da blockchain
     async fetchRealContracts() {
         if (!this.contract) {
@@ -406,38 +442,21 @@ class RealContractService {
 
         try {
             console.log('🔍 Buscando dados do contrato real...');
-            
-            // Usar getContractDetails() que funciona com o novo contrato
-            const details = await this.getContractDetails();
-            console.log('📊 Dados do contrato carregados:', details);
 
-            // Criar objeto do contrato compatível com a interface
-            const contractData = {
-                id: 1,
-                address: this.contractAddress,
-                title: "Contrato Escrow Real",
-                payer: details.payer,
-                payee: details.payee,
-                amount: parseFloat(details.amount),
-                status: details.deposited ? "active" : "inactive",
-                totalMilestones: details.totalMilestones,
-                remainingAmount: parseFloat(details.balance),
-                deadline: details.deadline.toISOString().split('T')[0],
-                paused: false,
-                token: details.token,
-                milestones: details.milestoneInfo.map((m, i) => ({
-                    id: i + 1,
-                    description: `Marco ${i + 1}`,
-                    percentage: m.percentage,
-                    completed: m.released,
-                    amount: parseFloat(m.amount)
-                })),
-                platformFeePaid: details.platformFeePaid,
-                confirmedPayer: details.confirmedPayer,
-                confirmedPayee: details.confirmedPayee
-            };
+            // O contrato ativo é lido direto da rede (o índice pode estar alguns blocos atrás);
+            // o índice do backend traz só os outros contratos da carteira, numa consulta
+            const [details, indexed] = await Promise.all([
+                this.getContractDetails(),
+                this.fetchIndexedContracts()
+            ]);
+            console.log('📊 Dados do contrato carregados:', details);
 
-            this.contracts = [contractData];
+            const active = this.contractAddress.toLowerCase();
+            const others = (indexed || []).filter(c => c.address.toLowerCase() !== active);
+            this.contracts = [
+                this.toContractData(details, 1, this.contractAddress),
+                ...others.map((c, i) => ({ ...c, id: i + 2 }))
+            ];
             console.log('✅ Contratos carregados:', this.contracts);
             return this.contracts;
 
@@ -447,6 +466,34 @@ class RealContractService {
         }
     }
 
+    // Criar objeto do contrato compatível com a interface
+    toContractData(details, id, address) {
+        return {
+            id,
+            address,
+            title: "Contrato Escrow Real",
+            payer: details.payer,
+            payee: details.payee,
+            amount: parseFloat(details.amount),
+            status: details.deposited ? "active" : "inactive",
+            totalMilestones: details.totalMilestones,
+            remainingAmount: parseFloat(details.balance),
+            deadline: details.deadline.toISOString().split('T')[0],
+            paused: false,
+            token: details.token,
+            milestones: details.milestoneInfo.map((m, i) => ({
+                id: i + 1,
+                description: `Marco ${i + 1}`,
+                percentage: m.percentage,
+                completed: m.released,
+                amount: parseFloat(m.amount)
+            })),
+            platformFeePaid: details.platformFeePaid,
+            confirmedPayer: details.confirmedPayer,
+            confirmedPayee: details.confirmedPayee
+        };
+    }
+
     // Liberar marco
     async releaseMilestone(milestoneIndex) {
         if (!this.contract) {
@@ -1,46 +1,216 @@
+"""
+Find emojis in the source files of the repository.
+
+Used as a pre-deploy gate over the whole monorepo, so it is built to be re-run:
+- files are scanned in parallel by a process pool and streamed in chunks
+  (large files never sit fully in memory); the pattern is compiled once;
+- a manifest (mtime/size/sha256 + emojis found) is kept next to the scan root,
+  so a re-run only reads files whose mtime or size changed;
+- only source/text extensions are read; directories such as .git and
+  node_modules are not walked, and media (videos, PNGs) is never opened.
+
+Usage:
+    python find_mojis.py                     # scan the directory of this script
+    python find_mojis.py escrow-dapp --json  # JSON report
+    python find_mojis.py --check             # exit code 1 if any emoji is found
+"""
+
+import argparse
+import codecs
+import hashlib
+import json
 import os
 import re
-
-# Define the directory to scan
-dir_path = r'C:\Users\david\OneDrive\Documentos\02_Python Scripts\Deal-Fi\escrow-dapp'
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Define common programming file extensions
-extensions = (
+EXTENSIONS = (
     '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.htm', '.css', '.scss', '.less',
     '.json', '.yaml', '.yml', '.xml', '.md', '.rst', '.txt', '.sol', '.java', '.kt',
     '.cpp', '.c', '.h', '.cs', '.go', '.rs', '.php', '.rb', '.sh', '.bat'
 )
 
-# Simplified emoji regex pattern - covers most common emojis
-emoji_pattern = r'[\U0001F600-\U0001F64F]|[\U0001F300-\U0001F5FF]|[\U0001F680-\U0001F6FF]|[\U0001F1E0-\U0001F1FF]|[\U00002600-\U000026FF]|[\U00002700-\U000027BF]'
-
-# Dictionary to store found emojis per file
-found_emojis = {}
-
-# Walk through the directory recursively
-for root, dirs, files in os.walk(dir_path):
-    for file in files:
-        if file.lower().endswith(extensions):
-            full_path = os.path.join(root, file)
-            try:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                emojis = re.findall(emoji_pattern, content)
-                if emojis:
-                    found_emojis[full_path] = set(emojis)  # Unique emojis per file
-            except (UnicodeDecodeError, IOError):
-                pass  # Skip files that can't be read as UTF-8 or other IO errors
-
-# Output the results
-if found_emojis:
-    for path, emjs in found_emojis.items():
-        print(f"In {path}: {', '.join(emjs)}")
-    
-    # All unique emojis across all files
-    all_unique = set()
-    for emjs in found_emojis.values():
-        all_unique.update(emjs)
-    print("\nAll unique emojis found:")
-    print(', '.join(all_unique))
-else:
-    print("No emojis found in any programming files.")
\ No newline at end of file
+# Directories that are never walked (dependencies, VCS data, caches, build output)
+SKIP_DIRS = {
+    '.git', 'node_modules', '__pycache__', '.venv', 'venv', '.pytest_cache',
+    '.mypy_cache', '.ruff_cache', '.tox', '.nox', 'dist', 'build',
+}
+
+# Simplified emoji pattern - covers most common emojis (one character class, compiled once)
+EMOJI_RANGES = (
+    '\U0001F600-\U0001F64F'  # emoticons
+    '\U0001F300-\U0001F5FF'  # symbols & pictographs
+    '\U0001F680-\U0001F6FF'  # transport & map
+    '\U0001F1E0-\U0001F1FF'  # flags
+    '\U00002600-\U000026FF'  # misc symbols
+    '\U00002700-\U000027BF'  # dingbats
+)
+EMOJI_RE = re.compile(f'[{EMOJI_RANGES}]')
+
+MANIFEST_NAME = '.mojis-manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1 << 20  # bytes read per step
+# Below this many files a process pool costs more than it saves
+POOL_MIN_FILES = 32
+
+
+def iter_files(root, extensions=EXTENSIONS):
+    """Yield (relative path, os.stat_result) of the source files under root, sorted."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    subdirs.append(entry.path)
+            elif (entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(extensions)
+                  and not entry.name.startswith(MANIFEST_NAME)):
+                yield os.path.relpath(entry.path, root).replace(os.sep, '/'), entry.stat()
+        stack.extend(reversed(subdirs))
+
+
+def scan_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Stream one file: return {"sha256", "emojis": {emoji: count}}, or
+    {"error": ...} if it cannot be read as UTF-8.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    counts = {}
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                digest.update(chunk)
+                # Each emoji is a single code point, so no match spans two chunks
+                text = decoder.decode(chunk, final=not chunk)
+                for emoji in EMOJI_RE.findall(text):
+                    counts[emoji] = counts.get(emoji, 0) + 1
+                if not chunk:
+                    break
+    except (UnicodeDecodeError, OSError) as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    return {'sha256': digest.hexdigest(), 'emojis': counts}
+
+
+def _scan_entry(args):
+    root, relative = args
+    return relative, scan_file(os.path.join(root, relative))
+
+
+def load_manifest(path):
+    """Manifest entries from a previous run ({} if missing, unreadable or made with another pattern)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('pattern') != EMOJI_RE.pattern:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(path, files):
+    """Write the manifest through a temp file + rename (a crash never leaves it half-written)."""
+    temp = f'{path}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'pattern': EMOJI_RE.pattern, 'files': files},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp, path)
+
+
+def scan(root, workers=None, manifest_path=None):
+    """
+    Scan root and return the report. Files whose mtime and size match the
+    manifest are not read again; the manifest is rewritten with the results.
+    """
+    started = time.perf_counter()
+    previous = load_manifest(manifest_path) if manifest_path else {}
+    files, pending = {}, []
+    for relative, stat in iter_files(root):
+        entry = previous.get(relative)
+        if entry and entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+            files[relative] = entry
+        else:
+            files[relative] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+            pending.append(relative)
+
+    workers = workers or os.cpu_count() or 1
+    tasks = [(root, relative) for relative in pending]
+    if workers > 1 and len(tasks) >= POOL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_scan_entry, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_scan_entry(task) for task in tasks]
+    for relative, result in results:
+        files[relative].update(result)
+
+    if manifest_path:
+        save_manifest(manifest_path, files)
+
+    found = {path: entry['emojis'] for path, entry in files.items() if entry.get('emojis')}
+    totals = {}
+    for counts in found.values():
+        for emoji, count in counts.items():
+            totals[emoji] = totals.get(emoji, 0) + count
+    return {
+        'root': os.path.abspath(root),
+        'files': len(files),
+        'scanned': len(pending),
+        'cached': len(files) - len(pending),
+        'bytes_scanned': sum(files[path]['size'] for path in pending),
+        'unreadable': sorted(path for path, entry in files.items() if 'error' in entry),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'found': found,
+        'emojis': totals,
+    }
+
+
+def print_report(report):
+    # Output the results
+    if report['found']:
+        for path, counts in report['found'].items():
+            print(f"In {path}: {', '.join(counts)}")
+        print("\nAll unique emojis found:")
+        print(', '.join(report['emojis']))
+    else:
+        print("No emojis found in any programming files.")
+    print(f"\n{report['files']} files ({report['scanned']} scanned, {report['cached']} unchanged) "
+          f"in {report['elapsed_ms']:.0f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Find emojis in the source files of the repository.')
+    parser.add_argument('path', nargs='?', default=os.path.dirname(os.path.abspath(__file__)),
+                        help='directory to scan (default: the directory of this script)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--manifest', default=None,
+                        help=f'manifest file (default: <path>/{MANIFEST_NAME})')
+    parser.add_argument('--no-manifest', action='store_true', help='scan every file and do not write a manifest')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--check', action='store_true', help='exit with code 1 if any emoji is found')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isdir(args.path):
+        sys.exit(f"Not a directory: {args.path}")
+    manifest = None if args.no_manifest else (args.manifest or os.path.join(args.path, MANIFEST_NAME))
+    report = scan(args.path, workers=args.workers, manifest_path=manifest)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 1 if args.check and report['found'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
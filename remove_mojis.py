@@ -1,70 +1,424 @@
+"""
+Remove emojis from the source files of the repository.
+
+Shares the file walk and the manifest of find_mojis: files that the manifest
+knows to be unchanged and emoji-free are not opened. Every other file is scanned
+and cleaned in a single streaming pass:
+- chunks are decoded and cleaned with EMOJI_RE.subn; once an emoji shows up the
+  output goes to a temp file in the same directory, which then replaces the
+  original with an atomic rename (a crash never leaves a half-written file);
+  line endings and mode are kept;
+- files are processed in parallel by a process pool;
+- the original bytes go, in the same pass, to a content-addressed backup store
+  (<backup-dir>/objects/<sha256>.gz, written once per distinct content) and each
+  run records path -> sha256 in <backup-dir>/runs/<timestamp>.json for --restore.
+
+Usage:
+    python remove_mojis.py                      # clean the directory of this script
+    python remove_mojis.py escrow-dapp --dry-run
+    python remove_mojis.py --restore ../emoji_removal_backups/runs/20250101_120000.json
+    python remove_mojis.py --benchmark          # MB/s: old two-pass + copy2 vs this engine
+"""
+
+import argparse
+import codecs
+import difflib
+import gzip
+import hashlib
+import json
 import os
 import re
 import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-# Define the directory to scan
-dir_path = r'C:\Users\david\OneDrive\Documentos\02_Python Scripts\Deal-Fi\escrow-dapp'
-
-# Define common programming file extensions
-extensions = (
-    '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.htm', '.css', '.scss', '.less',
-    '.json', '.yaml', '.yml', '.xml', '.md', '.rst', '.txt', '.sol', '.java', '.kt',
-    '.cpp', '.c', '.h', '.cs', '.go', '.rs', '.php', '.rb', '.sh', '.bat'
-)
-
-# Same emoji pattern from find_mojis.py
-emoji_pattern = r'[\U0001F600-\U0001F64F]|[\U0001F300-\U0001F5FF]|[\U0001F680-\U0001F6FF]|[\U0001F1E0-\U0001F1FF]|[\U00002600-\U000026FF]|[\U00002700-\U000027BF]'
-
-# Create backup directory
-backup_dir = os.path.join(os.path.dirname(dir_path), f'backup_before_emoji_removal_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
-os.makedirs(backup_dir, exist_ok=True)
-
-print(f"Backup directory created: {backup_dir}")
-print("Starting emoji removal process...\n")
-
-files_processed = 0
-emojis_removed = 0
-
-# Walk through the directory recursively
-for root, dirs, files in os.walk(dir_path):
-    for file in files:
-        if file.lower().endswith(extensions):
-            full_path = os.path.join(root, file)
-            try:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    original_content = f.read()
-                
-                # Find emojis in the file
-                emojis_found = re.findall(emoji_pattern, original_content)
-                
-                if emojis_found:
-                    # Create backup
-                    relative_path = os.path.relpath(full_path, dir_path)
-                    backup_path = os.path.join(backup_dir, relative_path)
-                    backup_dir_path = os.path.dirname(backup_path)
-                    os.makedirs(backup_dir_path, exist_ok=True)
-                    shutil.copy2(full_path, backup_path)
-                    
-                    # Remove emojis
-                    cleaned_content = re.sub(emoji_pattern, '', original_content)
-                    
-                    # Write cleaned content back to file
-                    with open(full_path, 'w', encoding='utf-8') as f:
-                        f.write(cleaned_content)
-                    
-                    files_processed += 1
-                    emojis_removed += len(emojis_found)
-                    print(f"✅ Processed: {relative_path}")
-                    print(f"   Removed {len(emojis_found)} emojis: {', '.join(set(emojis_found))}")
-                    print()
-                    
-            except (UnicodeDecodeError, IOError) as e:
-                print(f"❌ Error processing {full_path}: {e}")
-
-print(f"\n🎯 Summary:")
-print(f"   Files processed: {files_processed}")
-print(f"   Total emojis removed: {emojis_removed}")
-print(f"   Backup location: {backup_dir}")
-print("\n✅ Emoji removal completed!")
-print("💡 You can restore files from backup if needed.")
\ No newline at end of file
+from find_mojis import CHUNK_SIZE, EMOJI_RE, MANIFEST_NAME, POOL_MIN_FILES, iter_files, load_manifest, save_manifest
+
+# One regex pass gives both the cleaned text and the emojis (they come back as separators)
+EMOJI_SPLIT_RE = re.compile(f'({EMOJI_RE.pattern})')
+# UTF-8 lead bytes of every emoji in EMOJI_RE: chunks without them skip the regex
+EMOJI_LEAD_RE = re.compile(rb'\xf0\x9f|\xe2[\x98-\x9e]')
+
+BACKUP_DIR_NAME = 'emoji_removal_backups'
+# Backups favour speed over ratio (source text still shrinks ~3-4x)
+BACKUP_COMPRESSLEVEL = 1
+
+
+class _BackupWriter:
+    """Streams the original bytes into the backup store; commit() files them under their sha256."""
+
+    def __init__(self, backup_dir):
+        self.objects = os.path.join(backup_dir, 'objects')
+        os.makedirs(self.objects, exist_ok=True)
+        fd, self.temp = tempfile.mkstemp(prefix='.tmp-', dir=self.objects)
+        self._raw = os.fdopen(fd, 'wb')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=BACKUP_COMPRESSLEVEL, mtime=0)
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = None
+
+    def commit(self, sha256):
+        self._close()
+        target = object_path(os.path.dirname(self.objects), sha256)
+        if os.path.exists(target):
+            os.remove(self.temp)  # same content already backed up
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.temp, target)
+
+    def discard(self):
+        self._close()
+        if os.path.exists(self.temp):
+            os.remove(self.temp)
+
+
+def _may_have_emoji(chunk, previous):
+    # An emoji decoded with this chunk may have started in the last 3 bytes read before it
+    return bool(EMOJI_LEAD_RE.search(chunk) or EMOJI_LEAD_RE.search(previous + chunk[:1]))
+
+
+def _copy_prefix(path, raw_size, clean_size, out, backup, chunk_size):
+    """
+    Copy the bytes read before the first emoji into the outputs: all `raw_size` to the
+    backup, and the first `clean_size` (the decoder may still hold a partial character)
+    to the cleaned file. Without emojis the cleaned bytes are the original ones.
+    """
+    if not raw_size:
+        return
+    copied = 0
+    with open(path, 'rb') as src:
+        while copied < raw_size:
+            block = src.read(min(chunk_size, raw_size - copied))
+            if not block:
+                raise OSError('file changed while it was being rewritten')
+            if backup is not None:
+                backup.write(block)
+            if copied < clean_size:
+                out.write(block[:clean_size - copied])
+            copied += len(block)
+
+
+def object_path(backup_dir, sha256):
+    return os.path.join(backup_dir, 'objects', sha256[:2], f'{sha256}.gz')
+
+
+def rewrite_file(root, relative, backup_dir=None, expected_sha256=None, chunk_size=CHUNK_SIZE):
+    """
+    Scan and clean one file in a single streaming pass. The temp file and the backup
+    are only opened at the first emoji; the prefix read before it holds no emoji and is
+    copied over unchanged, so files without emojis are just read, whatever their size.
+    If the manifest already knew this content
+    (`expected_sha256`) and it is in the backup store, it is not compressed again.
+    Returns {"path", "removed", "emojis", "bytes", "original_sha256", "entry"} (entry:
+    the manifest entry of the file as it is now) or {"path", "error", "entry"}.
+    """
+    path = os.path.join(root, relative)
+    before = os.stat(path)
+    original, cleaned = hashlib.sha256(), hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    counts = {}
+    out = temp = backup = None
+    previous = b''
+    read = written = 0  # raw bytes read and cleaned bytes produced before the first emoji
+    try:
+        with open(path, 'rb') as src:
+            while True:
+                chunk = src.read(chunk_size)
+                original.update(chunk)
+                # Each emoji is a single code point, so no match spans two chunks
+                text = decoder.decode(chunk, final=not chunk)
+                if _may_have_emoji(chunk, previous):
+                    parts = EMOJI_SPLIT_RE.split(text)
+                    for emoji in parts[1::2]:
+                        counts[emoji] = counts.get(emoji, 0) + 1
+                    if len(parts) > 1:
+                        text = ''.join(parts[::2])
+                previous = (previous + chunk)[-3:]
+                data = text.encode('utf-8')
+                cleaned.update(data)
+                if out is None and counts:
+                    fd, temp = tempfile.mkstemp(prefix='.mojis-', dir=os.path.dirname(path))
+                    out = os.fdopen(fd, 'wb')
+                    if backup_dir and not (expected_sha256 and os.path.exists(object_path(backup_dir, expected_sha256))):
+                        backup = _BackupWriter(backup_dir)
+                    _copy_prefix(path, read, written, out, backup, chunk_size)
+                if out is None:
+                    read += len(chunk)
+                    written += len(data)
+                else:
+                    if backup is not None:
+                        backup.write(chunk)
+                    out.write(data)
+                if not chunk:
+                    break
+
+        sha256 = original.hexdigest()
+        result = {'path': relative, 'removed': sum(counts.values()), 'emojis': counts,
+                  'bytes': before.st_size, 'original_sha256': sha256,
+                  'entry': {'mtime_ns': before.st_mtime_ns, 'size': before.st_size, 'sha256': sha256, 'emojis': counts}}
+        if not counts:
+            return result
+
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+        after = os.stat(path)
+        if (after.st_mtime_ns, after.st_size) != (before.st_mtime_ns, before.st_size):
+            raise OSError('file changed while it was being rewritten')
+        if backup_dir and backup is None and sha256 != expected_sha256:
+            raise OSError('file changed since the last scan; run again')
+        if backup is not None:
+            backup.commit(sha256)
+            backup = None
+        shutil.copymode(path, temp)
+        os.replace(temp, path)
+        stat = os.stat(path)
+        result['entry'] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': cleaned.hexdigest(), 'emojis': {}}
+        return result
+    except (UnicodeDecodeError, OSError) as e:
+        error = f'{type(e).__name__}: {e}'
+        return {'path': relative, 'error': error,
+                'entry': {'mtime_ns': before.st_mtime_ns, 'size': before.st_size, 'error': error}}
+    finally:
+        if out is not None:
+            out.close()
+        if backup is not None:
+            backup.discard()
+        if temp and os.path.exists(temp):
+            os.remove(temp)
+
+
+def diff_file(root, relative):
+    """Dry run: the unified diff the rewrite would apply (nothing is written)."""
+    path = os.path.join(root, relative)
+    try:
+        with open(path, encoding='utf-8', newline='') as f:
+            text = f.read()
+    except (UnicodeDecodeError, OSError) as e:
+        return {'path': relative, 'error': f'{type(e).__name__}: {e}'}
+    counts = {}
+    for emoji in EMOJI_RE.findall(text):
+        counts[emoji] = counts.get(emoji, 0) + 1
+    diff = ''
+    if counts:
+        diff = ''.join(difflib.unified_diff(text.splitlines(True), EMOJI_RE.sub('', text).splitlines(True),
+                                            f'a/{relative}', f'b/{relative}'))
+    return {'path': relative, 'removed': sum(counts.values()), 'emojis': counts,
+            'bytes': len(text.encode('utf-8')), 'diff': diff}
+
+
+def _run_task(args):
+    root, relative, backup_dir, expected_sha256, dry_run = args
+    if dry_run:
+        return diff_file(root, relative)
+    return rewrite_file(root, relative, backup_dir, expected_sha256)
+
+
+def remove_emojis(root, workers=None, backup_dir=None, dry_run=False, manifest_path=None):
+    """
+    Clean (or diff) every source file under root and return the report. Files whose
+    mtime and size match a manifest entry without emojis are not read; the others
+    are scanned and rewritten in the same pass, and the manifest is updated with
+    the files as they are afterwards (dry runs leave it alone).
+    """
+    started = time.perf_counter()
+    previous = load_manifest(manifest_path) if manifest_path else {}
+    files, tasks, total = {}, [], 0
+    for relative, stat in iter_files(root):
+        total += 1
+        entry = previous.get(relative)
+        if entry and entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+            files[relative] = entry
+            if not entry.get('emojis'):
+                continue
+        tasks.append((root, relative, backup_dir, (entry or {}).get('sha256'), dry_run))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= POOL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_run_task(task) for task in tasks]
+
+    if manifest_path and not dry_run:
+        for result in results:
+            files[result['path']] = result['entry']
+        save_manifest(manifest_path, files)
+    return {
+        'root': os.path.abspath(root),
+        'files': total,
+        'read': len(tasks),
+        'bytes_read': sum(r.get('bytes', 0) for r in results),
+        'elapsed_s': time.perf_counter() - started,
+        'results': results,
+    }
+
+
+def save_run(backup_dir, root, results):
+    """Record path -> sha256 of the originals of this run (atomic write); returns its path."""
+    runs = os.path.join(backup_dir, 'runs')
+    os.makedirs(runs, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path, n = os.path.join(runs, f'{stamp}.json'), 1
+    while os.path.exists(path):
+        path, n = os.path.join(runs, f'{stamp}_{n}.json'), n + 1
+    files = {r['path']: r['original_sha256'] for r in results if r.get('removed') and 'original_sha256' in r}
+    temp = f'{path}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump({'root': os.path.abspath(root), 'files': files}, f, ensure_ascii=False, indent=1)
+    os.replace(temp, path)
+    return path
+
+
+def restore(run_path):
+    """Put back the originals recorded in a run file (each one through temp file + rename)."""
+    backup_dir = os.path.dirname(os.path.dirname(os.path.abspath(run_path)))
+    with open(run_path, encoding='utf-8') as f:
+        run = json.load(f)
+    for relative, sha256 in run['files'].items():
+        path = os.path.join(run['root'], relative)
+        fd, temp = tempfile.mkstemp(prefix='.mojis-', dir=os.path.dirname(path))
+        with gzip.open(object_path(backup_dir, sha256), 'rb') as src, os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+        if os.path.exists(path):
+            shutil.copymode(path, temp)
+        os.replace(temp, path)
+        print(f"Restored: {relative}")
+    return len(run['files'])
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _legacy_rewrite(root, backup_dir):
+    """The previous engine (findall + sub over the whole text, copy2 backup, in-place write)."""
+    for relative, _ in iter_files(root):
+        full_path = os.path.join(root, relative)
+        with open(full_path, 'r', encoding='utf-8') as f:
+            original_content = f.read()
+        if EMOJI_RE.findall(original_content):
+            backup_path = os.path.join(backup_dir, relative)
+            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+            shutil.copy2(full_path, backup_path)
+            with open(full_path, 'w', encoding='utf-8') as f:
+                f.write(EMOJI_RE.sub('', original_content))
+
+
+def _make_tree(root, files, size, emoji_every=8):
+    # Mostly plain (non-ASCII) text; one file in `emoji_every` has an emoji on every other line
+    plain = 'total = soma(itens)  # atualização — mantém o saldo\n' + 'x' * 60 + '\n'
+    emoji = 'value = compute(items)  # keeps the total \U0001F680 in sync\n' + 'x' * 60 + '\n'
+    for i in range(files):
+        line = emoji if i % emoji_every == 0 else plain
+        directory = os.path.join(root, f'pkg{i % 16}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'module{i}.py'), 'w', encoding='utf-8') as f:
+            f.write((line * (size // len(line) + 1))[:size])
+
+
+def benchmark(files, size_kib, workers):
+    """Throughput (MB/s) of the old and new engines over the same synthetic tree, plus a re-run."""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name in ('legacy', 'streaming', 're-run'):
+            root = os.path.join(tmp, 'legacy' if name == 'legacy' else 'streaming')
+            if name != 're-run':
+                _make_tree(root, files, size_kib * 1024)
+            total = sum(stat.st_size for _, stat in iter_files(root))
+            started = time.perf_counter()
+            if name == 'legacy':
+                _legacy_rewrite(root, os.path.join(tmp, 'legacy-backup'))
+            else:
+                remove_emojis(root, workers=workers, backup_dir=os.path.join(tmp, 'backups'),
+                              manifest_path=os.path.join(tmp, MANIFEST_NAME))
+            elapsed = time.perf_counter() - started
+            results[name] = total / elapsed / 1e6
+            print(f"{name:<10} {total / 1e6:>8.1f} MB in {elapsed:>6.2f} s  {results[name]:>8.1f} MB/s")
+        print(f"speedup: {results['streaming'] / results['legacy']:.1f}x "
+              f"(re-run with the manifest: {results['re-run'] / results['legacy']:.0f}x)")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Remove emojis from the source files of the repository.')
+    parser.add_argument('path', nargs='?', default=os.path.dirname(os.path.abspath(__file__)),
+                        help='directory to clean (default: the directory of this script)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--backup-dir', default=None,
+                        help=f'backup store (default: <parent of path>/{BACKUP_DIR_NAME})')
+    parser.add_argument('--dry-run', action='store_true', help='print the diff and change nothing')
+    parser.add_argument('--restore', metavar='RUN_JSON', help='restore the originals recorded in a run file')
+    parser.add_argument('--benchmark', action='store_true', help='measure MB/s on a synthetic tree')
+    parser.add_argument('--bench-files', type=int, default=400, help='files in the benchmark tree')
+    parser.add_argument('--bench-size', type=int, default=256, help='KiB per benchmark file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # The rewrite uses a process pool: keep the script body out of module import
+    args = parse_args(argv)
+    if args.benchmark:
+        benchmark(args.bench_files, args.bench_size, args.workers)
+        return 0
+    if args.restore:
+        print(f"\nRestored {restore(args.restore)} files.")
+        return 0
+
+    dir_path = os.path.abspath(args.path)
+    if not os.path.isdir(dir_path):
+        sys.exit(f"Not a directory: {dir_path}")
+    backup_dir = None if args.dry_run else os.path.abspath(
+        args.backup_dir or os.path.join(os.path.dirname(dir_path), BACKUP_DIR_NAME))
+
+    print("Starting emoji removal process..." + (" (dry run)" if args.dry_run else "") + "\n")
+    report = remove_emojis(dir_path, workers=args.workers, backup_dir=backup_dir,
+                           dry_run=args.dry_run, manifest_path=os.path.join(dir_path, MANIFEST_NAME))
+    results = report['results']
+
+    files_processed = emojis_removed = 0
+    for result in results:
+        if 'error' in result:
+            print(f"❌ Error processing {result['path']}: {result['error']}")
+            continue
+        if not result['removed']:
+            continue
+        files_processed += 1
+        emojis_removed += result['removed']
+        if args.dry_run:
+            print(result['diff'])
+        else:
+            print(f"✅ Processed: {result['path']}")
+            print(f"   Removed {result['removed']} emojis: {', '.join(result['emojis'])}")
+            print()
+
+    print(f"\n🎯 Summary:")
+    print(f"   Files {'to process' if args.dry_run else 'processed'}: {files_processed}")
+    print(f"   Total emojis {'to remove' if args.dry_run else 'removed'}: {emojis_removed}")
+    print(f"   {report['files']} files, {report['read']} read ({report['bytes_read'] / 1e6:.2f} MB) "
+          f"in {report['elapsed_s']:.2f} s")
+    if args.dry_run:
+        print("\nDry run: no file was changed.")
+        return 0
+    if files_processed:
+        run_path = save_run(backup_dir, dir_path, results)
+        print(f"   Backup location: {backup_dir}")
+        print("\n✅ Emoji removal completed!")
+        print(f"💡 Restore with: python remove_mojis.py --restore {run_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())